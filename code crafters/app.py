@@ -4,23 +4,46 @@ Streamlit entry point for the Library Management System.
 
 from __future__ import annotations
 
+from importlib import import_module
+
 import streamlit as st
 
 from auth.authentication import (
+    LoginRateLimited,
     authenticate_user,
     create_session,
     current_user,
     logout,
     register_user,
+    sync_session_cookie,
 )
-from views import (
-    render_admin_dashboard,
-    render_book_catalog,
-    render_profile_page,
-    render_user_dashboard,
-)
+from auth.passwords import HashingBusy
+from config import get_query_budget_config
+from database.request_context import request_context
 from utils.validators import validate_password_strength
 
+# Navigation choice -> (module, render function). Pages are imported the
+# first time they are opened, so patrons never load the admin dashboard.
+PAGES = {
+    "Dashboard": ("views.user_dashboard", "render_user_dashboard"),
+    "Catalog": ("views.book_catalog", "render_book_catalog"),
+    "Profile": ("views.profile", "render_profile_page"),
+    "Admin": ("views.admin_dashboard", "render_admin_dashboard"),
+}
+
+
+BUSY_MESSAGE = "Sign-in is busy right now. Please try again in a moment."
+
+
+def _shed_load(action, *args):
+    """Run a hashing auth call; return (result, None) or (None, message) when load is shed."""
+    try:
+        return action(*args), None
+    except LoginRateLimited as exc:
+        return None, str(exc)
+    except HashingBusy:
+        return None, BUSY_MESSAGE
+
 
 def _login_form():
     st.subheader("Sign in")
@@ -29,7 +52,10 @@ def _login_form():
         password = st.text_input("Password", type="password")
         submitted = st.form_submit_button("Login")
     if submitted:
-        user = authenticate_user(email.strip(), password)
+        user, rejected = _shed_load(authenticate_user, email.strip(), password)
+        if rejected:
+            st.error(rejected)
+            return
         if user:
             create_session(user)
             st.rerun()
@@ -45,7 +71,10 @@ def _admin_login_form():
         password = st.text_input("Admin password", type="password")
         submitted = st.form_submit_button("Enter Admin Portal")
     if submitted:
-        user = authenticate_user(email.strip(), password)
+        user, rejected = _shed_load(authenticate_user, email.strip(), password)
+        if rejected:
+            st.error(rejected)
+            return
         if user and user.get("role") == "admin":
             create_session(user)
             st.session_state["nav_choice"] = "Admin"
@@ -72,7 +101,10 @@ def _register_form():
         if not valid:
             st.error(message)
             return
-        user = register_user(full_name.strip(), email.strip(), password)
+        user, rejected = _shed_load(register_user, full_name.strip(), email.strip(), password)
+        if rejected:
+            st.error(rejected)
+            return
         if user:
             st.success("Account created. You can now sign in.")
         else:
@@ -107,23 +139,23 @@ def render_sidebar():
 
 def main():
     st.set_page_config(page_title="Library Management System", layout="wide")
-    if "authenticated" not in st.session_state:
-        st.session_state.authenticated = False
-        st.session_state.user = None
-
-    if not st.session_state.authenticated:
-        show_login_screen()
-        return
-
-    choice = render_sidebar()
-    if choice == "Dashboard":
-        render_user_dashboard()
-    elif choice == "Catalog":
-        render_book_catalog()
-    elif choice == "Profile":
-        render_profile_page()
-    elif choice == "Admin":
-        render_admin_dashboard()
+    # Imported on the first run rather than with this module, so the job
+    # stack stays out of the import budget (benchmarks/import_budget.py).
+    from utils.jobs import start_scheduler
+
+    start_scheduler()
+    with request_context("Login", **get_query_budget_config()) as request:
+        signed_in = current_user()
+        sync_session_cookie()
+        if not signed_in:
+            show_login_screen()
+            return
+
+        choice = render_sidebar()
+        request.page = choice
+        if choice in PAGES:
+            module_name, render = PAGES[choice]
+            getattr(import_module(module_name), render)()
 
 
 if __name__ == "__main__":
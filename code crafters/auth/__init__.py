@@ -3,6 +3,7 @@ Authentication helpers.
 """
 
 from .authentication import (
+    LoginRateLimited,
     authenticate_user,
     create_session,
     current_user,
@@ -10,4 +11,4 @@ from .authentication import (
     register_user,
     require_role,
 )
-
+from .passwords import HashingBusy
@@ -4,19 +4,66 @@ Authentication logic for Streamlit.
 
 from __future__ import annotations
 
+import json
+import math
+import secrets
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 
 import streamlit as st
-from werkzeug.security import check_password_hash, generate_password_hash
 
-from config import MAX_FINE_BEFORE_BLOCK
+from auth.passwords import HashingBusy, hash_password, needs_rehash, verify_password
+from auth.rate_limit import LoginRateLimiter
+from auth.sessions import get_session_store
+from config import MAX_FINE_BEFORE_BLOCK, get_login_rate_limit_config, get_session_config
 from database.database import run_query
+from database.request_context import forget, memoize
 from utils.validators import validate_email
 
-SESSION_TIMEOUT_MINUTES = 60
 SYNC_INTERVAL_SECONDS = 60
 
+_SESSION_COOKIE = get_session_config()["cookie_name"]
+
+# Streamlit cannot set cookies from the server. HTML iframes share the app's
+# origin, so an empty one writes the cookie for the parent page.
+_COOKIE_SCRIPT = """
+<script>
+const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+window.parent.document.cookie = {cookie} + "; Path=/; SameSite=Strict" + secure;
+</script>
+"""
+
+_RATE_LIMIT = get_login_rate_limit_config()
+_login_limiter = LoginRateLimiter(_RATE_LIMIT)
+
+
+class LoginRateLimited(RuntimeError):
+    """Raised before any DB or hashing work when an email or client is over its login budget."""
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(_RATE_LIMIT["message"].format(retry_after=self.retry_after))
+
+
+def _client_address() -> Optional[str]:
+    if _RATE_LIMIT["trust_forwarded_for"]:
+        forwarded = st.context.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return st.context.ip_address
+
+
+def _check_login_rate(email: str) -> None:
+    if not _RATE_LIMIT["enabled"]:
+        return
+    wait = _login_limiter.acquire(email, _client_address())
+    if wait:
+        raise LoginRateLimited(wait)
+
+
+def login_rate_limit_stats() -> Dict[str, int]:
+    return _login_limiter.stats()
+
 
 def _load_user(email: str) -> Optional[Dict]:
     return run_query(
@@ -27,11 +74,35 @@ def _load_user(email: str) -> Optional[Dict]:
 
 
 def authenticate_user(email: str, password: str) -> Optional[Dict]:
-    """Validate credentials against the DB."""
+    """
+    Validate credentials against the DB.
+
+    Raises ``LoginRateLimited`` before touching the DB when the email or
+    client is out of attempts. Hashing runs in the password pool and may
+    raise ``HashingBusy``. A hash made with outdated scrypt parameters is
+    upgraded on success.
+    """
+    _check_login_rate(email)
     user = _load_user(email)
-    if user and check_password_hash(user["password_hash"], password):
-        return user
-    return None
+    if not user or not verify_password(user["password_hash"], password):
+        return None
+    if needs_rehash(user["password_hash"]):
+        _upgrade_password_hash(user, password)
+    return user
+
+
+def _upgrade_password_hash(user: Dict, password: str) -> None:
+    try:
+        new_hash = hash_password(password)
+    except HashingBusy:
+        return  # Try again at the next login.
+    # Compare-and-set so a concurrent password change is not overwritten.
+    run_query(
+        "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+        (new_hash, user["user_id"], user["password_hash"]),
+        fetch="none",
+    )
+    user["password_hash"] = new_hash
 
 
 def register_user(full_name: str, email: str, password: str) -> Optional[Dict]:
@@ -39,12 +110,13 @@ def register_user(full_name: str, email: str, password: str) -> Optional[Dict]:
     if not validate_email(email):
         st.warning("Please provide a valid email.")
         return None
+    _check_login_rate(email)
     existing = _load_user(email)
     if existing:
         st.warning("An account with this email already exists.")
         return None
 
-    password_hash = generate_password_hash(password, method="scrypt")
+    password_hash = hash_password(password)
     run_query(
         """
         INSERT INTO users (full_name, email, password_hash, role, total_fines)
@@ -56,47 +128,84 @@ def register_user(full_name: str, email: str, password: str) -> Optional[Dict]:
     return _load_user(email)
 
 
+def _cookie_token() -> Optional[str]:
+    token = st.context.cookies.get(_SESSION_COOKIE)
+    return token if isinstance(token, str) and token else None
+
+
+def _session_token() -> Optional[str]:
+    """Token of this browser session; after a reload, possibly on another worker, it comes from the cookie."""
+    token = st.session_state.get("session_token")
+    if not token:
+        cookie = _cookie_token()
+        if cookie and cookie != st.session_state.get("rejected_session_cookie"):
+            token = st.session_state.session_token = cookie
+    return token
+
+
+def _clear_session_token() -> None:
+    st.session_state.pop("session_token", None)
+    # Cookies are read once per browser connection, so remember not to reuse it.
+    st.session_state.rejected_session_cookie = _cookie_token()
+
+
+def sync_session_cookie() -> None:
+    """
+    Write this session's token to the browser cookie, or expire the cookie
+    after logout, whenever the two differ. Call once per script run. The
+    token is never put in the URL.
+    """
+    token = st.session_state.get("session_token")
+    if token == _cookie_token():
+        return
+    cookie = f"{_SESSION_COOKIE}={token}" if token else f"{_SESSION_COOKIE}=; Max-Age=0"
+    st.iframe(_COOKIE_SCRIPT.format(cookie=json.dumps(cookie)), height="content")
+
+
 def create_session(user: Dict) -> None:
-    st.session_state.authenticated = True
-    st.session_state.user = {
-        "user_id": user["user_id"],
-        "full_name": user["full_name"],
-        "email": user["email"],
-        "role": user["role"],
-        "total_fines": user.get("total_fines", 0.0),
-    }
-    st.session_state.last_active = datetime.utcnow()
-    st.session_state.user_last_sync = datetime.utcnow()
+    token = secrets.token_urlsafe(32)
+    get_session_store().create(
+        token,
+        {
+            "user_id": user["user_id"],
+            "full_name": user["full_name"],
+            "email": user["email"],
+            "role": user["role"],
+            "total_fines": user.get("total_fines", 0.0),
+        },
+    )
+    st.session_state.session_token = token
+    forget("current_user")
 
 
 def current_user() -> Optional[Dict]:
-    """Return the active user if the session is still valid."""
-    user = st.session_state.get("user")
-    last_active = st.session_state.get("last_active")
-    if not st.session_state.get("authenticated") or not user:
-        return None
-    if last_active and datetime.utcnow() - last_active > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-        logout()
+    """Return the active user if the session is still valid; resolved once per script run."""
+    return memoize("current_user", _resolve_current_user)
+
+
+def _resolve_current_user() -> Optional[Dict]:
+    token = _session_token()
+    if not token:
         return None
-    if last_active and datetime.utcnow() - last_active > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-        logout()
+    store = get_session_store()
+    session = store.get(token)
+    if session is None:
+        _clear_session_token()
         return None
-    st.session_state.last_active = datetime.utcnow()
 
-    last_sync = st.session_state.get("user_last_sync")
-    if (
-        not last_sync
-        or datetime.utcnow() - last_sync > timedelta(seconds=SYNC_INTERVAL_SECONDS)
-    ):
+    user = session.user
+    refreshed = None
+    if datetime.utcnow() - session.profile_synced_at > timedelta(seconds=SYNC_INTERVAL_SECONDS):
         fresh = run_query(
             "SELECT full_name, email, role, total_fines FROM users WHERE user_id = %s",
             (user["user_id"],),
             fetch="one",
         )
         if fresh:
-            st.session_state.user.update(fresh)
-            st.session_state.user_last_sync = datetime.utcnow()
-    return st.session_state.user
+            user.update(fresh)
+            refreshed = user
+    store.touch(token, refreshed)
+    return user
 
 
 def require_role(*roles: str) -> bool:
@@ -109,10 +218,11 @@ def require_role(*roles: str) -> bool:
 
 
 def logout() -> None:
-    st.session_state.authenticated = False
-    st.session_state.user = None
-    st.session_state.last_active = None
-    st.session_state.user_last_sync = None
+    token = _session_token()
+    if token:
+        get_session_store().delete(token)
+    _clear_session_token()
+    forget("current_user")
 
 
 def can_borrow(user: Dict) -> bool:
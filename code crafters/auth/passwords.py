@@ -0,0 +1,112 @@
+"""
+Password hashing in a bounded process pool.
+
+scrypt is CPU- and memory-hard by design, so hashing on the Streamlit
+script thread lets a burst of logins stall every other rerun in the
+process. Hashes are computed by Werkzeug in a small pool of worker
+processes instead. At most ``workers + queue_limit`` requests may be in
+flight; beyond that ``HashingBusy`` is raised at once rather than queueing
+without bound. Workers only import Werkzeug, and the pool is started on
+first use.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import get_password_hash_config
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated or too slow; ask the user to retry."""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+
+
+def hash_method() -> str:
+    """Werkzeug method string for the configured scrypt parameters."""
+    config = get_password_hash_config()
+    return f"scrypt:{config['scrypt_n']}:{config['scrypt_r']}:{config['scrypt_p']}"
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when ``password_hash`` was made with other parameters than the configured ones."""
+    return password_hash.split("$", 1)[0] != hash_method()
+
+
+def _executor(config: Dict[str, Any]) -> Tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded Streamlit server can copy held locks.
+            _pool = ProcessPoolExecutor(
+                max_workers=config["workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _slots = threading.BoundedSemaphore(config["workers"] + config["queue_limit"])
+        return _pool, _slots
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _slots = None, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    config = get_password_hash_config()
+    if config["workers"] <= 0:
+        return fn(*args)
+
+    pool, slots = _executor(config)
+    if not slots.acquire(blocking=False):
+        raise HashingBusy("Too many password checks in progress.")
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard_pool(pool)
+        raise HashingBusy("Password hashing pool restarted.") from None
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=config["timeout_seconds"])
+    except FutureTimeout:
+        raise HashingBusy("Password hashing timed out.") from None
+    except BrokenProcessPool:
+        logger.exception("Password hashing worker died; restarting the pool")
+        _discard_pool(pool)
+        raise HashingBusy("Password hashing pool restarted.") from None
+
+
+def hash_password(password: str) -> str:
+    """Hash ``password`` with the configured scrypt parameters."""
+    from werkzeug.security import generate_password_hash
+
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    from werkzeug.security import check_password_hash
+
+    return _run(check_password_hash, password_hash, password)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes; the next hash starts a new pool."""
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        _discard_pool(pool)
@@ -0,0 +1,97 @@
+"""
+In-process token buckets for shedding login attempts.
+
+Every attempt takes one token from the bucket of the email it targets and
+one from the bucket of the client it comes from; it is rejected, without
+touching either, when any of them is empty. Buckets live in LRU-ordered
+dicts capped at ``max_keys`` entries, so memory stays bounded however many
+distinct emails an attacker cycles through (an evicted bucket starts full
+again, which the client bucket still covers). State is per process.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated: float
+
+
+class TokenBuckets:
+    """LRU-bounded token buckets sharing one burst size and refill rate."""
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int) -> None:
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def _refilled(self, key: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Seconds until ``key`` has a whole token; 0 when one is available now."""
+        bucket = self._refilled(key, now)
+        if bucket.tokens >= 1:
+            return 0.0
+        return math.inf if self.rate <= 0 else (1 - bucket.tokens) / self.rate
+
+    def take(self, key: str) -> None:
+        self._buckets[key].tokens -= 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginRateLimiter:
+    """Per-email and per-client buckets checked and charged together."""
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        self._emails = TokenBuckets(config["email_burst"], config["email_per_minute"], config["max_keys"])
+        self._clients = TokenBuckets(config["client_burst"], config["client_per_minute"], config["max_keys"])
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, email: str, client: Optional[str]) -> float:
+        """Charge one attempt and return 0, or return the seconds to wait without charging."""
+        email = email.strip().lower()
+        with self._lock:
+            now = time.monotonic()
+            wait = self._emails.retry_after(email, now)
+            if client:
+                wait = max(wait, self._clients.retry_after(client, now))
+            if wait:
+                self.rejected += 1
+                return wait
+            self._emails.take(email)
+            if client:
+                self._clients.take(client)
+            self.allowed += 1
+            return 0.0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "emails_tracked": len(self._emails),
+                "clients_tracked": len(self._clients),
+            }
@@ -0,0 +1,304 @@
+"""
+Server-side session store, so any Streamlit worker can serve any signed-in
+user.
+
+The browser holds an opaque random token; the store keys sessions by its
+SHA-256 and keeps the cached user profile, the last activity time and when
+the profile was last synced with ``users``. Resolving a session is one
+primary-key lookup. Activity updates are buffered in process and written
+in one batch every ``touch_flush_seconds`` by a background thread, which
+also deletes idle sessions every ``sweep_seconds``.
+
+``DatabaseSessionStore`` uses the ``sessions`` table of the main database
+(migration 2); ``MemorySessionStore`` keeps everything in this process.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from config import get_session_config
+from database.database import run_query, run_transaction
+
+logger = logging.getLogger(__name__)
+
+# Pending activity per session key: (last_active, profile to write or None).
+_Touch = Tuple[datetime, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class Session:
+    user: Dict[str, Any]
+    created_at: datetime
+    last_active: datetime
+    profile_synced_at: datetime
+
+
+def session_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def _as_datetime(value: Any) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _json_default(value: Any) -> Any:
+    return float(value) if isinstance(value, Decimal) else str(value)
+
+
+class SessionStore(ABC):
+    """Buffered activity and idle expiry on top of a storage backend."""
+
+    def __init__(self, timeout: timedelta, flush_seconds: float, sweep_seconds: float) -> None:
+        self.timeout = timeout
+        self.flush_seconds = flush_seconds
+        self.sweep_seconds = sweep_seconds
+        self._pending: Dict[str, _Touch] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Storage backend -------------------------------------------------------
+    @abstractmethod
+    def _insert(self, key: str, session: Session) -> None:
+        ...
+
+    @abstractmethod
+    def _select(self, key: str) -> Optional[Session]:
+        ...
+
+    @abstractmethod
+    def _delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def _write_touches(self, touches: Dict[str, _Touch]) -> None:
+        ...
+
+    @abstractmethod
+    def _delete_idle(self, cutoff: datetime) -> int:
+        ...
+
+    # Public API ------------------------------------------------------------
+    def create(self, token: str, user: Dict[str, Any]) -> None:
+        now = _now()
+        self._insert(session_key(token), Session(dict(user), now, now, now))
+
+    def get(self, token: str) -> Optional[Session]:
+        """Resolve a live session, or None when unknown or idle past the timeout."""
+        key = session_key(token)
+        session = self._select(key)
+        if session is None:
+            return None
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending:
+            last_active, profile = pending
+            session.last_active = max(session.last_active, last_active)
+            if profile is not None:
+                session.user, session.profile_synced_at = dict(profile), last_active
+        if _now() - session.last_active > self.timeout:
+            self.delete(token)
+            return None
+        return session
+
+    def touch(self, token: str, profile: Optional[Dict[str, Any]] = None) -> None:
+        """Record activity (and optionally a refreshed profile) for the next flush."""
+        key = session_key(token)
+        with self._lock:
+            if profile is None and key in self._pending:
+                profile = self._pending[key][1]
+            self._pending[key] = (_now(), None if profile is None else dict(profile))
+
+    def delete(self, token: str) -> None:
+        key = session_key(token)
+        with self._lock:
+            self._pending.pop(key, None)
+        self._delete(key)
+
+    def flush(self) -> int:
+        """Write buffered activity; returns the number of sessions updated."""
+        with self._lock:
+            touches, self._pending = self._pending, {}
+        if touches:
+            try:
+                self._write_touches(touches)
+            except Exception:
+                with self._lock:
+                    for key, touch in touches.items():
+                        self._pending.setdefault(key, touch)
+                raise
+        return len(touches)
+
+    def sweep(self) -> int:
+        """Flush, then delete sessions idle past the timeout; returns the number deleted."""
+        self.flush()
+        return self._delete_idle(_now() - self.timeout)
+
+    def start(self) -> None:
+        """Start the background flush/sweep thread (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-store", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush session activity on shutdown")
+
+    def _run(self) -> None:
+        next_sweep = time.monotonic() + self.sweep_seconds
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                if time.monotonic() >= next_sweep:
+                    removed = self.sweep()
+                    next_sweep = time.monotonic() + self.sweep_seconds
+                    if removed:
+                        logger.info("Swept %s idle session(s)", removed)
+                else:
+                    self.flush()
+            except Exception:
+                logger.exception("Session store maintenance failed")
+
+
+class DatabaseSessionStore(SessionStore):
+    """Sessions in the main database's ``sessions`` table."""
+
+    def _insert(self, key: str, session: Session) -> None:
+        run_query(
+            """
+            INSERT INTO sessions (session_key, user_id, profile, created_at, last_active, profile_synced_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (
+                key,
+                session.user["user_id"],
+                json.dumps(session.user, default=_json_default),
+                session.created_at,
+                session.last_active,
+                session.profile_synced_at,
+            ),
+            fetch="none",
+        )
+
+    def _select(self, key: str) -> Optional[Session]:
+        row = run_query(
+            """
+            SELECT profile, created_at, last_active, profile_synced_at
+            FROM sessions WHERE session_key = %s
+            """,
+            (key,),
+            fetch="one",
+        )
+        if not row:
+            return None
+        return Session(
+            user=json.loads(row["profile"]),
+            created_at=_as_datetime(row["created_at"]),
+            last_active=_as_datetime(row["last_active"]),
+            profile_synced_at=_as_datetime(row["profile_synced_at"]),
+        )
+
+    def _delete(self, key: str) -> None:
+        run_query("DELETE FROM sessions WHERE session_key = %s", (key,), fetch="none")
+
+    def _write_touches(self, touches: Dict[str, _Touch]) -> None:
+        # Activity-only updates first, then profile refreshes, so each shape
+        # goes out as one executemany batch.
+        plain = [
+            ("UPDATE sessions SET last_active = %s WHERE session_key = %s", (last_active, key))
+            for key, (last_active, profile) in touches.items()
+            if profile is None
+        ]
+        synced = [
+            (
+                "UPDATE sessions SET last_active = %s, profile = %s, profile_synced_at = %s WHERE session_key = %s",
+                (last_active, json.dumps(profile, default=_json_default), last_active, key),
+            )
+            for key, (last_active, profile) in touches.items()
+            if profile is not None
+        ]
+        run_transaction(plain + synced)
+
+    def _delete_idle(self, cutoff: datetime) -> int:
+        return run_query("DELETE FROM sessions WHERE last_active < %s", (cutoff,), fetch="none")
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions held in this process only; suitable for a single worker."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._sessions: Dict[str, Session] = {}
+
+    def _insert(self, key: str, session: Session) -> None:
+        with self._lock:
+            self._sessions[key] = session
+
+    def _select(self, key: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(key)
+            return None if session is None else replace(session, user=dict(session.user))
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def _write_touches(self, touches: Dict[str, _Touch]) -> None:
+        with self._lock:
+            for key, (last_active, profile) in touches.items():
+                session = self._sessions.get(key)
+                if session is None:
+                    continue
+                session.last_active = last_active
+                if profile is not None:
+                    session.user, session.profile_synced_at = dict(profile), last_active
+
+    def _delete_idle(self, cutoff: datetime) -> int:
+        with self._lock:
+            idle = [key for key, session in self._sessions.items() if session.last_active < cutoff]
+            for key in idle:
+                del self._sessions[key]
+        return len(idle)
+
+
+_STORES = {"database": DatabaseSessionStore, "memory": MemorySessionStore}
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide store selected by ``SESSION_STORE``, started on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = get_session_config()
+                store_class = _STORES.get(config["store"])
+                if store_class is None:
+                    raise ValueError(f"Unknown SESSION_STORE {config['store']!r}; use one of {sorted(_STORES)}")
+                store = store_class(
+                    timeout=timedelta(minutes=config["timeout_minutes"]),
+                    flush_seconds=config["touch_flush_seconds"],
+                    sweep_seconds=config["sweep_seconds"],
+                )
+                store.start()
+                _store = store
+    return _store
@@ -0,0 +1,16 @@
+"""
+Performance and contention benchmarks.
+
+Each module is runnable with ``python -m benchmarks.<name>`` from the
+project root. Unless ``DB_ENGINE`` is set, they run against a throwaway
+SQLite database.
+"""
+
+import os
+import tempfile
+
+if "DB_ENGINE" not in os.environ:
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ.setdefault(
+        "SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="library-bench-"), "library.db")
+    )
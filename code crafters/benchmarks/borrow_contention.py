@@ -0,0 +1,100 @@
+"""
+Concurrent borrow benchmark: many patrons race for the copies of one title.
+
+    python -m benchmarks.borrow_contention --threads 50 --copies 20
+
+Reports borrow throughput and verifies that no copy was lent twice and
+that exactly ``min(threads, copies)`` borrows succeeded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from database.database import run_query, run_transaction
+from utils.helpers import borrow_book
+
+
+def _setup(threads: int, copies: int):
+    tag = uuid.uuid4().hex[:8]
+    isbn = f"bench-{tag}"
+    run_query(
+        "INSERT INTO books (title, isbn, description) VALUES (%s, %s, %s)",
+        (f"Contention Benchmark {tag}", isbn, "Borrow contention benchmark title."),
+        fetch="none",
+    )
+    book_id = run_query("SELECT book_id FROM books WHERE isbn = %s", (isbn,), fetch="one")["book_id"]
+    run_transaction(
+        [
+            (
+                "INSERT INTO book_copies (book_id, status, location) VALUES (%s, 'available', 'Bench')",
+                (book_id,),
+            )
+            for _ in range(copies)
+        ]
+    )
+    run_transaction(
+        [
+            (
+                """
+                INSERT INTO users (full_name, email, role, password_hash, total_fines)
+                VALUES (%s, %s, 'user', '!', 0)
+                """,
+                (f"Bench Patron {i}", f"bench-{tag}-{i}@example.invalid"),
+            )
+            for i in range(threads)
+        ]
+    )
+    users = run_query(
+        "SELECT user_id FROM users WHERE email LIKE %s ORDER BY user_id",
+        (f"bench-{tag}-%",),
+    )
+    return book_id, [row["user_id"] for row in users]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--copies", type=int, default=20)
+    args = parser.parse_args()
+
+    book_id, user_ids = _setup(args.threads, args.copies)
+    start_gate = threading.Barrier(len(user_ids))
+
+    def attempt(user_id: int):
+        start_gate.wait()
+        return borrow_book(user_id, book_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as executor:
+        results = list(executor.map(attempt, user_ids))
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    lent = run_query(
+        """
+        SELECT bt.copy_id, COUNT(*) AS loans
+        FROM borrow_transactions bt
+        JOIN book_copies bc ON bc.copy_id = bt.copy_id
+        WHERE bc.book_id = %s AND bt.status IN ('borrowed', 'overdue')
+        GROUP BY bt.copy_id
+        """,
+        (book_id,),
+    )
+    double_lent = [row["copy_id"] for row in lent if row["loans"] > 1]
+    expected = min(args.threads, args.copies)
+
+    print(f"threads={args.threads} copies={args.copies}")
+    print(f"elapsed={elapsed * 1000:.1f} ms  throughput={len(results) / elapsed:.1f} borrow attempts/s")
+    print(f"succeeded={succeeded} expected={expected} double_lent={len(double_lent)}")
+    if double_lent or succeeded != expected:
+        raise SystemExit("FAIL: borrow contention invariants violated")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Write throughput of per-statement execution versus grouped executemany.
+
+    python -m benchmarks.bulk_write --rows 20000
+
+Inserts ``--rows`` copies three ways: one ``execute`` per row inside a
+transaction, ``run_transaction`` (which groups identical statements) and
+``bulk_write`` fed from a generator.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+
+from database.database import bulk_write, run_query, run_transaction, transaction
+
+_INSERT_COPY = "INSERT INTO book_copies (book_id, status, location) VALUES (%s, 'available', %s)"
+
+
+def _book() -> int:
+    isbn = f"bulk-{uuid.uuid4().hex[:8]}"
+    run_query(
+        "INSERT INTO books (title, isbn, description) VALUES (%s, %s, %s)",
+        (f"Bulk Write Benchmark {isbn}", isbn, "Bulk write benchmark title."),
+        fetch="none",
+    )
+    return run_query("SELECT book_id FROM books WHERE isbn = %s", (isbn,), fetch="one")["book_id"]
+
+
+def _timed(label: str, rows: int, write) -> None:
+    book_id = _book()
+    started = time.perf_counter()
+    write(book_id)
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+    rows = args.rows
+
+    def one_by_one(book_id: int) -> None:
+        with transaction() as tx:
+            for n in range(rows):
+                tx.execute(_INSERT_COPY, (book_id, f"Shelf {n}"))
+
+    _timed("execute per row ", rows, one_by_one)
+    _timed(
+        "run_transaction ",
+        rows,
+        lambda book_id: run_transaction([(_INSERT_COPY, (book_id, f"Shelf {n}")) for n in range(rows)]),
+    )
+    _timed(
+        "bulk_write      ",
+        rows,
+        lambda book_id: bulk_write(_INSERT_COPY, ((book_id, f"Shelf {n}") for n in range(rows))),
+    )
+
+
+if __name__ == "__main__":
+    main()
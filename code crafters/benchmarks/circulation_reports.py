@@ -0,0 +1,128 @@
+"""
+Admin circulation reports from live joins versus the daily rollups.
+
+    python -m benchmarks.circulation_reports --loans 100000 1000000 --days 730
+
+Grows loan history to each ``--loans`` total, spread over the last
+``--days`` days. An empty database first gets ``--books`` benchmark titles
+with a few copies each and a benchmark patron to lend them to. For each size it times the incremental rollup refresh,
+the all-time "most borrowed" query the reports used to run over
+``borrow_transactions``, and the rollup reads for the last 30 days and for
+the whole history. The rollup reads should stay flat as history grows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from database.database import bulk_write, clear_query_cache, run_query
+from utils.rollups import daily_circulation, refresh_circulation_rollups, top_books
+
+_LIVE_TOP_BOOKS = """
+    SELECT b.title, COUNT(*) AS times_borrowed
+    FROM borrow_transactions bt
+    JOIN book_copies bc ON bc.copy_id = bt.copy_id
+    JOIN books b ON b.book_id = bc.book_id
+    GROUP BY b.book_id
+    ORDER BY times_borrowed DESC
+    LIMIT 10
+"""
+
+
+def _timed(read) -> float:
+    clear_query_cache()
+    started = time.perf_counter()
+    read()
+    return (time.perf_counter() - started) * 1000
+
+
+def _rollup_reads(days: int) -> None:
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    top_books(start, end)
+    daily_circulation(start, end)
+
+
+def _lenders(books: int) -> Tuple[List[int], List[int]]:
+    """Copy and user ids to lend, seeding a catalog and a patron if there are none."""
+    tag = uuid.uuid4().hex[:8]
+    if not run_query("SELECT copy_id FROM book_copies LIMIT 1", fetch="one"):
+        bulk_write(
+            "INSERT INTO books (title, isbn, description) VALUES (%s, %s, %s)",
+            (
+                (f"Circulation Benchmark {tag} {n}", f"circ-{tag}-{n}", "Circulation benchmark title.")
+                for n in range(books)
+            ),
+        )
+        run_query(
+            """
+            INSERT INTO book_copies (book_id, status, location)
+            SELECT b.book_id, 'available', %s FROM books b
+            CROSS JOIN (SELECT 1 AS n UNION ALL SELECT 2 UNION ALL SELECT 3) c
+            """,
+            ("Bench",),
+            fetch="none",
+        )
+    if not run_query("SELECT user_id FROM users LIMIT 1", fetch="one"):
+        run_query(
+            "INSERT INTO users (full_name, email, role, password_hash, total_fines) VALUES (%s, %s, 'user', '-', 0)",
+            (f"Circulation {tag}", f"circ-{tag}@example.com"),
+            fetch="none",
+        )
+    copies = [row["copy_id"] for row in run_query("SELECT copy_id FROM book_copies")]
+    users = [row["user_id"] for row in run_query("SELECT user_id FROM users")]
+    return copies, users
+
+
+def _grow_history(copies: List[int], users: List[int], loans: int, days: int) -> None:
+    today = date.today()
+
+    def rows():
+        for _ in range(loans):
+            borrowed = today - timedelta(days=random.randrange(days))
+            yield (
+                random.choice(copies),
+                random.choice(users),
+                borrowed,
+                borrowed + timedelta(days=14),
+                borrowed + timedelta(days=7),
+            )
+
+    bulk_write(
+        """
+        INSERT INTO borrow_transactions (copy_id, user_id, borrow_date, due_date, return_date, status, fine_amount)
+        VALUES (%s, %s, %s, %s, %s, 'returned', 0)
+        """,
+        rows(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--loans", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--books", type=int, default=500, help="titles to create in an empty catalog")
+    args = parser.parse_args()
+
+    copies, users = _lenders(args.books)
+    refresh_circulation_rollups()
+    for target in args.loans:
+        existing = run_query("SELECT COUNT(*) AS n FROM borrow_transactions", fetch="one")["n"]
+        _grow_history(copies, users, max(target - existing, 0), args.days)
+        refresh_ms = _timed(refresh_circulation_rollups)
+        live_ms = _timed(lambda: run_query(_LIVE_TOP_BOOKS))
+        month_ms = _timed(lambda: _rollup_reads(30))
+        all_ms = _timed(lambda: _rollup_reads(args.days))
+        print(
+            f"{max(target, existing):>9} loans: refresh {refresh_ms:8.1f} ms | live top books {live_ms:8.1f} ms | "
+            f"rollups 30 days {month_ms:6.1f} ms, {args.days} days {all_ms:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
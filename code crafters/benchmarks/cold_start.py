@@ -0,0 +1,59 @@
+"""
+Worker cold-start benchmark: fresh processes connecting to the database.
+
+    python -m benchmarks.cold_start --runs 10
+
+Each run starts a new interpreter, imports the data layer and issues the
+first query, reporting import time and time-to-first-query separately.
+The first run bootstraps an empty database; the rest hit a current one
+and should only pay for the schema version check.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_CHILD = """
+import json, time
+started = time.perf_counter()
+from database.database import run_query
+imported = time.perf_counter()
+run_query("SELECT 1 AS ok", fetch="one")
+print(json.dumps({"import": imported - started, "first_query": time.perf_counter() - imported}))
+"""
+
+
+def _run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ.copy(),
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _ms(values) -> str:
+    return f"median {statistics.median(values) * 1000:.1f} ms, max {max(values) * 1000:.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cold = _run_once()
+    warm = [_run_once() for _ in range(args.runs)]
+    print(f"cold: import {cold['import'] * 1000:.1f} ms, first query {cold['first_query'] * 1000:.1f} ms")
+    print(f"warm import:      {_ms([run['import'] for run in warm])}")
+    print(f"warm first query: {_ms([run['first_query'] for run in warm])}")
+
+
+if __name__ == "__main__":
+    main()
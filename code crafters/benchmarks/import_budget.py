@@ -0,0 +1,83 @@
+"""
+Import-time budget for worker startup.
+
+    python -m benchmarks.import_budget --budget-ms 1500 --own-budget-ms 100
+
+Runs ``python -X importtime -c "import app"`` against SQLite and exits
+non-zero when the whole import, or the self time of the project's own
+modules, exceeds its budget, or when a module that should only load on
+demand (the MySQL driver, the admin dashboard, pandas) is imported up front.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+OWN_PACKAGES = ("auth", "config", "database", "utils", "views")
+DEFERRED_MODULES = ("mysql.connector", "views.admin_dashboard", "pandas")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)$")
+
+
+def measure_imports() -> Dict[str, Tuple[int, int]]:
+    """Self and cumulative import time in microseconds per module."""
+    env = dict(os.environ, DB_ENGINE="sqlite")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times[match.group(3)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def _package_ms(imports: Dict[str, Tuple[int, int]], package: str) -> float:
+    """
+    Self time of a package and its submodules.
+
+    Cumulative times nest (``database`` includes ``database.database``), so
+    summing them would count a module once per enclosing package.
+    """
+    return sum(
+        own for name, (own, _) in imports.items() if name == package or name.startswith(package + ".")
+    ) / 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--own-budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    total_ms = imports.get("app", (0, 0))[1] / 1000
+    own_ms = sum(_package_ms(imports, name) for name in OWN_PACKAGES)
+    deferred = [name for name in DEFERRED_MODULES if name in imports]
+
+    print(f"import app: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"project packages: {own_ms:.1f} ms (budget {args.own_budget_ms:.0f} ms)")
+    for name in OWN_PACKAGES:
+        print(f"    {name}: {_package_ms(imports, name):.1f} ms")
+    if deferred:
+        print(f"imported eagerly: {', '.join(deferred)}")
+
+    failed = total_ms > args.budget_ms or own_ms > args.own_budget_ms or bool(deferred)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
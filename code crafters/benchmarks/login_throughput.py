@@ -0,0 +1,88 @@
+"""
+Sustainable logins per second per core through the password hashing pool.
+
+    python -m benchmarks.login_throughput --seconds 10 --concurrency 8
+
+Creates a patron whose password is hashed with the configured scrypt
+parameters, then has ``--concurrency`` threads call ``authenticate_user``
+for ``--seconds``. Reports completed logins, logins rejected with
+``HashingBusy`` and the rate divided by the cores the pool can use.
+Tune PASSWORD_SCRYPT_N/R/P and PASSWORD_HASH_WORKERS through the
+environment; ``--workers`` overrides the latter. The login rate limiter is
+switched off, since every attempt targets the same account.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+import uuid
+
+PASSWORD = "Benchmark-Passw0rd!"
+
+
+def _create_user() -> str:
+    from auth.passwords import hash_password
+    from database.database import run_query
+
+    email = f"login-{uuid.uuid4().hex[:8]}@example.com"
+    run_query(
+        "INSERT INTO users (full_name, email, role, password_hash, total_fines) VALUES (%s, %s, 'user', %s, 0)",
+        ("Login Benchmark", email, hash_password(PASSWORD)),
+        fetch="none",
+    )
+    return email
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS override")
+    args = parser.parse_args()
+    if args.workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["LOGIN_RATE_LIMIT_ENABLED"] = "0"
+
+    from auth.authentication import authenticate_user
+    from auth.passwords import HashingBusy, hash_method, shutdown_pool
+    from config import get_password_hash_config
+
+    email = _create_user()
+    assert authenticate_user(email, PASSWORD), "benchmark user failed to log in"
+
+    counts = {"ok": 0, "busy": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker() -> None:
+        while time.perf_counter() < deadline:
+            try:
+                outcome = "ok" if authenticate_user(email, PASSWORD) else "failed"
+            except HashingBusy:
+                outcome = "busy"
+                time.sleep(0.01)
+            with lock:
+                counts[outcome] = counts.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    shutdown_pool()
+
+    workers = get_password_hash_config()["workers"]
+    cores = min(max(workers, 1), os.cpu_count() or 1)
+    rate = counts["ok"] / elapsed
+    print(f"{hash_method()}, {workers} worker(s) on {os.cpu_count()} core(s), {args.concurrency} threads")
+    print(f"logins: {counts['ok']} in {elapsed:.1f}s, rejected busy: {counts['busy']}")
+    print(f"throughput: {rate:.1f} logins/s, {rate / cores:.1f} logins/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cost of a return that places a hold, as the reservation queue grows.
+
+    python -m benchmarks.reservation_queue --pending 1000 100000 --returns 200
+
+For each queue length a fresh title gets ``--returns`` copies on loan and
+that many pending reservations queued behind them. Every loan is then
+returned through ``return_book``, which puts the copy on hold for the head
+of the queue in the same transaction. Per-return latency should stay flat
+from the smallest queue to the largest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List
+
+from database.database import bulk_write, run_query
+from utils.helpers import return_book
+
+
+def _setup(pending: int, loans: int) -> List[int]:
+    tag = uuid.uuid4().hex[:8]
+    run_query(
+        "INSERT INTO books (title, isbn, description) VALUES (%s, %s, %s)",
+        (f"Queue Benchmark {tag}", f"queue-{tag}", "Reservation queue benchmark title."),
+        fetch="none",
+    )
+    book_id = run_query("SELECT book_id FROM books WHERE isbn = %s", (f"queue-{tag}",), fetch="one")["book_id"]
+    run_query(
+        "INSERT INTO users (full_name, email, role, password_hash, total_fines) VALUES (%s, %s, 'user', '-', 0)",
+        (f"Queue {tag}", f"queue-{tag}@example.com"),
+        fetch="none",
+    )
+    user_id = run_query("SELECT user_id FROM users WHERE email = %s", (f"queue-{tag}@example.com",), fetch="one")["user_id"]
+
+    bulk_write(
+        "INSERT INTO book_copies (book_id, status, location) VALUES (%s, 'borrowed', 'Bench')",
+        ((book_id,) for _ in range(loans)),
+    )
+    copies = run_query("SELECT copy_id FROM book_copies WHERE book_id = %s", (book_id,))
+    today = date.today()
+    bulk_write(
+        """
+        INSERT INTO borrow_transactions (copy_id, user_id, borrow_date, due_date, status, fine_amount)
+        VALUES (%s, %s, %s, %s, 'borrowed', 0)
+        """,
+        ((copy["copy_id"], user_id, today, today + timedelta(days=14)) for copy in copies),
+    )
+    start = datetime(2020, 1, 1)
+    bulk_write(
+        "INSERT INTO reservations (book_id, user_id, status, created_at) VALUES (%s, %s, 'pending', %s)",
+        ((book_id, user_id, start + timedelta(seconds=n)) for n in range(pending)),
+    )
+    loans_out = run_query(
+        "SELECT transaction_id FROM borrow_transactions WHERE user_id = %s AND status = 'borrowed'",
+        (user_id,),
+    )
+    return [loan["transaction_id"] for loan in loans_out]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pending", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--returns", type=int, default=200)
+    args = parser.parse_args()
+
+    for pending in args.pending:
+        loans = _setup(pending, args.returns)
+        timings = []
+        for transaction_id in loans:
+            started = time.perf_counter()
+            ok, message = return_book(transaction_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert ok and "on hold" in message, message
+        timings.sort()
+        print(
+            f"{pending:>7} pending: {len(timings)} returns, "
+            f"median {statistics.median(timings):.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
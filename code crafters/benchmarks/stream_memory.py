@@ -0,0 +1,93 @@
+"""
+Peak memory of reading a large result with fetch="all", fetch="iter" and
+as_frame=True.
+
+    python -m benchmarks.stream_memory --rows 200000
+
+Loads ``--rows`` returned loans for one patron, then reads them back each
+way under ``tracemalloc``. Streaming should stay flat as ``--rows`` grows;
+``as_frame`` is compared with building the same DataFrame from dict rows,
+which is what ``st.dataframe`` does with a list of dicts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+from database.database import bulk_write, run_query
+
+
+def _setup(rows: int) -> int:
+    tag = uuid.uuid4().hex[:8]
+    run_query(
+        "INSERT INTO books (title, isbn, description) VALUES (%s, %s, %s)",
+        (f"Streaming Benchmark {tag}", f"stream-{tag}", "Streaming benchmark title."),
+        fetch="none",
+    )
+    book_id = run_query("SELECT book_id FROM books WHERE isbn = %s", (f"stream-{tag}",), fetch="one")["book_id"]
+    run_query(
+        "INSERT INTO book_copies (book_id, status, location) VALUES (%s, 'available', 'Bench')",
+        (book_id,),
+        fetch="none",
+    )
+    copy_id = run_query("SELECT copy_id FROM book_copies WHERE book_id = %s", (book_id,), fetch="one")["copy_id"]
+    run_query(
+        "INSERT INTO users (full_name, email, role, password_hash, total_fines) VALUES (%s, %s, 'user', '-', 0)",
+        (f"Stream {tag}", f"stream-{tag}@example.com"),
+        fetch="none",
+    )
+    user_id = run_query("SELECT user_id FROM users WHERE email = %s", (f"stream-{tag}@example.com",), fetch="one")["user_id"]
+
+    start = date(2020, 1, 1)
+    bulk_write(
+        """
+        INSERT INTO borrow_transactions
+        (copy_id, user_id, borrow_date, due_date, return_date, status, fine_amount)
+        VALUES (%s, %s, %s, %s, %s, 'returned', 0)
+        """,
+        (
+            (
+                copy_id,
+                user_id,
+                start + timedelta(days=n % 1000),
+                start + timedelta(days=n % 1000 + 14),
+                start + timedelta(days=n % 1000 + 7),
+            )
+            for n in range(rows)
+        ),
+    )
+    return user_id
+
+
+def _measure(label: str, read) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = read()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {count} rows in {elapsed:.2f}s, peak {peak / 1024 / 1024:.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    user_id = _setup(args.rows)
+    query = "SELECT * FROM borrow_transactions WHERE user_id = %s"
+    _measure("fetch='all' ", lambda: len(run_query(query, (user_id,))))
+    _measure("fetch='iter'", lambda: sum(1 for _ in run_query(query, (user_id,), fetch="iter")))
+
+    import pandas as pd
+
+    _measure("dicts -> frame", lambda: len(pd.DataFrame(run_query(query, (user_id,)))))
+    _measure("as_frame=True", lambda: len(run_query(query, (user_id,), as_frame=True)))
+
+
+if __name__ == "__main__":
+    main()
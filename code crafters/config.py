@@ -17,6 +17,24 @@ DEFAULT_LOAN_DAYS = 14
 MAX_ACTIVE_LOANS = 5
 MAX_FINE_BEFORE_BLOCK = 10.0
 FINE_PER_DAY = 0.50
+# Copies a borrow will try to claim before giving up when racing other borrowers.
+BORROW_CLAIM_ATTEMPTS = 3
+# Full recompute interval for the materialized dashboard metrics.
+METRICS_RECOMPUTE_SECONDS = 3600
+# Pending reservations older than this are expired by the scheduler.
+RESERVATION_EXPIRY_DAYS = 30
+# Days a returned copy stays on hold for the patron at the head of the queue.
+HOLD_DAYS = 3
+# Borrow transactions folded into the circulation rollups per transaction.
+ROLLUP_BATCH_SIZE = 50000
+# MySQL: seconds a loan id may stay uncommitted before the rollups move past it.
+ROLLUP_COMMIT_LAG_SECONDS = 30
+# Rows fetched per round trip by run_query(fetch="iter").
+STREAM_BATCH_SIZE = 1000
+# Parameter sets sent per executemany call by run_transaction and bulk_write.
+BULK_WRITE_CHUNK_SIZE = 500
+# MySQL: the server's innodb_ft_min_token_size; shorter words are not indexed.
+MYSQL_FT_MIN_TOKEN_SIZE = int(os.getenv("MYSQL_FT_MIN_TOKEN_SIZE", 3))
 
 
 def _from_streamlit_secrets(key: str) -> Optional[Any]:
@@ -38,6 +56,20 @@ def get_sqlite_path() -> Path:
     return Path(custom).expanduser() if custom else default
 
 
+def get_sqlite_pool_config() -> Dict[str, Any]:
+    """
+    Pool sizing for SQLite deployments.
+
+    Environment variable overrides use the SQLITE_* convention.
+    """
+    return {
+        "write_size": int(os.getenv("SQLITE_WRITE_POOL_SIZE", 2)),
+        "read_size": int(os.getenv("SQLITE_READ_POOL_SIZE", 8)),
+        "busy_timeout_ms": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "acquire_timeout": float(os.getenv("SQLITE_POOL_TIMEOUT", 10)),
+    }
+
+
 def get_mysql_config() -> Dict[str, Any]:
     """
     Read database credentials from Streamlit secrets or env vars.
@@ -62,6 +94,196 @@ def get_mysql_config() -> Dict[str, Any]:
     return config
 
 
+def get_mysql_pool_config() -> Dict[str, Any]:
+    """
+    Sizing and health-check settings for the MySQL connection pool.
+
+    Environment variable overrides use the MYSQL_POOL_* convention.
+    """
+    return {
+        "min_size": int(os.getenv("MYSQL_POOL_MIN", 1)),
+        "max_size": int(os.getenv("MYSQL_POOL_MAX", 5)),
+        "max_overflow": int(os.getenv("MYSQL_POOL_OVERFLOW", 5)),
+        "acquire_timeout": float(os.getenv("MYSQL_POOL_TIMEOUT", 10)),
+        "recycle_seconds": float(os.getenv("MYSQL_POOL_RECYCLE", 1800)),
+        "ping_after_seconds": float(os.getenv("MYSQL_POOL_PING_AFTER", 30)),
+    }
+
+
+def get_query_cache_config() -> Dict[str, Any]:
+    """
+    Limits for the in-process SELECT result cache used by ``run_query``.
+
+    Set QUERY_CACHE_ENABLED=0 to bypass the cache entirely.
+    QUERY_CACHE_SYNC_SECONDS is how often a worker checks which tables
+    other workers have written; 0 turns the check off for single-process
+    deployments, leaving the TTL as the only bound.
+    """
+    return {
+        "enabled": os.getenv("QUERY_CACHE_ENABLED", "1").lower() not in ("0", "false", "no"),
+        "max_entries": int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 512)),
+        "ttl_seconds": float(os.getenv("QUERY_CACHE_TTL", 30)),
+        "sync_seconds": float(os.getenv("QUERY_CACHE_SYNC_SECONDS", 1)),
+    }
+
+
+def get_query_stats_config() -> Dict[str, Any]:
+    """
+    Statement timing and slow-query log settings.
+
+    Set QUERY_STATS_ENABLED=0 to turn instrumentation off.
+    """
+    return {
+        "enabled": os.getenv("QUERY_STATS_ENABLED", "1").lower() not in ("0", "false", "no"),
+        "slow_query_ms": float(os.getenv("SLOW_QUERY_MS", 250)),
+        "slow_log_size": int(os.getenv("SLOW_QUERY_LOG_SIZE", 100)),
+        "max_statements": int(os.getenv("QUERY_STATS_MAX_STATEMENTS", 1000)),
+    }
+
+
+def get_password_hash_config() -> Dict[str, Any]:
+    """
+    scrypt cost and sizing of the password hashing process pool.
+
+    Changing PASSWORD_SCRYPT_N/R/P re-hashes each password at its owner's
+    next successful login. PASSWORD_HASH_WORKERS=0 hashes on the calling
+    thread instead of in the pool.
+    """
+    return {
+        "scrypt_n": int(os.getenv("PASSWORD_SCRYPT_N", 2**15)),
+        "scrypt_r": int(os.getenv("PASSWORD_SCRYPT_R", 8)),
+        "scrypt_p": int(os.getenv("PASSWORD_SCRYPT_P", 1)),
+        "workers": int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))),
+        "queue_limit": int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 16)),
+        "timeout_seconds": float(os.getenv("PASSWORD_HASH_TIMEOUT", 10)),
+    }
+
+
+def get_login_rate_limit_config() -> Dict[str, Any]:
+    """
+    Token buckets that shed login and registration attempts before any DB
+    or hashing work.
+
+    Each email and each client address has its own bucket holding up to
+    ``*_burst`` attempts and refilling at ``*_per_minute``. At most
+    ``max_keys`` buckets of each kind are kept (least recently used are
+    dropped). ``message`` is shown on rejection; ``{retry_after}`` is
+    replaced with the wait in seconds. Only trust X-Forwarded-For
+    (LOGIN_TRUST_FORWARDED_FOR=1) behind a proxy that sets it.
+    """
+    return {
+        "enabled": os.getenv("LOGIN_RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no"),
+        "email_burst": int(os.getenv("LOGIN_EMAIL_BURST", 5)),
+        "email_per_minute": float(os.getenv("LOGIN_EMAIL_PER_MINUTE", 1)),
+        "client_burst": int(os.getenv("LOGIN_CLIENT_BURST", 30)),
+        "client_per_minute": float(os.getenv("LOGIN_CLIENT_PER_MINUTE", 30)),
+        "max_keys": int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", 10000)),
+        "trust_forwarded_for": os.getenv("LOGIN_TRUST_FORWARDED_FOR", "0").lower() in ("1", "true", "yes"),
+        "message": os.getenv(
+            "LOGIN_RATE_LIMIT_MESSAGE",
+            "Too many sign-in attempts. Please try again in {retry_after} seconds.",
+        ),
+    }
+
+
+def get_session_config() -> Dict[str, Any]:
+    """
+    Server-side session store.
+
+    SESSION_STORE=database (default) keeps sessions in the main database so
+    any worker can resolve any session; "memory" keeps them in this process
+    (single worker only). The browser keeps the token in the
+    SESSION_COOKIE_NAME cookie. Activity is buffered and written every
+    SESSION_TOUCH_FLUSH_SECONDS; idle sessions are deleted every
+    SESSION_SWEEP_SECONDS.
+    """
+    return {
+        "store": os.getenv("SESSION_STORE", "database").lower(),
+        "timeout_minutes": float(os.getenv("SESSION_TIMEOUT_MINUTES", 60)),
+        "touch_flush_seconds": float(os.getenv("SESSION_TOUCH_FLUSH_SECONDS", 30)),
+        "sweep_seconds": float(os.getenv("SESSION_SWEEP_SECONDS", 300)),
+        "cookie_name": os.getenv("SESSION_COOKIE_NAME", "library_session"),
+    }
+
+
+# Seconds between runs of each background job (see utils/jobs.py).
+JOB_INTERVALS: Dict[str, float] = {
+    "accrue_fines": 3600,
+    # Recomputes every open fine even when today's accrual already ran.
+    "accrue_fines_force": 86400,
+    "mark_overdue": 3600,
+    "expire_reservations": 3600,
+    "expire_holds": 900,
+    "refresh_metrics": METRICS_RECOMPUTE_SECONDS,
+    "refresh_rollups": 300,
+    "archive_transactions": 3600,
+    "reconcile_counters": 86400,
+}
+
+
+def get_scheduler_config() -> Dict[str, Any]:
+    """
+    Background job scheduler.
+
+    Every worker process runs the scheduler thread unless
+    SCHEDULER_ENABLED=0 (e.g. when ``python -m utils.jobs`` runs as its own
+    process); per-job leases in the database keep a job from running twice.
+    ``jitter`` is the fraction by which intervals and polls are randomized.
+    """
+    return {
+        "enabled": os.getenv("SCHEDULER_ENABLED", "1").lower() not in ("0", "false", "no"),
+        "intervals": dict(JOB_INTERVALS),
+        "poll_seconds": float(os.getenv("SCHEDULER_POLL_SECONDS", 15)),
+        "jitter": float(os.getenv("SCHEDULER_JITTER", 0.1)),
+        "lease_seconds": float(os.getenv("SCHEDULER_LEASE_SECONDS", 900)),
+        "history_days": int(os.getenv("SCHEDULER_HISTORY_DAYS", 30)),
+    }
+
+
+def get_archive_config() -> Dict[str, Any]:
+    """
+    Archival of returned loans from ``borrow_transactions`` into
+    ``borrow_transactions_archive``.
+
+    Loans returned more than ARCHIVE_AFTER_DAYS ago are moved in
+    transactions of ARCHIVE_BATCH_SIZE rows, pausing ARCHIVE_PAUSE_SECONDS
+    between batches so writers are never held up for long, and at most
+    ARCHIVE_MAX_BATCHES per run. When ARCHIVE_EXPORT_DIR is set each batch
+    is also written there as Parquet, partitioned by borrow year and month
+    (needs pyarrow).
+    """
+    return {
+        "after_days": int(os.getenv("ARCHIVE_AFTER_DAYS", 180)),
+        "batch_size": int(os.getenv("ARCHIVE_BATCH_SIZE", 1000)),
+        "max_batches": int(os.getenv("ARCHIVE_MAX_BATCHES", 100)),
+        "pause_seconds": float(os.getenv("ARCHIVE_PAUSE_SECONDS", 0.05)),
+        "export_dir": os.getenv("ARCHIVE_EXPORT_DIR") or None,
+    }
+
+
+# Database round trips allowed per page render before a warning is logged.
+PAGE_QUERY_BUDGETS: Dict[str, int] = {
+    "Login": 3,
+    "Dashboard": 5,
+    "Catalog": 6,
+    "Profile": 4,
+    "Admin": 10,
+}
+
+
+def get_query_budget_config() -> Dict[str, Any]:
+    """
+    Per-page round-trip budgets for ``request_context``.
+
+    QUERY_BUDGET_STRICT=1 turns an over-budget render into an error (useful
+    in development and CI).
+    """
+    return {
+        "budgets": dict(PAGE_QUERY_BUDGETS),
+        "strict": os.getenv("QUERY_BUDGET_STRICT", "0").lower() in ("1", "true", "yes"),
+    }
+
+
 @dataclass
 class Pagination:
     """Helper dataclass for pagination metadata."""
@@ -73,3 +295,15 @@ class Pagination:
     def offset(self) -> int:
         return (self.page - 1) * self.page_size
 
+
+@dataclass
+class CursorPagination:
+    """
+    Keyset pagination metadata.
+
+    ``after`` is the opaque ``next_cursor`` token from the previous page;
+    ``None`` requests the first page.
+    """
+
+    page_size: int = 10
+    after: Optional[str] = None
@@ -2,5 +2,18 @@
 Database package initialization.
 """
 
-from .database import get_db_connection, run_query, run_transaction
+from .database import (
+    bulk_write,
+    clear_query_cache,
+    dump_query_stats,
+    get_db_connection,
+    get_pool_stats,
+    get_query_cache_stats,
+    get_query_stats,
+    invalidate_cached_tables,
+    reset_query_stats,
+    run_query,
+    run_transaction,
+    transaction,
+)
 
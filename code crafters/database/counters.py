@@ -0,0 +1,31 @@
+"""
+Denormalized availability counters on ``books``.
+
+``books.available_copies`` and ``books.total_copies`` are added by
+migration 7 and maintained by triggers on ``book_copies``, so every path
+that adds, removes, borrows or returns a copy keeps them in step inside its
+own transaction.
+
+Run ``python -m database.counters`` to rebuild them from ``book_copies``.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from database.database import run_query
+from database.migrations import RECONCILE_COPY_COUNTERS
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_availability_counters() -> int:
+    """Rebuild both counters from ``book_copies``; returns the number of books touched."""
+    updated = run_query(RECONCILE_COPY_COUNTERS, fetch="none")
+    logger.info("Reconciled availability counters for %s books", updated)
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    reconcile_availability_counters()
@@ -1,27 +1,74 @@
 """
 Low-level database helpers built on top of mysql-connector.
+
+The backend driver and the SQLite bootstrap are imported on first use, so
+importing this module costs neither ``mysql.connector`` on SQLite nor the
+bootstrap code once a worker is warm.
 """
 
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
-
-import mysql.connector
-from mysql.connector import Error, pooling
-import sqlite3
+from itertools import groupby, islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from config import get_db_backend, get_mysql_config, get_sqlite_path
-from database.sqlite_bootstrap import bootstrap_sqlite
+from config import (
+    BULK_WRITE_CHUNK_SIZE,
+    STREAM_BATCH_SIZE,
+    get_db_backend,
+    get_mysql_config,
+    get_mysql_pool_config,
+    get_query_cache_config,
+    get_query_stats_config,
+    get_sqlite_path,
+    get_sqlite_pool_config,
+)
+from database.frames import cursor_to_frame
+from database.instrumentation import QueryStats
+from database.pool import MySQLConnectionPoolManager, SQLiteConnectionPool
+from database.query_cache import CACHED_TABLES, QueryCache, affected_tables, table_written, tables_read
+from database.request_context import current_request
 
 logger = logging.getLogger(__name__)
 
-_pool: Optional[pooling.MySQLConnectionPool] = None
-_sqlite_conn: Optional[sqlite3.Connection] = None
-_sqlite_bootstrapped = False
+_pool: Optional[MySQLConnectionPoolManager] = None
+_sqlite_pool: Optional[SQLiteConnectionPool] = None
+_pool_lock = threading.Lock()
+_sqlite_lock = threading.Lock()
 _DB_BACKEND = get_db_backend()
 
+_cache_config = get_query_cache_config()
+_QUERY_CACHE_ENABLED = _cache_config.pop("enabled")
+_CACHE_SYNC_SECONDS = _cache_config.pop("sync_seconds")
+_query_cache = QueryCache(**_cache_config)
+_cache_synced_at = 0.0
+_cache_sync_lock = threading.Lock()
+_unsynced_reads: set = set()
+
+# Per-table write versions in maintenance_state, bumped in the writer's own
+# transaction so other worker processes drop their cached reads of the table.
+_CACHE_VERSION_PREFIX = "cache_version."
+_BUMP_CACHE_VERSION = {
+    "sqlite": """
+        INSERT INTO maintenance_state (name, value) VALUES (%s, '1')
+        ON CONFLICT (name) DO UPDATE SET value = value + 1, updated_at = CURRENT_TIMESTAMP
+    """,
+    "mysql": """
+        INSERT INTO maintenance_state (name, value) VALUES (%s, '1')
+        ON DUPLICATE KEY UPDATE value = value + 1, updated_at = CURRENT_TIMESTAMP
+    """,
+}
+
+_stats_config = get_query_stats_config()
+_QUERY_STATS_ENABLED = _stats_config.pop("enabled")
+_query_stats = QueryStats(**_stats_config)
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
 
 def _prepare_sql(query: str) -> str:
     if _DB_BACKEND == "sqlite":
@@ -29,109 +76,448 @@ def _prepare_sql(query: str) -> str:
     return query
 
 
-def _ensure_pool() -> pooling.MySQLConnectionPool:
-    """Create a global connection pool reused across the app."""
+def _ensure_pool() -> MySQLConnectionPoolManager:
+    """Create a global connection pool reused across the app and migrate the schema once."""
     global _pool
     if _pool is None:
-        config = get_mysql_config()
-        try:
-            _pool = pooling.MySQLConnectionPool(
-                pool_name="library_pool",
-                pool_size=5,
-                pool_reset_session=True,
-                **config,
-            )
-        except Error as exc:
-            logger.error("Unable to create connection pool: %s", exc)
-            raise
+        with _pool_lock:
+            if _pool is None:
+                from mysql.connector import Error
+
+                from database.migrations import apply_migrations
+
+                try:
+                    pool = MySQLConnectionPoolManager(
+                        get_mysql_config(), **get_mysql_pool_config()
+                    )
+                    with pool.connection() as conn:
+                        apply_migrations(conn, "mysql")
+                except Error as exc:
+                    logger.error("Unable to create connection pool: %s", exc)
+                    raise
+                _pool = pool
     return _pool
 
 
-def _ensure_sqlite_conn() -> sqlite3.Connection:
-    """Create a singleton SQLite connection."""
-    global _sqlite_conn, _sqlite_bootstrapped
-    if _sqlite_conn is None:
-        db_path = get_sqlite_path()
-        db_path.parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        bootstrap_sqlite(conn)
-        _sqlite_conn = conn
-        _sqlite_bootstrapped = True
-    elif not _sqlite_bootstrapped:
-        conn = _sqlite_conn
-        conn.execute("PRAGMA foreign_keys = ON;")
-        bootstrap_sqlite(conn)
-        _sqlite_bootstrapped = True
-    return _sqlite_conn
+def _ensure_sqlite_pool() -> SQLiteConnectionPool:
+    """Create the process-wide SQLite pool and bootstrap the schema once."""
+    global _sqlite_pool
+    if _sqlite_pool is None:
+        with _sqlite_lock:
+            if _sqlite_pool is None:
+                from database.sqlite_bootstrap import bootstrap_sqlite
+
+                db_path = get_sqlite_path()
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                pool = SQLiteConnectionPool(db_path, **get_sqlite_pool_config())
+                with pool.connection() as conn:
+                    bootstrap_sqlite(conn)
+                _sqlite_pool = pool
+    return _sqlite_pool
+
+
+def _is_read_only(query: str) -> bool:
+    head = query.lstrip().split(None, 1)
+    return bool(head) and head[0].upper() in ("SELECT", "WITH")
 
 
 @contextmanager
-def get_db_connection():
-    """Context manager yielding a connection for the configured backend."""
+def get_db_connection(*, readonly: bool = False):
+    """
+    Context manager yielding a connection for the configured backend.
+
+    ``readonly`` routes SQLite callers to the reader pool; MySQL ignores it.
+    """
     if _DB_BACKEND == "sqlite":
-        conn = _ensure_sqlite_conn()
-        try:
+        with _ensure_sqlite_pool().connection(readonly=readonly) as conn:
             yield conn
-        finally:
-            # SQLite connection is reused globally; do not close here.
-            pass
     else:
-        pool = _ensure_pool()
-        conn = pool.get_connection()
-        try:
+        with _ensure_pool().connection() as conn:
             yield conn
-        finally:
-            conn.close()
 
 
-def run_query(
-    query: str,
-    params: Optional[Union[Tuple[Any, ...], List[Any]]] = None,
-    *,
-    fetch: str = "all",
-    dictionary: bool = True,
-) -> Union[List[Dict[str, Any]], Dict[str, Any], int, None]:
+def get_pool_stats() -> Dict[str, Any]:
+    """Live connection-pool statistics for the configured backend."""
+    if _DB_BACKEND == "sqlite":
+        return _ensure_sqlite_pool().stats()
+    return _ensure_pool().stats()
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the SELECT result cache."""
+    return {"enabled": _QUERY_CACHE_ENABLED, **_query_cache.stats()}
+
+
+def invalidate_cached_tables(*tables: str) -> None:
+    """Evict cached results that read any of ``tables``, in every worker."""
+    _query_cache.invalidate(tables)
+    _publish_writes(tables)
+
+
+def _bump_shared_versions(cursor, tables: Iterable[str]) -> None:
     """
-    Execute a single query and optionally fetch rows.
+    Bump the shared version of every cached table among ``tables``.
 
-    fetch: "all" (default), "one", or "none". When "none", the affected-row
-    count is returned.
+    Runs on the writer's cursor before it commits, so the bump costs no
+    extra transaction and never outlives a rolled-back write.
     """
+    if not (_QUERY_CACHE_ENABLED and _CACHE_SYNC_SECONDS):
+        return
+    names = sorted(affected_tables(tables) & CACHED_TABLES)
+    if names:
+        cursor.executemany(
+            _prepare_sql(_BUMP_CACHE_VERSION[_DB_BACKEND]),
+            [(_CACHE_VERSION_PREFIX + name,) for name in names],
+        )
+
+
+def _publish_writes(tables: Iterable[str]) -> None:
+    """Bump the shared versions for a write made outside ``run_query``/``transaction``."""
+    if not (_QUERY_CACHE_ENABLED and _CACHE_SYNC_SECONDS):
+        return
     with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            _bump_shared_versions(cursor, tables)
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def _sync_shared_versions() -> None:
+    """At most every ``QUERY_CACHE_SYNC_SECONDS``, evict reads of tables other workers wrote."""
+    global _cache_synced_at
+    now = time.monotonic()
+    with _cache_sync_lock:
+        if now - _cache_synced_at < _CACHE_SYNC_SECONDS:
+            return
+        _cache_synced_at = now
+    with get_db_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                _prepare_sql("SELECT name, value FROM maintenance_state WHERE name > %s AND name < %s"),
+                # Every name with the prefix sorts between "cache_version." and "cache_version/".
+                (_CACHE_VERSION_PREFIX, _CACHE_VERSION_PREFIX[:-1] + "/"),
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    _query_cache.apply_shared_versions(
+        {row[0][len(_CACHE_VERSION_PREFIX):]: str(row[1]) for row in rows}
+    )
+
+
+def clear_query_cache() -> None:
+    _query_cache.clear()
+
+
+def get_query_stats() -> Dict[str, Any]:
+    """Per-statement timings and the slow-query log for this process."""
+    return {"enabled": _QUERY_STATS_ENABLED, **_query_stats.report()}
+
+
+def reset_query_stats() -> None:
+    _query_stats.reset()
+
+
+def dump_query_stats(path: Union[str, Path]) -> Path:
+    """Write ``get_query_stats()`` to ``path`` as JSON."""
+    return _query_stats.dump(path)
+
+
+def _explain(cursor, query: str, params) -> List[str]:
+    head = query.lstrip().split(None, 1)
+    if not head or head[0].upper() not in _EXPLAINABLE:
+        return []
+    prefix = "EXPLAIN QUERY PLAN " if _DB_BACKEND == "sqlite" else "EXPLAIN "
+    cursor.execute(prefix + _prepare_sql(query), params or ())
+    names = [column[0] for column in cursor.description]
+    plan = []
+    for row in cursor.fetchall():
+        values = dict(zip(names, tuple(row.values()) if isinstance(row, dict) else tuple(row)))
+        if "detail" in values:
+            plan.append(values["detail"])
+        else:
+            plan.append(
+                f"{values.get('table')}: type={values.get('type')} key={values.get('key')} "
+                f"rows={values.get('rows')} {values.get('Extra') or ''}".rstrip()
+            )
+    return plan
+
+
+def _explain_on(conn, query: str, params) -> List[str]:
+    cursor = conn.cursor() if _DB_BACKEND == "sqlite" else conn.cursor(buffered=True)
+    try:
+        return _explain(cursor, query, params)
+    finally:
+        cursor.close()
+
+
+def _record(query: str, elapsed: float, rows: int, wait: float, explain) -> None:
+    request = current_request()
+    if request is not None:
+        request.round_trips += 1
+    if _QUERY_STATS_ENABLED:
+        _query_stats.record(query, elapsed, rows, wait, explain)
+
+
+def _execute_query(
+    query: str,
+    params: Optional[Union[Tuple[Any, ...], List[Any]]],
+    fetch: str,
+    dictionary: bool,
+    as_frame: bool = False,
+) -> Union[List[Dict[str, Any]], Dict[str, Any], int, None]:
+    readonly = fetch != "none" and _is_read_only(query)
+    acquire_started = time.perf_counter()
+    with get_db_connection(readonly=readonly) as conn:
+        wait = time.perf_counter() - acquire_started
         sql = _prepare_sql(query)
         if _DB_BACKEND == "sqlite":
             cursor = conn.cursor()
         else:
-            cursor = conn.cursor(dictionary=dictionary)
+            cursor = conn.cursor(dictionary=dictionary and not as_frame)
+        started = time.perf_counter()
         try:
             cursor.execute(sql, params or ())
-            if fetch == "all":
-                rows = cursor.fetchall()
+            if as_frame:
+                result = cursor_to_frame(cursor, STREAM_BATCH_SIZE)
+                count = len(result)
+            elif fetch == "all":
+                result = cursor.fetchall()
                 if _DB_BACKEND == "sqlite" and dictionary:
-                    return [dict(row) for row in rows]
-                return rows
-            if fetch == "one":
-                row = cursor.fetchone()
-                if _DB_BACKEND == "sqlite" and dictionary and row is not None:
-                    return dict(row)
-                return row
-            conn.commit()
-            return cursor.rowcount
+                    result = [dict(row) for row in result]
+                count = len(result)
+            elif fetch == "one":
+                result = cursor.fetchone()
+                if _DB_BACKEND == "sqlite" and dictionary and result is not None:
+                    result = dict(result)
+                count = int(result is not None)
+            else:
+                result = count = cursor.rowcount
+                written = table_written(query)
+                if written and count:
+                    _bump_shared_versions(cursor, (written,))
+                conn.commit()
         finally:
             cursor.close()
+        _record(
+            query, time.perf_counter() - started, count, wait,
+            lambda: _explain_on(conn, query, params),
+        )
+        return result
+
+
+def _iter_query(
+    query: str,
+    params: Optional[Union[Tuple[Any, ...], List[Any]]],
+    dictionary: bool,
+    batch_size: int,
+) -> Iterator[Any]:
+    # Nothing is acquired until the first next(); the connection goes back
+    # to the pool when the generator is exhausted, closed or collected.
+    # Only time spent in the driver counts, not time the caller spends
+    # between batches.
+    acquire_started = time.perf_counter()
+    with get_db_connection(readonly=_is_read_only(query)) as conn:
+        wait = time.perf_counter() - acquire_started
+        sql = _prepare_sql(query)
+        if _DB_BACKEND == "sqlite":
+            cursor = conn.cursor()
+        else:
+            # Unbuffered: rows stay on the server until fetchmany asks for them.
+            cursor = conn.cursor(dictionary=dictionary, buffered=False)
+        exhausted = False
+        elapsed = 0.0
+        count = 0
+        try:
+            started = time.perf_counter()
+            cursor.execute(sql, params or ())
+            elapsed += time.perf_counter() - started
+            while True:
+                started = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    exhausted = True
+                    break
+                count += len(rows)
+                if _DB_BACKEND == "sqlite" and dictionary:
+                    rows = [dict(row) for row in rows]
+                yield from rows
+        finally:
+            if not exhausted and _DB_BACKEND != "sqlite":
+                # Drain the rest of the result so the connection is reusable.
+                conn.consume_results()
+            cursor.close()
+        _record(query, elapsed, count, wait, lambda: _explain_on(conn, query, params))
+
+
+def run_query(
+    query: str,
+    params: Optional[Union[Tuple[Any, ...], List[Any]]] = None,
+    *,
+    fetch: str = "all",
+    dictionary: bool = True,
+    cache: bool = False,
+    cache_ttl: Optional[float] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    as_frame: bool = False,
+) -> Union[List[Dict[str, Any]], Dict[str, Any], Iterator[Any], int, None]:
+    """
+    Execute a single query and optionally fetch rows.
+
+    fetch: "all" (default), "one", "iter", or "none". When "none", the
+    affected-row count is returned. "iter" returns a generator that streams
+    rows in ``batch_size`` round trips and holds a pooled connection until
+    it is exhausted or closed; it is never cached.
 
+    as_frame: with fetch="all", return a pandas DataFrame built column by
+    column from the cursor, with typed date and decimal columns.
 
-def run_transaction(queries: Iterable[Tuple[str, Tuple[Any, ...]]]) -> None:
+    cache: serve repeated reads from the in-process result cache. Cached
+    entries are evicted as soon as any write through ``run_query`` or
+    ``run_transaction`` touches a table they read, and within
+    ``QUERY_CACHE_SYNC_SECONDS`` when the write came from another worker.
     """
-    Execute multiple queries atomically.
+    if fetch == "iter":
+        return _iter_query(query, params, dictionary, batch_size)
+    if as_frame and fetch != "all":
+        raise ValueError('as_frame requires fetch="all".')
+
+    # Identical reads within one script run are answered from its memo.
+    request = current_request()
+    memo_key = None
+    if request is not None and fetch != "none" and _is_read_only(query):
+        memo_key = QueryCache.make_key(query, params or (), fetch, dictionary, as_frame)
+        hit, result = request.lookup(memo_key)
+        if hit:
+            return result
+
+    if cache and _QUERY_CACHE_ENABLED and fetch != "none":
+        if _CACHE_SYNC_SECONDS:
+            _sync_shared_versions()
+        key = QueryCache.make_key(query, params or (), fetch, dictionary, as_frame)
+        hit, result = _query_cache.lookup(key)
+        if not hit:
+            tables = tables_read(query)
+            if _CACHE_SYNC_SECONDS and not tables <= CACHED_TABLES and tables not in _unsynced_reads:
+                _unsynced_reads.add(tables)
+                logger.warning(
+                    "Cached read of %s is not invalidated across workers; add it to CACHED_TABLES",
+                    ", ".join(sorted(tables - CACHED_TABLES)),
+                )
+            versions = _query_cache.versions(tables)
+            result = _execute_query(query, params, fetch, dictionary, as_frame)
+            _query_cache.put(key, tables, result, versions, cache_ttl)
+    else:
+        result = _execute_query(query, params, fetch, dictionary, as_frame)
+
+    if memo_key is not None:
+        request.remember(memo_key, result)
+    elif fetch == "none":
+        written = table_written(query)
+        if written and result:
+            _query_cache.invalidate((written,))
+        if request is not None:
+            request.forget_reads()
+    return result
+
+
+class TransactionCursor:
     """
+    Cursor handed out by ``transaction()``.
+
+    Placeholders use the ``%s`` style on both backends and rows come back
+    as dicts. Tables it changes rows in are evicted from the query cache
+    once the transaction commits. Every statement is timed; the wait for
+    the transaction's connection is charged to the first one.
+    """
+
+    def __init__(self, cursor, wait: float = 0.0) -> None:
+        self._cursor = cursor
+        self._wait = wait
+        self.written: set = set()
+
+    def _track(self, query: str, rowcount: int) -> None:
+        table = table_written(query)
+        if table and rowcount:
+            self.written.add(table)
+
+    def _record(self, query: str, params, started: float, rows: int) -> None:
+        wait, self._wait = self._wait, 0.0
+        _record(
+            query, time.perf_counter() - started, rows, wait,
+            lambda: _explain(self._cursor, query, params),
+        )
+
+    def execute(self, query: str, params: Union[Tuple[Any, ...], List[Any]] = ()) -> int:
+        """Run a statement and return its affected-row count."""
+        started = time.perf_counter()
+        self._cursor.execute(_prepare_sql(query), params)
+        rowcount = self._cursor.rowcount
+        self._track(query, rowcount)
+        self._record(query, params, started, rowcount)
+        return rowcount
+
+    def execute_many(self, query: str, param_sets: Iterable[Union[Tuple[Any, ...], List[Any]]]) -> int:
+        """
+        Run one statement for each parameter set with a single ``executemany``.
+
+        mysql-connector rewrites ``INSERT ... VALUES`` into one multi-row
+        insert. Returns the total affected-row count.
+        """
+        param_sets = list(param_sets)
+        started = time.perf_counter()
+        self._cursor.executemany(_prepare_sql(query), param_sets)
+        rowcount = self._cursor.rowcount
+        self._track(query, rowcount)
+        self._record(query, param_sets[0] if param_sets else (), started, rowcount)
+        return rowcount
+
+    def fetch_one(
+        self, query: str, params: Union[Tuple[Any, ...], List[Any]] = ()
+    ) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        self._cursor.execute(_prepare_sql(query), params)
+        row = self._cursor.fetchone()
+        self._record(query, params, started, int(row is not None))
+        return dict(row) if row is not None else None
+
+    def fetch_all(
+        self, query: str, params: Union[Tuple[Any, ...], List[Any]] = ()
+    ) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        self._cursor.execute(_prepare_sql(query), params)
+        rows = [dict(row) for row in self._cursor.fetchall()]
+        self._record(query, params, started, len(rows))
+        return rows
+
+
+@contextmanager
+def transaction():
+    """
+    Run a block of reads and writes as one atomic transaction.
+
+    SQLite takes the write lock up front (``BEGIN IMMEDIATE``) so reads made
+    inside the block cannot be invalidated by another writer before commit;
+    on MySQL use ``SELECT ... FOR UPDATE`` for rows the decision depends on.
+    Commits when the block exits normally and rolls back on any exception.
+    """
+    acquire_started = time.perf_counter()
     with get_db_connection() as conn:
-        cursor = conn.cursor()
+        wait = time.perf_counter() - acquire_started
+        if _DB_BACKEND == "sqlite":
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+        else:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+        tx = TransactionCursor(cursor, wait)
         try:
-            for query, params in queries:
-                cursor.execute(_prepare_sql(query), params)
+            yield tx
+            if tx.written:
+                _bump_shared_versions(cursor, tx.written)
             conn.commit()
         except Exception as exc:  # sqlite3 and mysql share similar handling
             conn.rollback()
@@ -139,4 +525,59 @@ def run_transaction(queries: Iterable[Tuple[str, Tuple[Any, ...]]]) -> None:
             raise
         finally:
             cursor.close()
+    if tx.written:
+        _query_cache.invalidate(tx.written)
+        request = current_request()
+        if request is not None:
+            request.forget_reads()
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_transaction(queries: Iterable[Tuple[str, Tuple[Any, ...]]]) -> List[int]:
+    """
+    Execute multiple queries atomically.
 
+    Consecutive entries with identical SQL are sent together with
+    ``executemany`` in chunks of ``BULK_WRITE_CHUNK_SIZE``. Returns one
+    affected-row count per entry, in order; entries sent as part of such a
+    group report -1 because the driver only knows the group total.
+    """
+    rowcounts: List[int] = []
+    with transaction() as tx:
+        for query, entries in groupby(queries, key=lambda entry: entry[0]):
+            param_sets = [params for _, params in entries]
+            if len(param_sets) == 1:
+                rowcounts.append(tx.execute(query, param_sets[0]))
+                continue
+            for chunk in _chunks(param_sets, BULK_WRITE_CHUNK_SIZE):
+                tx.execute_many(query, chunk)
+            rowcounts.extend([-1] * len(param_sets))
+    return rowcounts
+
+
+def bulk_write(
+    query: str,
+    param_sets: Iterable[Union[Tuple[Any, ...], List[Any]]],
+    *,
+    chunk_size: int = BULK_WRITE_CHUNK_SIZE,
+) -> int:
+    """
+    Run one write statement for every parameter set in a single transaction.
+
+    ``param_sets`` may be any iterable, including a generator; only
+    ``chunk_size`` sets are held in memory at a time. Returns the total
+    affected-row count.
+    """
+    total = 0
+    with transaction() as tx:
+        for chunk in _chunks(param_sets, chunk_size):
+            total += max(tx.execute_many(query, chunk), 0)
+    return total
@@ -0,0 +1,57 @@
+"""
+Columnar results: build pandas DataFrames straight from cursor batches.
+
+``cursor_to_frame`` (behind ``run_query(as_frame=True)``) gathers values
+column by column from ``fetchmany`` batches instead of boxing them into one
+dict per row first. Date and datetime columns become ``datetime64``
+(SQLite's ISO text included) and DECIMAL columns ``float64``. pandas is
+imported on first use only.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import date
+from decimal import Decimal
+from typing import Any, List, Sequence
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$")
+
+
+def _first_value(values: Sequence[Any]) -> Any:
+    return next((value for value in values if value is not None), None)
+
+
+def _typed_column(values: List[Any]):
+    import numpy as np
+    import pandas as pd
+
+    sample = _first_value(values)
+    if isinstance(sample, date) or (isinstance(sample, str) and _ISO_DATE.match(sample)):
+        return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce")
+    if isinstance(sample, Decimal):
+        return np.array([np.nan if value is None else float(value) for value in values], dtype="float64")
+    return pd.Series(values)
+
+
+def _frame(names: Sequence[str], columns: Sequence[List[Any]]):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {name: _typed_column(values) for name, values in zip(names, columns)},
+        columns=list(names),
+    )
+
+
+def cursor_to_frame(cursor, batch_size: int):
+    """Drain an executed cursor (rows as tuples) into a typed DataFrame."""
+    names = [column[0] for column in cursor.description or ()]
+    columns: List[List[Any]] = [[] for _ in names]
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for values, column in zip(zip(*batch), columns):
+            column.extend(values)
+    return _frame(names, columns)
+
@@ -0,0 +1,169 @@
+"""
+Per-statement timing for everything sent through ``run_query`` and
+``transaction()``.
+
+Statements are grouped by their whitespace-normalized SQL. Each group keeps
+call and row counts, connection wait time and a fixed-bucket latency
+histogram from which p50/p95/p99 are read. Executions slower than the
+configured threshold also land in a bounded slow-query log together with
+the ``EXPLAIN`` plan of that statement (captured once per statement).
+Parameters are never recorded. Statistics are per process.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+from database.query_cache import normalize_sql
+
+logger = logging.getLogger("database.slow_queries")
+
+# Upper bounds (ms) of the latency histogram buckets; one overflow bucket follows.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+OTHER_STATEMENTS = "(other statements)"
+
+
+@dataclass
+class StatementStats:
+    statement: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    wait_ms: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+
+    def add(self, elapsed_ms: float, rows: int, wait_ms: float) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.wait_ms += wait_ms
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+            len(LATENCY_BUCKETS_MS),
+        )
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls, capped at the max seen."""
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "wait_ms": round(self.wait_ms, 3),
+        }
+
+
+class QueryStats:
+    """Thread-safe statement statistics and slow-query log."""
+
+    def __init__(self, slow_query_ms: float, slow_log_size: int, max_statements: int) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements: Dict[str, StatementStats] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._plans: Dict[str, List[str]] = {}
+        self._since = datetime.utcnow()
+
+    def record(
+        self,
+        query: str,
+        elapsed_s: float,
+        rows: int = 0,
+        wait_s: float = 0.0,
+        explain: Optional[Callable[[], List[str]]] = None,
+    ) -> None:
+        statement = normalize_sql(query)
+        elapsed_ms = elapsed_s * 1000
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                # Bound memory when SQL is built dynamically (IN lists, ...).
+                key = statement if len(self._statements) < self.max_statements else OTHER_STATEMENTS
+                stats = self._statements.setdefault(key, StatementStats(key))
+            stats.add(elapsed_ms, rows, wait_s * 1000)
+            if elapsed_ms < self.slow_query_ms:
+                return
+            plan = self._plans.get(statement)
+        if plan is None and explain is not None:
+            plan = self._explain(explain)
+            with self._lock:
+                self._plans[statement] = plan
+        entry = {
+            "at": datetime.utcnow().isoformat(timespec="seconds"),
+            "statement": statement,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "plan": plan or [],
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
+    @staticmethod
+    def _explain(explain: Callable[[], List[str]]) -> List[str]:
+        try:
+            return explain()
+        except Exception as exc:  # DDL, temp tables on another connection, ...
+            return [f"EXPLAIN unavailable: {exc}"]
+
+    def statements(self) -> List[Dict[str, Any]]:
+        """Per-statement summaries, most total time first."""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._statements.values()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Slow-query log, newest first."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+            self._plans.clear()
+            self._since = datetime.utcnow()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "since": self._since.isoformat(timespec="seconds"),
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "slow_query_ms": self.slow_query_ms,
+            "statements": self.statements(),
+            "slow_queries": self.slow_queries(),
+        }
+
+    def dump(self, path: Union[str, Path]) -> Path:
+        """Write ``report()`` as JSON to ``path`` and return it."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2, default=str))
+        return path
@@ -0,0 +1,523 @@
+"""
+Versioned schema migrations shared by the SQLite and MySQL backends.
+
+Each migration has a version, a name and the statements to run on each
+backend. Applied versions are recorded in ``schema_version``; pending ones
+run in order exactly once, even when several worker processes start at the
+same time: SQLite applies them under ``BEGIN IMMEDIATE`` and MySQL under a
+named advisory lock.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MYSQL_LOCK_NAME = "library_schema_migrations"
+MYSQL_LOCK_TIMEOUT = 60
+
+SCHEMA_VERSION_DDL = {
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """,
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(128) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """,
+}
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sqlite: Tuple[str, ...]
+    mysql: Tuple[str, ...]
+
+
+def _indexes(*definitions: Tuple[str, str, str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    sqlite = tuple(
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        for name, table, columns in definitions
+    )
+    mysql = tuple(f"CREATE INDEX {name} ON {table} ({columns})" for name, table, columns in definitions)
+    return sqlite, mysql
+
+
+# Every filter/sort in utils/helpers.py and the admin reports maps to one of
+# these; run ``python -m utils.query_plans`` to check the plans.
+_HELPER_INDEXES = _indexes(
+    # fetch_active_loans, borrow_book's active-loan count
+    ("idx_bt_user_status", "borrow_transactions", "user_id, status"),
+    # fetch_user_transactions(_page): newest-first keyset per user
+    ("idx_bt_user_borrowed", "borrow_transactions", "user_id, borrow_date, transaction_id"),
+    # fine accrual and the overdue report
+    ("idx_bt_status_due", "borrow_transactions", "status, due_date"),
+    # joins from loans to copies
+    ("idx_bt_copy", "borrow_transactions", "copy_id"),
+    # borrow_book's free-copy claim
+    ("idx_copies_book_status", "book_copies", "book_id, status"),
+    # create_reservation's duplicate check
+    ("idx_reservations_user_book_status", "reservations", "user_id, book_id, status"),
+    # catalog keyset order, with and without the category filter
+    ("idx_books_title", "books", "title, book_id"),
+    ("idx_books_category", "books", "category_id, title, book_id"),
+    # author lookups from book details and the search triggers
+    ("idx_book_authors_author", "book_authors", "author_id"),
+    # admin user table keyset order
+    ("idx_users_created", "users", "created_at, user_id"),
+)
+
+# Server-side sessions (auth/sessions.py). The key is the SHA-256 of the
+# browser's token; every request resolves its session with one lookup on it.
+_SESSIONS = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            profile TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            last_active TEXT NOT NULL,
+            profile_synced_at TEXT NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active)",
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key CHAR(64) PRIMARY KEY,
+            user_id INT NOT NULL,
+            profile TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            last_active DATETIME NOT NULL,
+            profile_synced_at DATETIME NOT NULL,
+            INDEX idx_sessions_last_active (last_active),
+            CONSTRAINT fk_sessions_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        )
+        """,
+    ),
+)
+
+# Background scheduler (utils/scheduler.py): one row per job carrying its
+# next due time and a lease, plus the run history. The reservation index
+# serves the expiry job.
+_SCHEDULER = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            job_name TEXT PRIMARY KEY,
+            next_run_at TEXT NOT NULL,
+            locked_by TEXT,
+            locked_until TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT NOT NULL,
+            worker TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs (job_name, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_reservations_status_created ON reservations (status, created_at)",
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            job_name VARCHAR(64) PRIMARY KEY,
+            next_run_at DATETIME NOT NULL,
+            locked_by VARCHAR(128),
+            locked_until DATETIME
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            run_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            job_name VARCHAR(64) NOT NULL,
+            worker VARCHAR(128) NOT NULL,
+            started_at DATETIME NOT NULL,
+            duration_ms DOUBLE NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            result VARCHAR(255),
+            INDEX idx_job_runs_job_started (job_name, started_at)
+        )
+        """,
+        "CREATE INDEX idx_reservations_status_created ON reservations (status, created_at)",
+    ),
+)
+
+# Reservation queues (utils/reservations.py). The queue index orders each
+# book's pending reservations FIFO; ties fall back to reservation_id, which
+# both engines keep in every secondary index. The hold index serves expiry.
+# MySQL status columns are widened for the new 'ready', 'expired' and
+# 'on_hold' states.
+_RESERVATION_QUEUE = (
+    (
+        "ALTER TABLE reservations ADD COLUMN copy_id INTEGER REFERENCES book_copies(copy_id)",
+        "ALTER TABLE reservations ADD COLUMN hold_expires_at TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_reservations_queue ON reservations (book_id, status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_reservations_hold ON reservations (status, hold_expires_at)",
+    ),
+    (
+        """
+        ALTER TABLE reservations
+            MODIFY status VARCHAR(16) NOT NULL DEFAULT 'pending',
+            ADD COLUMN copy_id INT NULL,
+            ADD COLUMN hold_expires_at DATETIME NULL
+        """,
+        "ALTER TABLE book_copies MODIFY status VARCHAR(16) NOT NULL DEFAULT 'available'",
+        "CREATE INDEX idx_reservations_queue ON reservations (book_id, status, created_at)",
+        "CREATE INDEX idx_reservations_hold ON reservations (status, hold_expires_at)",
+    ),
+)
+
+# Daily circulation rollups (utils/rollups.py), keyed so a date range is a
+# primary-key range read. Books without a category roll up under 0.
+_CIRCULATION_ROLLUPS = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS circulation_daily_books (
+            day TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrows INTEGER NOT NULL,
+            PRIMARY KEY (day, book_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS circulation_daily_categories (
+            day TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            borrows INTEGER NOT NULL,
+            PRIMARY KEY (day, category_id)
+        ) WITHOUT ROWID
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS circulation_daily_books (
+            day DATE NOT NULL,
+            book_id INT NOT NULL,
+            borrows INT NOT NULL,
+            PRIMARY KEY (day, book_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS circulation_daily_categories (
+            day DATE NOT NULL,
+            category_id INT NOT NULL,
+            borrows INT NOT NULL,
+            PRIMARY KEY (day, category_id)
+        )
+        """,
+    ),
+)
+
+# Archive of returned loans (utils/archive.py). Rows keep their
+# transaction_id, so the two tables never overlap. The status/return_date
+# index finds loans old enough to move.
+_TRANSACTION_ARCHIVE = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS borrow_transactions_archive (
+            transaction_id INTEGER PRIMARY KEY,
+            copy_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            status TEXT NOT NULL,
+            fine_amount REAL NOT NULL DEFAULT 0,
+            archived_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_bta_user_borrowed ON borrow_transactions_archive (user_id, borrow_date, transaction_id)",
+        "CREATE INDEX IF NOT EXISTS idx_bt_status_returned ON borrow_transactions (status, return_date)",
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS borrow_transactions_archive (
+            transaction_id INT PRIMARY KEY,
+            copy_id INT NOT NULL,
+            user_id INT NOT NULL,
+            borrow_date DATE NOT NULL,
+            due_date DATE NOT NULL,
+            return_date DATE NULL,
+            status VARCHAR(16) NOT NULL,
+            fine_amount DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            archived_at DATETIME NOT NULL,
+            INDEX idx_bta_user_borrowed (user_id, borrow_date, transaction_id)
+        )
+        """,
+        "CREATE INDEX idx_bt_status_returned ON borrow_transactions (status, return_date)",
+    ),
+)
+
+# Availability counters on books (database/counters.py), maintained by
+# triggers on book_copies so every path that adds, removes, borrows or
+# returns a copy keeps them in step inside its own transaction.
+RECONCILE_COPY_COUNTERS = """
+    UPDATE books
+    SET total_copies = (
+            SELECT COUNT(*) FROM book_copies bc WHERE bc.book_id = books.book_id
+        ),
+        available_copies = (
+            SELECT COUNT(*) FROM book_copies bc
+            WHERE bc.book_id = books.book_id AND bc.status = 'available'
+        )
+"""
+
+_COUNT_DELTA = """
+        UPDATE books
+        SET total_copies = total_copies {sign} 1,
+            available_copies = available_copies {sign} ({row}.status = 'available')
+        WHERE book_id = {row}.book_id;
+"""
+
+# Full-text catalog search on MySQL (database/search_index.py): one
+# book_search row per book under a FULLTEXT index, kept in sync by triggers.
+# SQLite builds its FTS5 table in sqlite_bootstrap, where a Python without
+# FTS5 falls back to LIKE search.
+_MYSQL_AUTHOR_LIST = """
+    SELECT COALESCE(GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) SEPARATOR ' '), '')
+    FROM book_authors ba
+    JOIN authors a ON a.author_id = ba.author_id
+    WHERE ba.book_id = {book_id}
+"""
+
+MYSQL_SEARCH_REBUILD: Tuple[str, ...] = (
+    "DELETE FROM book_search",
+    f"""
+    INSERT INTO book_search (book_id, title, isbn, authors, description)
+    SELECT b.book_id, b.title, b.isbn, ({_MYSQL_AUTHOR_LIST.format(book_id="b.book_id")}),
+           COALESCE(b.description, '')
+    FROM books b
+    """,
+)
+
+# Tables and triggers the counters, the search index, the dashboard metrics
+# (utils/metrics.py) and the job watermarks (database/state.py) rely on.
+# The counters and the search table are filled from the existing rows.
+_DERIVED_STATE = (
+    (
+        "ALTER TABLE books ADD COLUMN available_copies INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE books ADD COLUMN total_copies INTEGER NOT NULL DEFAULT 0",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS book_copies_counts_ai AFTER INSERT ON book_copies BEGIN
+            {_COUNT_DELTA.format(sign="+", row="NEW")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS book_copies_counts_ad AFTER DELETE ON book_copies BEGIN
+            {_COUNT_DELTA.format(sign="-", row="OLD")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS book_copies_counts_au AFTER UPDATE OF status, book_id ON book_copies
+        WHEN OLD.status IS NOT NEW.status OR OLD.book_id IS NOT NEW.book_id
+        BEGIN
+            {_COUNT_DELTA.format(sign="-", row="OLD")}
+            {_COUNT_DELTA.format(sign="+", row="NEW")}
+        END
+        """,
+        RECONCILE_COPY_COUNTERS,
+        """
+        CREATE TABLE IF NOT EXISTS library_metrics (
+            metrics_id INTEGER PRIMARY KEY CHECK (metrics_id = 1),
+            active_loans INTEGER NOT NULL DEFAULT 0,
+            overdue INTEGER NOT NULL DEFAULT 0,
+            reservations INTEGER NOT NULL DEFAULT 0,
+            fines REAL NOT NULL DEFAULT 0,
+            refreshed_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ),
+    (
+        """
+        ALTER TABLE books
+            ADD COLUMN available_copies INT NOT NULL DEFAULT 0,
+            ADD COLUMN total_copies INT NOT NULL DEFAULT 0
+        """,
+        f"""
+        CREATE TRIGGER book_copies_counts_ai AFTER INSERT ON book_copies FOR EACH ROW
+        BEGIN
+            {_COUNT_DELTA.format(sign="+", row="NEW")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER book_copies_counts_ad AFTER DELETE ON book_copies FOR EACH ROW
+        BEGIN
+            {_COUNT_DELTA.format(sign="-", row="OLD")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER book_copies_counts_au AFTER UPDATE ON book_copies FOR EACH ROW
+        BEGIN
+            IF NOT (NEW.status <=> OLD.status AND NEW.book_id <=> OLD.book_id) THEN
+                {_COUNT_DELTA.format(sign="-", row="OLD")}
+                {_COUNT_DELTA.format(sign="+", row="NEW")}
+            END IF;
+        END
+        """,
+        RECONCILE_COPY_COUNTERS,
+        """
+        CREATE TABLE IF NOT EXISTS book_search (
+            book_id INT PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            isbn VARCHAR(32) NOT NULL,
+            authors TEXT,
+            description TEXT,
+            FULLTEXT KEY ft_book_search (title, isbn, authors, description)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TRIGGER books_search_ai AFTER INSERT ON books FOR EACH ROW
+            REPLACE INTO book_search (book_id, title, isbn, authors, description)
+            VALUES (NEW.book_id, NEW.title, NEW.isbn, '', COALESCE(NEW.description, ''))
+        """,
+        """
+        CREATE TRIGGER books_search_au AFTER UPDATE ON books FOR EACH ROW
+            UPDATE book_search
+            SET title = NEW.title, isbn = NEW.isbn, description = COALESCE(NEW.description, '')
+            WHERE book_id = NEW.book_id
+              AND NOT (NEW.title <=> OLD.title AND NEW.isbn <=> OLD.isbn
+                       AND NEW.description <=> OLD.description)
+        """,
+        """
+        CREATE TRIGGER books_search_ad AFTER DELETE ON books FOR EACH ROW
+            DELETE FROM book_search WHERE book_id = OLD.book_id
+        """,
+        f"""
+        CREATE TRIGGER book_authors_search_ai AFTER INSERT ON book_authors FOR EACH ROW
+            UPDATE book_search
+            SET authors = ({_MYSQL_AUTHOR_LIST.format(book_id="NEW.book_id")})
+            WHERE book_id = NEW.book_id
+        """,
+        f"""
+        CREATE TRIGGER book_authors_search_ad AFTER DELETE ON book_authors FOR EACH ROW
+            UPDATE book_search
+            SET authors = ({_MYSQL_AUTHOR_LIST.format(book_id="OLD.book_id")})
+            WHERE book_id = OLD.book_id
+        """,
+        f"""
+        CREATE TRIGGER authors_search_au AFTER UPDATE ON authors FOR EACH ROW
+            UPDATE book_search s
+            SET s.authors = ({_MYSQL_AUTHOR_LIST.format(book_id="s.book_id")})
+            WHERE s.book_id IN (SELECT ba.book_id FROM book_authors ba WHERE ba.author_id = NEW.author_id)
+        """,
+        *MYSQL_SEARCH_REBUILD,
+        """
+        CREATE TABLE IF NOT EXISTS library_metrics (
+            metrics_id TINYINT PRIMARY KEY,
+            active_loans INT NOT NULL DEFAULT 0,
+            overdue INT NOT NULL DEFAULT 0,
+            reservations INT NOT NULL DEFAULT 0,
+            fines DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            refreshed_at DATETIME NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            name VARCHAR(64) PRIMARY KEY,
+            value VARCHAR(255) NOT NULL,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ),
+)
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "helper query indexes", *_HELPER_INDEXES),
+    Migration(2, "server-side sessions", *_SESSIONS),
+    Migration(3, "background job scheduler", *_SCHEDULER),
+    Migration(4, "reservation queues and holds", *_RESERVATION_QUEUE),
+    Migration(5, "daily circulation rollups", *_CIRCULATION_ROLLUPS),
+    Migration(6, "returned loan archive", *_TRANSACTION_ARCHIVE),
+    Migration(7, "availability counters, search index, metrics and job state", *_DERIVED_STATE),
+)
+
+
+def _placeholder(backend: str) -> str:
+    return "?" if backend == "sqlite" else "%s"
+
+
+def _current_version(cursor) -> int:
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return int(cursor.fetchone()[0])
+
+
+def _apply_pending(cursor, backend: str) -> List[int]:
+    applied: List[int] = []
+    current = _current_version(cursor)
+    mark = _placeholder(backend)
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version <= current:
+            continue
+        logger.info("Applying migration %s: %s", migration.version, migration.name)
+        for statement in getattr(migration, backend):
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO schema_version (version, name, applied_at) VALUES ({mark}, {mark}, {mark})",
+            (migration.version, migration.name, datetime.utcnow().replace(microsecond=0)),
+        )
+        applied.append(migration.version)
+    return applied
+
+
+def latest_version() -> int:
+    return max((m.version for m in MIGRATIONS), default=0)
+
+
+def apply_migrations(conn, backend: str) -> List[int]:
+    """Apply pending migrations on a raw connection; returns the versions applied."""
+    cursor = conn.cursor()
+    try:
+        if backend == "sqlite":
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(SCHEMA_VERSION_DDL["sqlite"])
+                applied = _apply_pending(cursor, backend)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return applied
+
+        # MySQL DDL commits implicitly, so serialize runners with a lock
+        # and re-read the version once it is held.
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MYSQL_LOCK_NAME, MYSQL_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for the schema migration lock")
+        try:
+            cursor.execute(SCHEMA_VERSION_DDL["mysql"])
+            applied = _apply_pending(cursor, backend)
+            conn.commit()
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MYSQL_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
@@ -45,6 +45,8 @@ class Book:
     publisher: Optional[str]
     publication_year: Optional[int]
     category_id: Optional[int]
+    available_copies: int = 0
+    total_copies: int = 0
 
 
 @dataclass
@@ -0,0 +1,344 @@
+"""
+Connection pools shared by the Streamlit script threads.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection frees up within the acquire timeout."""
+
+
+class _BoundedConnections:
+    """A lazily filled, fixed-capacity set of interchangeable connections."""
+
+    def __init__(self, name: str, size: int, factory: Callable[[], sqlite3.Connection]):
+        self.name = name
+        self.size = max(1, size)
+        self._factory = factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._opened: List[sqlite3.Connection] = []
+        self._in_use = 0
+        self._exhausted = 0
+
+    def acquire(self, timeout: float) -> sqlite3.Connection:
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._exhausted += 1
+            raise PoolTimeoutError(
+                f"No {self.name} connection available after {timeout:.1f}s"
+            )
+        with self._lock:
+            self._in_use += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+            raise
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": len(self._opened),
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "exhausted": self._exhausted,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class SQLiteConnectionPool:
+    """
+    Separate bounded pools of writer and read-only SQLite connections.
+
+    The database runs in WAL mode, so readers see the last committed state
+    while a writer holds the lock. Writers open their transactions with
+    ``BEGIN IMMEDIATE`` and wait up to ``busy_timeout_ms`` for the lock, which
+    also serializes writers coming from other Streamlit worker processes.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        write_size: int = 2,
+        read_size: int = 8,
+        busy_timeout_ms: int = 5000,
+        acquire_timeout: float = 10.0,
+    ) -> None:
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.acquire_timeout = acquire_timeout
+        self._writers = _BoundedConnections("writer", write_size, self._open_writer)
+        self._readers = _BoundedConnections("reader", read_size, self._open_reader)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            isolation_level="IMMEDIATE",
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = self._open()
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        return conn
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = self._open()
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    @contextmanager
+    def connection(self, *, readonly: bool = False) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of the block."""
+        pool = self._readers if readonly else self._writers
+        conn = pool.acquire(self.acquire_timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                # Never hand the next borrower a half-finished transaction.
+                conn.rollback()
+            pool.release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"writers": self._writers.stats(), "readers": self._readers.stats()}
+
+    def close(self) -> None:
+        self._writers.close()
+        self._readers.close()
+
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float
+    last_used: float
+
+
+class MySQLConnectionPoolManager:
+    """
+    Elastic MySQL pool that queues callers instead of failing when busy.
+
+    ``min_size`` connections are opened up front and up to ``max_size`` are
+    kept idle between requests. Under load a further ``max_overflow``
+    short-lived connections may be opened; they are closed again on release.
+    Once every slot is taken, callers wait up to ``acquire_timeout`` seconds.
+    Idle connections are pinged before reuse and replaced once they are
+    older than ``recycle_seconds``.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        *,
+        min_size: int = 1,
+        max_size: int = 5,
+        max_overflow: int = 5,
+        acquire_timeout: float = 10.0,
+        recycle_seconds: float = 1800.0,
+        ping_after_seconds: float = 30.0,
+    ) -> None:
+        self._config = dict(config)
+        self.max_size = max(1, max_size)
+        self.min_size = min(max(0, min_size), self.max_size)
+        self.max_overflow = max(0, max_overflow)
+        self.acquire_timeout = acquire_timeout
+        self.recycle_seconds = recycle_seconds
+        self.ping_after_seconds = ping_after_seconds
+
+        self._cond = threading.Condition()
+        self._idle: Deque[_PooledConnection] = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._exhausted = 0
+        self._recycled = 0
+
+        for _ in range(self.min_size):
+            entry = self._connect()
+            with self._cond:
+                self._open += 1
+                self._idle.append(entry)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_size + self.max_overflow
+
+    def _connect(self) -> _PooledConnection:
+        import mysql.connector
+
+        conn = mysql.connector.connect(**self._config)
+        now = time.monotonic()
+        return _PooledConnection(conn=conn, created_at=now, last_used=now)
+
+    def _discard(self, entry: _PooledConnection) -> None:
+        try:
+            entry.conn.close()
+        except Exception:  # connection may already be gone server-side
+            pass
+
+    def _validate(self, entry: _PooledConnection) -> _PooledConnection:
+        now = time.monotonic()
+        if now - entry.created_at > self.recycle_seconds:
+            self._discard(entry)
+            with self._cond:
+                self._recycled += 1
+            return self._connect()
+        if now - entry.last_used > self.ping_after_seconds:
+            try:
+                entry.conn.ping(reconnect=False)
+            except Exception:
+                logger.warning("Replacing stale MySQL connection")
+                self._discard(entry)
+                with self._cond:
+                    self._recycled += 1
+                return self._connect()
+        return entry
+
+    def _acquire(self) -> _PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.capacity:
+                    self._open += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exhausted += 1
+                    raise PoolTimeoutError(
+                        f"No MySQL connection available after {self.acquire_timeout:.1f}s"
+                    )
+                waited = True
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+            self._in_use += 1
+            self._acquired += 1
+            if waited:
+                elapsed = time.monotonic() - started
+                self._waits += 1
+                self._wait_seconds += elapsed
+                self._max_wait_seconds = max(self._max_wait_seconds, elapsed)
+
+        try:
+            return self._connect() if entry is None else self._validate(entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, entry: _PooledConnection, *, broken: bool = False) -> None:
+        if not broken:
+            try:
+                entry.conn.rollback()
+            except Exception:
+                broken = True
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            keep = not broken and len(self._idle) < self.max_size
+            if keep:
+                self._idle.append(entry)
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not keep:
+            self._discard(entry)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection, waiting for a free slot if necessary."""
+        entry = self._acquire()
+        broken = False
+        try:
+            yield entry.conn
+        except Exception:
+            broken = not entry.conn.is_connected()
+            raise
+        finally:
+            self._release(entry, broken=broken)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "overflow_in_use": max(0, self._open - self.max_size),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "avg_wait_ms": (self._wait_seconds / self._waits * 1000) if self._waits else 0.0,
+                "max_wait_ms": self._max_wait_seconds * 1000,
+                "exhausted": self._exhausted,
+                "recycled": self._recycled,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for entry in idle:
+            self._discard(entry)
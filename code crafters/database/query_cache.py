@@ -0,0 +1,202 @@
+"""
+In-process cache for SELECT results with table-level invalidation.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_READ_TABLES = re.compile(r"\b(?:FROM|JOIN)\s+`?([A-Za-z_]\w*)", re.IGNORECASE)
+_WRITE_TABLE = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)"
+    r"\s+`?([A-Za-z_]\w*)",
+    re.IGNORECASE,
+)
+
+# Tables that database triggers write to when the key table changes. A write
+# to the key table must also evict results read from these.
+TRIGGER_WRITES: Dict[str, Tuple[str, ...]] = {
+    "books": ("books_fts", "book_search"),
+    "book_authors": ("books_fts", "book_search"),
+    "authors": ("books_fts", "book_search"),
+    "book_copies": ("books",),
+}
+
+
+# Tables read by ``run_query(cache=True)`` callers. Only writes that change
+# rows in these bump the shared versions other workers poll; a cached read of
+# any other table is bounded by the TTL alone.
+CACHED_TABLES: FrozenSet[str] = frozenset(
+    {
+        "authors",
+        "book_authors",
+        "book_search",
+        "books",
+        "books_fts",
+        "categories",
+        "circulation_daily_books",
+        "circulation_daily_categories",
+        "library_metrics",
+    }
+)
+
+
+def affected_tables(tables: Iterable[str]) -> Set[str]:
+    """``tables`` plus the tables their triggers write to."""
+    affected: Set[str] = set()
+    for table in tables:
+        table = table.lower()
+        affected.add(table)
+        affected.update(TRIGGER_WRITES.get(table, ()))
+    return affected
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace so formatting differences share a cache key."""
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def tables_read(query: str) -> FrozenSet[str]:
+    return frozenset(name.lower() for name in _READ_TABLES.findall(query))
+
+
+def table_written(query: str) -> Optional[str]:
+    match = _WRITE_TABLE.match(query)
+    return match.group(1).lower() if match else None
+
+
+def copy_result(value: Any) -> Any:
+    # Callers decorate rows in place (e.g. fetch_book_details adds "authors"),
+    # so never hand out the cached objects themselves.
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    if hasattr(value, "columns"):  # DataFrame from run_query(as_frame=True)
+        return value.copy()
+    return value
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of query results keyed on normalized SQL and params.
+
+    Each entry remembers the tables its SELECT reads. ``invalidate`` drops
+    every entry depending on a written table and bumps that table's version,
+    so a read that raced with the write cannot store its stale result.
+    Writes made by other worker processes arrive through
+    ``apply_shared_versions``.
+    """
+
+    def __init__(self, *, max_entries: int = 512, ttl_seconds: float = 30.0) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, FrozenSet[str], Any]]" = OrderedDict()
+        self._by_table: Dict[str, Set[Hashable]] = {}
+        self._versions: Dict[str, int] = {}
+        self._shared: Dict[str, str] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, params: Iterable[Any], *extra: Hashable) -> Hashable:
+        return (normalize_sql(query), tuple(params), *extra)
+
+    def versions(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return self._snapshot(tables)
+
+    def _snapshot(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return (self._epoch, *(self._versions.get(table, 0) for table in sorted(tables)))
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return ``(hit, value)``; ``value`` is a copy of the cached result."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[2]
+        return True, copy_result(value)
+
+    def put(
+        self,
+        key: Hashable,
+        tables: FrozenSet[str],
+        value: Any,
+        versions: Tuple[int, ...],
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if self._snapshot(tables) != versions:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, tables, copy_result(value))
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        affected = affected_tables(tables)
+        with self._lock:
+            for table in affected:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def apply_shared_versions(self, versions: Dict[str, str]) -> None:
+        """Invalidate every table whose shared write version moved since the last call."""
+        with self._lock:
+            changed = [table for table, version in versions.items() if self._shared.get(table) != version]
+            self._shared.update(versions)
+        if changed:
+            self.invalidate(changed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_table.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,147 @@
+"""
+Rerun-scoped request context.
+
+``app.main`` wraps each Streamlit script run in ``request_context()``.
+While it is active, identical read queries issued through ``run_query``
+are answered from a per-run memo (cleared by any write in the same run),
+values such as the signed-in user can be memoized with ``memoize``, and
+every statement that reaches the database is counted. When the run ends
+the count is checked against the page's query budget and folded into
+``page_round_trip_stats()``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from database.query_cache import copy_result
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a page render makes more round trips than budgeted."""
+
+
+@dataclass
+class RequestContext:
+    page: str
+    budget: Optional[int] = None
+    round_trips: int = 0
+    memo_hits: int = 0
+    _queries: Dict[Hashable, Any] = field(default_factory=dict)
+    _values: Dict[str, Any] = field(default_factory=dict)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        if key in self._queries:
+            self.memo_hits += 1
+            return True, copy_result(self._queries[key])
+        return False, None
+
+    def remember(self, key: Hashable, result: Any) -> None:
+        self._queries[key] = copy_result(result)
+
+    def forget_reads(self) -> None:
+        """Drop memoized query results after a write in this run."""
+        self._queries.clear()
+
+    def memoize(self, name: str, compute: Callable[[], Any]) -> Any:
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            value = self._values[name] = compute()
+        return value
+
+    def forget(self, name: str) -> None:
+        self._values.pop(name, None)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.round_trips > self.budget
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+_page_stats: Dict[str, Dict[str, Any]] = {}
+_page_stats_lock = threading.Lock()
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def memoize(name: str, compute: Callable[[], Any]) -> Any:
+    """Compute ``name`` once per script run; uncached outside a request context."""
+    request = _current.get()
+    return compute() if request is None else request.memoize(name, compute)
+
+
+def forget(name: str) -> None:
+    request = _current.get()
+    if request is not None:
+        request.forget(name)
+
+
+def _record_page(request: RequestContext) -> None:
+    with _page_stats_lock:
+        stats = _page_stats.setdefault(
+            request.page,
+            {"renders": 0, "round_trips": 0, "max_round_trips": 0, "over_budget": 0},
+        )
+        stats["renders"] += 1
+        stats["round_trips"] += request.round_trips
+        stats["max_round_trips"] = max(stats["max_round_trips"], request.round_trips)
+        stats["last_round_trips"] = request.round_trips
+        stats["memo_hits"] = stats.get("memo_hits", 0) + request.memo_hits
+        stats["budget"] = request.budget
+        stats["over_budget"] += int(request.over_budget)
+
+
+def page_round_trip_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-page render counts and database round trips for this process."""
+    with _page_stats_lock:
+        return {
+            page: {**stats, "avg_round_trips": stats["round_trips"] / stats["renders"]}
+            for page, stats in _page_stats.items()
+        }
+
+
+@contextmanager
+def request_context(
+    page: str,
+    budgets: Optional[Dict[str, int]] = None,
+    *,
+    strict: bool = False,
+) -> Iterator[RequestContext]:
+    """
+    Scope memoization and round-trip counting to one script run.
+
+    ``page`` may be reassigned on the yielded context once navigation has
+    been resolved; its budget is looked up in ``budgets`` at the end of the
+    run. With ``strict`` an over-budget render raises ``QueryBudgetExceeded``.
+    """
+    request = RequestContext(page)
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+        request.budget = (budgets or {}).get(request.page)
+        _record_page(request)
+        logger.debug(
+            "Rendered %s with %s round trip(s), %s memo hit(s)",
+            request.page, request.round_trips, request.memo_hits,
+        )
+    if request.over_budget:
+        message = (
+            f"Page {request.page!r} made {request.round_trips} database round trips "
+            f"(budget {request.budget})."
+        )
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,170 @@
+"""
+Full-text catalog search over title, ISBN, author names and description.
+
+SQLite uses the ``books_fts`` FTS5 table created by ``sqlite_bootstrap``.
+MySQL uses a ``book_search`` table with a FULLTEXT index, kept in sync by
+triggers (migration 7). ISBN-looking searches skip the text index entirely and
+become a range scan on the unique ``books.isbn`` index.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from config import MYSQL_FT_MIN_TOKEN_SIZE, get_db_backend
+from database.database import get_db_connection, invalidate_cached_tables, run_query
+from database.migrations import MYSQL_SEARCH_REBUILD
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_ISBN = re.compile(r"^[0-9][0-9Xx]{4,12}$")
+
+# InnoDB's default FULLTEXT stopword list (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD).
+_MYSQL_STOPWORDS = frozenset(
+    """
+    a about an are as at be by com de en for from how i in is it la of on or
+    that the this to was what when where who will with und www
+    """.split()
+)
+
+_index_ready: Optional[bool] = None
+_index_lock = threading.Lock()
+
+
+@dataclass
+class SearchClause:
+    """
+    SQL fragments that plug a search term into the catalog query.
+
+    Ranked clauses join a derived table ``m`` with one row per matching
+    book whose ``score`` sorts best match first in ascending order.
+    """
+
+    join: str = ""
+    join_params: List[Any] = field(default_factory=list)
+    where: str = ""
+    where_params: List[Any] = field(default_factory=list)
+    ranked: bool = False
+
+
+def _search_index_ready() -> bool:
+    """Whether the full-text index exists; checked once per process."""
+    global _index_ready
+    if _index_ready is None:
+        with _index_lock:
+            if _index_ready is None:
+                if get_db_backend() == "sqlite":
+                    row = run_query(
+                        "SELECT COUNT(*) AS found FROM sqlite_master WHERE name = 'books_fts'",
+                        fetch="one",
+                    )
+                else:
+                    row = run_query(
+                        """
+                        SELECT COUNT(*) AS found FROM information_schema.tables
+                        WHERE table_schema = DATABASE() AND table_name = 'book_search'
+                        """,
+                        fetch="one",
+                    )
+                _index_ready = bool(row and row["found"])
+    return _index_ready
+
+
+def rebuild_search_index() -> None:
+    """Repopulate the search index from the catalog tables."""
+    if get_db_backend() == "sqlite":
+        from database.sqlite_bootstrap import rebuild_search_index as rebuild_fts
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                rebuild_fts(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
+    else:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for statement in MYSQL_SEARCH_REBUILD:
+                    cursor.execute(statement)
+                conn.commit()
+            finally:
+                cursor.close()
+    invalidate_cached_tables("books_fts", "book_search")
+
+
+def _isbn_clause(term: str) -> SearchClause:
+    # Prefix range on the unique isbn index: "978059" -> ["978059", "97805:").
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return SearchClause(where="b.isbn >= %s AND b.isbn < %s", where_params=[term, upper])
+
+
+def _like_clause(search: str) -> SearchClause:
+    pattern = f"%{search}%"
+    return SearchClause(
+        where="(b.title LIKE %s OR b.isbn LIKE %s)",
+        where_params=[pattern, pattern],
+    )
+
+
+def _compact_isbn(search: str) -> str:
+    return re.sub(r"[\s-]", "", search).upper()
+
+
+def looks_like_isbn(search: str) -> bool:
+    return bool(_ISBN.match(_compact_isbn(search)))
+
+
+def catalog_search_clause(search: str) -> Optional[SearchClause]:
+    """
+    Translate a free-text search into catalog query fragments.
+
+    Returns ``None`` when the term contains nothing searchable.
+    """
+    if looks_like_isbn(search):
+        return _isbn_clause(_compact_isbn(search))
+
+    tokens = _TOKEN.findall(search)
+    if not tokens:
+        return None
+    if not _search_index_ready():
+        return _like_clause(search)
+
+    if get_db_backend() == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return SearchClause(
+            join="""
+                JOIN (
+                    SELECT rowid AS book_id, rank AS score
+                    FROM books_fts WHERE books_fts MATCH %s
+                ) m ON m.book_id = b.book_id
+            """,
+            join_params=[match],
+            ranked=True,
+        )
+
+    # InnoDB never indexes stopwords or words below the minimum token size,
+    # so requiring one ("+the*") would match no book at all. Such words stay
+    # in the query as optional terms.
+    words = [
+        (token, token.lower() not in _MYSQL_STOPWORDS and len(token) >= MYSQL_FT_MIN_TOKEN_SIZE)
+        for token in tokens
+    ]
+    if not any(required for _, required in words):
+        return _like_clause(search)
+    match = " ".join(f"+{token}*" if required else f"{token}*" for token, required in words)
+    return SearchClause(
+        join="""
+            JOIN (
+                SELECT book_id,
+                       -MATCH(title, isbn, authors, description) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM book_search
+                WHERE MATCH(title, isbn, authors, description) AGAINST (%s IN BOOLEAN MODE)
+            ) m ON m.book_id = b.book_id
+        """,
+        join_params=[match, match],
+        ranked=True,
+    )
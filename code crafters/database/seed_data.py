@@ -1,12 +1,16 @@
 """
 Utilities to add optional seed data for local testing.
+
+Run ``python -m database.seed_data`` to load the sample catalog into the
+configured database. Nothing here runs on application start.
 """
 
 from __future__ import annotations
 
 from typing import List, Tuple
 
-from database.database import run_transaction
+from config import get_db_backend
+from database.database import clear_query_cache, get_db_connection, run_query, run_transaction
 
 
 def seed_categories() -> None:
@@ -127,19 +131,40 @@ def seed_book_copies() -> None:
         ("Creative Confidence", "Art Studio"),
         ("The Ocean at the End of the Lane", "Children's Section"),
     ]
+    # Resolved up front: MySQL rejects an INSERT that reads ``books`` while
+    # the copy counter trigger on ``book_copies`` updates it (error 1442).
+    titles = sorted({title for title, _ in copies})
+    book_ids = {
+        row["title"]: row["book_id"]
+        for row in run_query(
+            f"SELECT book_id, title FROM books WHERE title IN ({', '.join(['%s'] * len(titles))})",
+            tuple(titles),
+        )
+    }
     queries = [
         (
-            """
-            INSERT INTO book_copies (book_id, status, location)
-            VALUES (
-                (SELECT book_id FROM books WHERE title = %s LIMIT 1),
-                'available',
-                %s
-            )
-            """,
-            (title, location),
+            "INSERT INTO book_copies (book_id, status, location) VALUES (%s, 'available', %s)",
+            (book_ids[title], location),
         )
         for title, location in copies
+        if title in book_ids
     ]
     run_transaction(queries)
 
+
+def seed_sample_data() -> None:
+    if get_db_backend() == "sqlite":
+        from database.sqlite_bootstrap import seed_sqlite
+
+        with get_db_connection() as conn:
+            seed_sqlite(conn)
+        clear_query_cache()
+        return
+    seed_categories()
+    seed_authors()
+    seed_books()
+    seed_book_copies()
+
+
+if __name__ == "__main__":
+    seed_sample_data()
@@ -1,13 +1,22 @@
 """
 Utility helpers to bootstrap a lightweight SQLite database for local usage.
+
+``bootstrap_sqlite`` creates the schema and applies migrations, then stamps
+``PRAGMA user_version`` with the latest migration version so later worker
+starts return after that single read. Sample data is loaded separately by
+``seed_sqlite`` (``python -m database.seed_data``).
 """
 
 from __future__ import annotations
 
+import logging
+import sqlite3
 from datetime import datetime, timedelta
 from typing import Iterable, Tuple
 
-from werkzeug.security import generate_password_hash
+from database.migrations import apply_migrations, latest_version
+
+logger = logging.getLogger(__name__)
 
 SCHEMA_STATEMENTS: Tuple[str, ...] = (
     """
@@ -99,6 +108,91 @@ SCHEMA_STATEMENTS: Tuple[str, ...] = (
 )
 
 
+# One FTS5 row per book (rowid = book_id) covering title, ISBN, author names
+# and description. Triggers keep it in step with books/book_authors/authors.
+_FTS_ROWS = """
+    INSERT INTO books_fts (rowid, title, isbn, authors, description)
+    SELECT
+        b.book_id,
+        b.title,
+        b.isbn,
+        COALESCE((
+            SELECT group_concat(a.first_name || ' ' || a.last_name, ' ')
+            FROM book_authors ba
+            JOIN authors a ON a.author_id = ba.author_id
+            WHERE ba.book_id = b.book_id
+        ), ''),
+        COALESCE(b.description, '')
+    FROM books b
+"""
+
+SEARCH_INDEX_STATEMENTS: Tuple[str, ...] = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, isbn, authors, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        {_FTS_ROWS} WHERE b.book_id = NEW.book_id;
+    END;
+    """,
+    # Restricted to the indexed columns so availability counter updates on
+    # every borrow/return do not rewrite the FTS row.
+    "DROP TRIGGER IF EXISTS books_fts_au;",
+    f"""
+    CREATE TRIGGER books_fts_au AFTER UPDATE OF title, isbn, description ON books BEGIN
+        DELETE FROM books_fts WHERE rowid = OLD.book_id;
+        {_FTS_ROWS} WHERE b.book_id = NEW.book_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        DELETE FROM books_fts WHERE rowid = OLD.book_id;
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_authors_fts_ai AFTER INSERT ON book_authors BEGIN
+        DELETE FROM books_fts WHERE rowid = NEW.book_id;
+        {_FTS_ROWS} WHERE b.book_id = NEW.book_id;
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_authors_fts_ad AFTER DELETE ON book_authors BEGIN
+        DELETE FROM books_fts WHERE rowid = OLD.book_id;
+        {_FTS_ROWS} WHERE b.book_id = OLD.book_id;
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS authors_fts_au AFTER UPDATE ON authors BEGIN
+        DELETE FROM books_fts
+        WHERE rowid IN (SELECT book_id FROM book_authors WHERE author_id = NEW.author_id);
+        {_FTS_ROWS}
+        WHERE b.book_id IN (SELECT book_id FROM book_authors WHERE author_id = NEW.author_id);
+    END;
+    """,
+)
+
+
+def rebuild_search_index(cursor) -> None:
+    """Repopulate books_fts from scratch."""
+    cursor.execute("DELETE FROM books_fts")
+    cursor.execute(_FTS_ROWS)
+
+
+def _ensure_search_index(cursor) -> None:
+    try:
+        _exec_many(cursor, SEARCH_INDEX_STATEMENTS)
+    except sqlite3.OperationalError as exc:
+        # Python builds without FTS5 fall back to LIKE search.
+        logger.warning("Full-text search index unavailable: %s", exc)
+        return
+    cursor.execute("SELECT (SELECT COUNT(*) FROM books_fts) = (SELECT COUNT(*) FROM books)")
+    if not cursor.fetchone()[0]:
+        rebuild_search_index(cursor)
+
+
 def _exec_many(cursor, statements: Iterable[str]) -> None:
     for stmt in statements:
         cursor.execute(stmt)
@@ -267,31 +361,27 @@ def _seed_book_copies(cursor) -> None:
         )
 
 
+_SEED_USERS: Tuple[Tuple[str, str, str, str], ...] = (
+    ("Library Admin", "kinyuamorgan90@gmail.com", "admin", "admin123"),
+    ("Sample Patron", "patron@example.com", "user", "patron123"),
+)
+
+
 def _seed_users(cursor) -> None:
-    admin_email = "kinyuamorgan90@gmail.com"
-    admin_password = "admin123"
-    cursor.execute(
-        """
-        INSERT OR IGNORE INTO users (full_name, email, role, password_hash, total_fines)
-        VALUES (?, ?, 'admin', ?, 0)
-        """,
-        (
-            "Library Admin",
-            admin_email,
-            generate_password_hash(admin_password, method="scrypt"),
-        ),
-    )
-    cursor.execute(
-        """
-        INSERT OR IGNORE INTO users (full_name, email, role, password_hash, total_fines)
-        VALUES (?, ?, 'user', ?, 0)
-        """,
-        (
-            "Sample Patron",
-            "patron@example.com",
-            generate_password_hash("patron123", method="scrypt"),
-        ),
-    )
+    from werkzeug.security import generate_password_hash
+
+    # Hash only for accounts that are actually missing; scrypt is slow.
+    for full_name, email, role, password in _SEED_USERS:
+        cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+        if cursor.fetchone():
+            continue
+        cursor.execute(
+            """
+            INSERT INTO users (full_name, email, role, password_hash, total_fines)
+            VALUES (?, ?, ?, ?, 0)
+            """,
+            (full_name, email, role, generate_password_hash(password, method="scrypt")),
+        )
 
 
 def _seed_transactions(cursor) -> None:
@@ -332,12 +422,29 @@ def _seed_transactions(cursor) -> None:
     )
 
 
+def schema_is_current(conn) -> bool:
+    return conn.execute("PRAGMA user_version").fetchone()[0] >= latest_version()
+
+
 def bootstrap_sqlite(conn) -> None:
     """
-    Ensure schema and sample data exist for SQLite deployments.
+    Ensure the schema exists and is fully migrated for SQLite deployments.
+
+    Costs one ``PRAGMA user_version`` read when the database is current.
     """
+    if schema_is_current(conn):
+        return
     cursor = conn.cursor()
     _exec_many(cursor, SCHEMA_STATEMENTS)
+    _ensure_search_index(cursor)
+    conn.commit()
+    apply_migrations(conn, "sqlite")
+    conn.execute(f"PRAGMA user_version = {latest_version()}")
+
+
+def seed_sqlite(conn) -> None:
+    """Load the sample catalog, accounts and loan; safe to run repeatedly."""
+    cursor = conn.cursor()
     _seed_categories(cursor)
     _seed_authors(cursor)
     _seed_books(cursor)
@@ -346,4 +453,3 @@ def bootstrap_sqlite(conn) -> None:
     _seed_book_copies(cursor)
     _seed_transactions(cursor)
     conn.commit()
-
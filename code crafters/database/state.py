@@ -0,0 +1,33 @@
+"""
+Key/value watermarks for maintenance jobs, shared across worker processes.
+
+The ``maintenance_state`` table is created by migration 7.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+from database.database import run_query
+
+
+def get_state(name: str) -> Optional[str]:
+    row = run_query(
+        "SELECT value FROM maintenance_state WHERE name = %s",
+        (name,),
+        fetch="one",
+    )
+    return row["value"] if row else None
+
+
+def set_state_statement(name: str, value: Any) -> Tuple[str, Tuple[Any, ...]]:
+    """Upsert statement for use inside ``run_transaction`` alongside the work it records."""
+    return (
+        "REPLACE INTO maintenance_state (name, value, updated_at) VALUES (%s, %s, CURRENT_TIMESTAMP)",
+        (name, str(value)),
+    )
+
+
+def set_state(name: str, value: Any) -> None:
+    query, params = set_state_statement(name, value)
+    run_query(query, params, fetch="none")
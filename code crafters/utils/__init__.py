@@ -1,20 +1,48 @@
 """
 Utility helpers.
+
+Names are resolved from their submodules on first access, so importing one
+submodule (``utils.validators`` from the login screen, say) does not pull
+in the query helpers and everything they import.
 """
 
-from .helpers import (
-    borrow_book,
-    create_reservation,
-    fetch_active_loans,
-    fetch_book_catalog,
-    fetch_book_details,
-    fetch_dashboard_metrics,
-    fetch_user_transactions,
-    return_book,
-    update_fine_totals,
-)
-from .validators import (
-    validate_email,
-    validate_password_strength,
-)
+from importlib import import_module
+
+_EXPORTS = {
+    "borrow_book": "helpers",
+    "create_reservation": "helpers",
+    "fetch_active_loans": "helpers",
+    "fetch_book_catalog": "helpers",
+    "fetch_book_catalog_page": "helpers",
+    "fetch_book_details": "helpers",
+    "fetch_book_details_many": "helpers",
+    "fetch_dashboard_metrics": "helpers",
+    "fetch_overdue_loans": "helpers",
+    "fetch_user_transactions": "helpers",
+    "fetch_user_transactions_page": "helpers",
+    "fetch_users_page": "helpers",
+    "return_book": "helpers",
+    "update_fine_totals": "helpers",
+    "accrue_fines": "fines",
+    "reconcile_user_fines": "fines",
+    "read_library_metrics": "metrics",
+    "refresh_library_metrics": "metrics",
+    "Page": "pagination",
+    "decode_cursor": "pagination",
+    "encode_cursor": "pagination",
+    "expire_holds": "reservations",
+    "fetch_user_reservations": "reservations",
+    "queue_position": "reservations",
+    "validate_email": "validators",
+    "validate_password_strength": "validators",
+}
+
+__all__ = list(_EXPORTS)
+
 
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,135 @@
+"""
+Hot/cold archival of returned loans.
+
+``borrow_transactions`` holds open loans and recently returned ones. Loans
+returned more than ``ARCHIVE_AFTER_DAYS`` ago move to
+``borrow_transactions_archive`` (migration 6), so the hot table, and every
+query over it, stays proportional to open loans. Borrowing history, fine
+reconciliation and the metrics refresh read both tables. The circulation
+reports read the rollups, and a loan is archived only once the rollups
+include it.
+
+Each batch is copied and deleted by id in its own short transaction, with
+a pause between batches, so borrows and returns never wait long behind
+it. With ``ARCHIVE_EXPORT_DIR`` set, every batch is also written as
+Parquet under ``year=/month=`` directories of its borrow date before the
+move commits; pyarrow is imported only then.
+
+Run ``python -m utils.archive`` to archive what qualifies now.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import get_archive_config, get_db_backend
+from database.database import run_query, transaction
+from utils.helpers import HISTORY_COLUMNS
+from utils.rollups import rollup_watermark
+
+logger = logging.getLogger(__name__)
+
+
+# ``{lock}`` lets concurrent archivers skip each other's rows on MySQL.
+ARCHIVE_BATCH_QUERY = f"""
+    SELECT {HISTORY_COLUMNS} FROM borrow_transactions
+    WHERE status = 'returned' AND return_date < %s AND transaction_id <= %s
+    LIMIT %s
+    {{lock}}
+"""
+
+
+def _as_date(value: Any) -> Optional[date]:
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def _export_parquet(rows: List[Dict[str, Any]], export_dir: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    records = []
+    for row in rows:
+        borrowed = _as_date(row["borrow_date"])
+        records.append(
+            {
+                **row,
+                "borrow_date": borrowed,
+                "due_date": _as_date(row["due_date"]),
+                "return_date": _as_date(row["return_date"]),
+                "fine_amount": float(row["fine_amount"]),
+                "year": borrowed.year,
+                "month": borrowed.month,
+            }
+        )
+    pq.write_to_dataset(
+        pa.Table.from_pylist(records),
+        root_path=export_dir,
+        partition_cols=["year", "month"],
+        basename_template=f"loans-{rows[0]['transaction_id']}-{rows[-1]['transaction_id']}-{{i}}.parquet",
+    )
+
+
+def archive_returned_transactions(*, today: Optional[date] = None, max_batches: Optional[int] = None) -> int:
+    """Move loans returned before the cutoff into the archive; returns how many moved."""
+    config = get_archive_config()
+    mysql = get_db_backend() != "sqlite"
+    cutoff = (today or datetime.utcnow().date()) - timedelta(days=config["after_days"])
+    rolled_up_through = rollup_watermark()
+    batch_size = config["batch_size"]
+    moved = 0
+    for _ in range(config["max_batches"] if max_batches is None else max_batches):
+        archived_at = datetime.utcnow().replace(microsecond=0)
+        with transaction() as tx:
+            rows = tx.fetch_all(
+                ARCHIVE_BATCH_QUERY.format(lock="FOR UPDATE SKIP LOCKED" if mysql else ""),
+                (cutoff.isoformat(), rolled_up_through, batch_size),
+            )
+            if not rows:
+                break
+            ids = [row["transaction_id"] for row in rows]
+            marks = ", ".join(["%s"] * len(ids))
+            if config["export_dir"]:
+                _export_parquet(rows, config["export_dir"])
+            tx.execute(
+                f"""
+                INSERT INTO borrow_transactions_archive ({HISTORY_COLUMNS}, archived_at)
+                SELECT {HISTORY_COLUMNS}, %s FROM borrow_transactions
+                WHERE transaction_id IN ({marks})
+                """,
+                (archived_at, *ids),
+            )
+            tx.execute(f"DELETE FROM borrow_transactions WHERE transaction_id IN ({marks})", tuple(ids))
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+        time.sleep(config["pause_seconds"])
+    if moved:
+        logger.info("Archived %s returned loan(s) from before %s", moved, cutoff)
+    return moved
+
+
+def archive_stats() -> Dict[str, Any]:
+    """Row counts of the hot and archive tables, in one round trip."""
+    return run_query(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM borrow_transactions) AS hot,
+            (SELECT COUNT(*) FROM borrow_transactions WHERE status IN ('borrowed', 'overdue')) AS open_loans,
+            (SELECT COUNT(*) FROM borrow_transactions_archive) AS archived
+        """,
+        fetch="one",
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Archive returned loans older than ARCHIVE_AFTER_DAYS.")
+    parser.add_argument("--max-batches", type=int, default=None, help="default: ARCHIVE_MAX_BATCHES")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    moved = archive_returned_transactions(max_batches=args.max_batches)
+    print(f"Archived {moved} loans in {time.perf_counter() - started:.1f} s; {archive_stats()}")
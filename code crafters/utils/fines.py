@@ -0,0 +1,213 @@
+"""
+Set-based fine accrual for open loans.
+
+Fines are recomputed in the database rather than row by row in Python.
+Only loans whose fine actually changed are written, and the per-user
+deltas are applied to ``users.total_fines`` in the same transaction, so
+``total_fines`` always equals the sum of that user's ``fine_amount``.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from config import FINE_PER_DAY, get_db_backend
+from database.database import run_query, run_transaction
+from database.state import get_state, set_state_statement
+
+FINE_WATERMARK = "fines.accrued_through"
+
+_DAYS_OVERDUE = {
+    "sqlite": "CAST(julianday(%s) - julianday(due_date) AS INTEGER)",
+    "mysql": "DATEDIFF(%s, due_date)",
+}
+
+_STAGING_DDL = {
+    "sqlite": (
+        "DROP TABLE IF EXISTS temp.fine_changes",
+        """
+        CREATE TEMP TABLE fine_changes (
+            transaction_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            old_fine REAL NOT NULL,
+            new_fine REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX temp.fine_changes_user ON fine_changes (user_id)",
+    ),
+    "mysql": (
+        "DROP TEMPORARY TABLE IF EXISTS fine_changes",
+        """
+        CREATE TEMPORARY TABLE fine_changes (
+            transaction_id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            old_fine DECIMAL(10, 2) NOT NULL,
+            new_fine DECIMAL(10, 2) NOT NULL,
+            KEY (user_id)
+        )
+        """,
+    ),
+}
+
+_APPLY_LOAN_FINES = {
+    "sqlite": """
+        UPDATE borrow_transactions
+        SET status = 'overdue',
+            fine_amount = (
+                SELECT fc.new_fine FROM fine_changes fc
+                WHERE fc.transaction_id = borrow_transactions.transaction_id
+            )
+        WHERE transaction_id IN (SELECT transaction_id FROM fine_changes)
+    """,
+    "mysql": """
+        UPDATE borrow_transactions bt
+        JOIN fine_changes fc ON fc.transaction_id = bt.transaction_id
+        SET bt.status = 'overdue', bt.fine_amount = fc.new_fine
+    """,
+}
+
+_APPLY_USER_TOTALS = {
+    "sqlite": """
+        UPDATE users
+        SET total_fines = ROUND(total_fines + (
+                SELECT SUM(fc.new_fine - fc.old_fine) FROM fine_changes fc
+                WHERE fc.user_id = users.user_id
+            ), 2)
+        WHERE user_id IN (SELECT user_id FROM fine_changes)
+    """,
+    "mysql": """
+        UPDATE users u
+        JOIN (
+            SELECT user_id, SUM(new_fine - old_fine) AS delta
+            FROM fine_changes
+            GROUP BY user_id
+        ) d ON d.user_id = u.user_id
+        SET u.total_fines = u.total_fines + d.delta
+    """,
+}
+
+# Run before the loans are updated, while the staged rows still carry their
+# old status. Two statements because MySQL cannot open a temporary table
+# twice in one query.
+_METRICS_NEWLY_OVERDUE = """
+    UPDATE library_metrics
+    SET overdue = overdue + (
+        SELECT COUNT(*) FROM fine_changes fc
+        JOIN borrow_transactions bt ON bt.transaction_id = fc.transaction_id
+        WHERE bt.status = 'borrowed'
+    )
+    WHERE metrics_id = 1
+"""
+
+_METRICS_FINES = """
+    UPDATE library_metrics
+    SET fines = fines + COALESCE((SELECT SUM(new_fine - old_fine) FROM fine_changes), 0)
+    WHERE metrics_id = 1
+"""
+
+_DROP_STAGING = {
+    "sqlite": "DROP TABLE IF EXISTS temp.fine_changes",
+    "mysql": "DROP TEMPORARY TABLE IF EXISTS fine_changes",
+}
+
+
+def fine_changes_query(backend: str, today: date) -> Tuple[str, Tuple]:
+    """Open loans past due on ``today`` whose fine differs from the one now owed."""
+    days = _DAYS_OVERDUE[backend]
+    fine = f"ROUND({days} * %s, 2)"
+    query = f"""
+        SELECT transaction_id, user_id, fine_amount, {fine}
+        FROM borrow_transactions
+        WHERE status IN ('borrowed', 'overdue')
+          AND due_date < %s
+          AND fine_amount <> {fine}
+    """
+    return query, (today, FINE_PER_DAY, today, today, FINE_PER_DAY)
+
+
+def _stage_changes(backend: str, today: date) -> Tuple[str, Tuple]:
+    query, params = fine_changes_query(backend, today)
+    return f"INSERT INTO fine_changes (transaction_id, user_id, old_fine, new_fine) {query}", params
+
+
+def reconcile_user_fines() -> int:
+    """Rebuild ``users.total_fines`` from the loan ledger, archive included, in one statement."""
+    return run_query(
+        """
+        UPDATE users
+        SET total_fines = ROUND(
+            COALESCE((
+                SELECT SUM(bt.fine_amount) FROM borrow_transactions bt
+                WHERE bt.user_id = users.user_id
+            ), 0)
+            + COALESCE((
+                SELECT SUM(bta.fine_amount) FROM borrow_transactions_archive bta
+                WHERE bta.user_id = users.user_id
+            ), 0),
+            2
+        )
+        """,
+        fetch="none",
+    )
+
+
+def accrue_fines(*, today: Optional[date] = None, force: bool = False) -> int:
+    """
+    Bring fines on open loans up to date and return how many loans changed.
+
+    Fines only grow once per day, so a run is skipped when the watermark
+    already covers ``today`` unless ``force`` is set. The first run on a
+    database without a watermark reconciles ``users.total_fines`` first.
+    """
+    backend = get_db_backend()
+    today = today or datetime.utcnow().date()
+    watermark = get_state(FINE_WATERMARK)
+    if watermark is None:
+        reconcile_user_fines()
+    elif watermark >= today.isoformat() and not force:
+        return 0
+
+    bound_today = today.isoformat() if backend == "sqlite" else today
+    queries: List[Tuple[str, Tuple]] = [(ddl, ()) for ddl in _STAGING_DDL[backend]]
+    stage_query, stage_params = _stage_changes(backend, bound_today)
+    queries.append((stage_query, stage_params))
+    queries.append((_METRICS_NEWLY_OVERDUE, ()))
+    queries.append((_METRICS_FINES, ()))
+    apply_index = len(queries)
+    queries.append((_APPLY_LOAN_FINES[backend], ()))
+    queries.append((_APPLY_USER_TOTALS[backend], ()))
+    queries.append(set_state_statement(FINE_WATERMARK, today.isoformat()))
+    queries.append((_DROP_STAGING[backend], ()))
+    rowcounts = run_transaction(queries)
+    return max(rowcounts[apply_index], 0)
+
+
+def mark_overdue_loans(*, today: Optional[date] = None) -> int:
+    """
+    Move open loans past their due date to ``overdue`` and return how many
+    moved. ``accrue_fines`` does this for loans whose fine changes; this
+    also covers loans that owe nothing yet (e.g. ``FINE_PER_DAY = 0``).
+    """
+    today = today or datetime.utcnow().date()
+    bound_today = today.isoformat() if get_db_backend() == "sqlite" else today
+    rowcounts = run_transaction(
+        [
+            (
+                """
+                UPDATE library_metrics
+                SET overdue = overdue + (
+                    SELECT COUNT(*) FROM borrow_transactions
+                    WHERE status = 'borrowed' AND due_date < %s
+                )
+                WHERE metrics_id = 1
+                """,
+                (bound_today,),
+            ),
+            (
+                "UPDATE borrow_transactions SET status = 'overdue' WHERE status = 'borrowed' AND due_date < %s",
+                (bound_today,),
+            ),
+        ]
+    )
+    return rowcounts[1]
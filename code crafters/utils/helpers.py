@@ -5,276 +5,564 @@ High level helpers wrapping database operations.
 from __future__ import annotations
 
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-
-from config import DEFAULT_LOAN_DAYS, FINE_PER_DAY, MAX_ACTIVE_LOANS, MAX_FINE_BEFORE_BLOCK, Pagination
-from database.database import run_query, run_transaction
-
-
-def fetch_book_catalog(
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    BORROW_CLAIM_ATTEMPTS,
+    DEFAULT_LOAN_DAYS,
+    FINE_PER_DAY,
+    MAX_ACTIVE_LOANS,
+    MAX_FINE_BEFORE_BLOCK,
+    CursorPagination,
+    Pagination,
+    get_db_backend,
+)
+from database.database import run_query, transaction
+from database.search_index import catalog_search_clause
+from utils.fines import accrue_fines
+from utils.metrics import metrics_delta, read_library_metrics
+from utils.pagination import Page, build_page, decode_cursor
+from utils.reservations import claim_hold, place_hold, queue_position
+
+
+_CATALOG_CURSOR = "catalog"
+_RANKED_CATALOG_CURSOR = "catalog-ranked"
+_TRANSACTIONS_CURSOR = "transactions"
+_USERS_CURSOR = "users"
+
+# Loan columns shared by borrow_transactions and borrow_transactions_archive.
+HISTORY_COLUMNS = "transaction_id, copy_id, user_id, borrow_date, due_date, return_date, status, fine_amount"
+
+
+def _fetch_rows(query: str, params: Tuple, as_frame: bool, **kwargs):
+    """Dict rows, or a typed DataFrame when ``as_frame`` is set."""
+    if as_frame:
+        return run_query(query, params, as_frame=True, **kwargs)
+    return run_query(query, params, **kwargs) or []
+
+
+def catalog_query(
     *,
-    search: Optional[str] = None,
-    category_id: Optional[int] = None,
-    pagination: Optional[Pagination] = None,
-) -> List[Dict]:
-    pagination = pagination or Pagination()
+    search: Optional[str],
+    category_id: Optional[int],
+    available_only: bool = False,
+    keyset: bool = False,
+    after: Optional[str] = None,
+) -> Optional[Tuple[str, List, bool]]:
+    """
+    Build the catalog SELECT up to (but excluding) LIMIT.
+
+    ``keyset`` switches ordering to the unique seek key and ``after`` (a
+    cursor token) adds the seek predicate. Returns ``(sql, params, ranked)``
+    or ``None`` when the search term cannot match anything.
+    """
     filters = []
     params: List = []
+    join_clause = ""
+    ranked = False
     if search:
-        filters.append("(b.title LIKE %s OR b.isbn LIKE %s)")
-        pattern = f"%{search}%"
-        params.extend([pattern, pattern])
+        clause = catalog_search_clause(search)
+        if clause is None:
+            return None
+        join_clause = clause.join
+        params.extend(clause.join_params)
+        if clause.where:
+            filters.append(clause.where)
+            params.extend(clause.where_params)
+        ranked = clause.ranked
     if category_id:
         filters.append("b.category_id = %s")
         params.append(category_id)
+    if available_only:
+        filters.append("b.available_copies > 0")
+
+    sort_column = "m.score" if ranked else "b.title"
+    if keyset:
+        order_by = f"{sort_column} ASC, b.book_id ASC"
+        if after:
+            seek_value, seek_id = decode_cursor(
+                after, _RANKED_CATALOG_CURSOR if ranked else _CATALOG_CURSOR
+            )
+            filters.append(f"({sort_column} > %s OR ({sort_column} = %s AND b.book_id > %s))")
+            params.extend([seek_value, seek_value, seek_id])
+    elif ranked:
+        order_by = "m.score ASC, b.title ASC"
+    else:
+        order_by = "b.title ASC"
 
     where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+    score_column = ", m.score AS search_score" if ranked else ""
     query = f"""
         SELECT
             b.book_id,
             b.title,
             b.isbn,
             c.name AS category_name,
-            COUNT(CASE WHEN bc.status = 'available' THEN 1 END) AS available_copies
+            b.available_copies,
+            b.total_copies
+            {score_column}
         FROM books b
+        {join_clause}
         LEFT JOIN categories c ON b.category_id = c.category_id
-        LEFT JOIN book_copies bc ON bc.book_id = b.book_id
         {where_clause}
-        GROUP BY b.book_id
-        ORDER BY b.title ASC
-        LIMIT %s OFFSET %s
+        ORDER BY {order_by}
     """
+    return query, params, ranked
+
+
+def fetch_book_catalog(
+    *,
+    search: Optional[str] = None,
+    category_id: Optional[int] = None,
+    available_only: bool = False,
+    pagination: Optional[Pagination] = None,
+) -> List[Dict]:
+    pagination = pagination or Pagination()
+    built = catalog_query(search=search, category_id=category_id, available_only=available_only)
+    if built is None:
+        return []
+    query, params, ranked = built
     params.extend([pagination.page_size, pagination.offset])
-    return run_query(query, tuple(params)) or []
+    rows = run_query(f"{query} LIMIT %s OFFSET %s", tuple(params), cache=True) or []
+    if ranked:
+        for row in rows:
+            row.pop("search_score", None)
+    return rows
 
 
-def fetch_book_details(book_id: int) -> Optional[Dict]:
-    book = run_query(
-        """
-        SELECT
-            b.*,
-            c.name AS category_name
-        FROM books b
-        LEFT JOIN categories c ON b.category_id = c.category_id
-        WHERE b.book_id = %s
-        """,
-        (book_id,),
-        fetch="one",
+def fetch_book_catalog_page(
+    *,
+    search: Optional[str] = None,
+    category_id: Optional[int] = None,
+    available_only: bool = False,
+    pagination: Optional[CursorPagination] = None,
+    as_frame: bool = False,
+) -> Page:
+    """
+    Keyset-paginated catalog: ``(title, book_id)`` order, or relevance then
+    ``book_id`` when searching. Every page costs the same as the first.
+    ``as_frame`` returns the page's items as a typed DataFrame.
+    """
+    pagination = pagination or CursorPagination()
+    built = catalog_query(
+        search=search,
+        category_id=category_id,
+        available_only=available_only,
+        keyset=True,
+        after=pagination.after,
     )
-    if not book:
-        return None
-    author_rows = run_query(
-        """
-        SELECT a.first_name, a.last_name
-        FROM authors a
-        JOIN book_authors ba ON ba.author_id = a.author_id
-        WHERE ba.book_id = %s
-        ORDER BY a.last_name
-        """,
-        (book_id,),
+    if built is None:
+        return Page()
+    query, params, ranked = built
+    params.append(pagination.page_size + 1)
+    rows = _fetch_rows(f"{query} LIMIT %s", tuple(params), as_frame, cache=True)
+    page = build_page(
+        rows,
+        pagination.page_size,
+        _RANKED_CATALOG_CURSOR if ranked else _CATALOG_CURSOR,
+        ("search_score", "book_id") if ranked else ("title", "book_id"),
     )
-    if author_rows:
-        book["authors"] = ", ".join(
-            f"{row['first_name']} {row['last_name']}".strip() for row in author_rows
+    if as_frame:
+        page.items = page.items.drop(columns="search_score", errors="ignore")
+        return page
+    for row in page.items:
+        row.pop("search_score", None)
+    return page
+
+
+# ``{ids}`` is one placeholder per requested book id.
+BOOK_DETAILS_QUERY = """
+    SELECT
+        b.*,
+        c.name AS category_name
+    FROM books b
+    LEFT JOIN categories c ON b.category_id = c.category_id
+    WHERE b.book_id IN ({ids})
+"""
+
+BOOK_AUTHORS_QUERY = """
+    SELECT ba.book_id, a.first_name, a.last_name
+    FROM authors a
+    JOIN book_authors ba ON ba.author_id = a.author_id
+    WHERE ba.book_id IN ({ids})
+    ORDER BY ba.book_id, a.last_name
+"""
+
+
+def fetch_book_details_many(book_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Load books, their category names and author lists for a whole page.
+
+    Two queries regardless of how many ids are requested; the result maps
+    ``book_id`` to the same shape ``fetch_book_details`` returns.
+    """
+    ids = sorted({int(book_id) for book_id in book_ids})
+    if not ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(ids))
+    books = run_query(
+        BOOK_DETAILS_QUERY.format(ids=placeholders),
+        tuple(ids),
+        cache=True,
+    ) or []
+    details = {book["book_id"]: book for book in books}
+    author_rows = run_query(
+        BOOK_AUTHORS_QUERY.format(ids=placeholders),
+        tuple(ids),
+        cache=True,
+    ) or []
+    authors: Dict[int, List[str]] = {}
+    for row in author_rows:
+        authors.setdefault(row["book_id"], []).append(
+            f"{row['first_name']} {row['last_name']}".strip()
         )
-    else:
-        book["authors"] = ""
-    return book
+    for book_id, book in details.items():
+        book["authors"] = ", ".join(authors.get(book_id, []))
+    return details
 
 
-def fetch_active_loans(user_id: int) -> List[Dict]:
-    query = """
-        SELECT
-            bt.transaction_id,
-            bt.borrow_date,
-            bt.due_date,
-            bt.status,
-            bt.fine_amount,
-            b.title
-        FROM borrow_transactions bt
-        JOIN book_copies bc ON bc.copy_id = bt.copy_id
+def fetch_book_details(book_id: int) -> Optional[Dict]:
+    return fetch_book_details_many([book_id]).get(book_id)
+
+
+ACTIVE_LOANS_QUERY = """
+    SELECT
+        bt.transaction_id,
+        bt.borrow_date,
+        bt.due_date,
+        bt.status,
+        bt.fine_amount,
+        b.title
+    FROM borrow_transactions bt
+    JOIN book_copies bc ON bc.copy_id = bt.copy_id
+    JOIN books b ON b.book_id = bc.book_id
+    WHERE bt.user_id = %s AND bt.status IN ('borrowed', 'overdue')
+    ORDER BY bt.due_date ASC
+"""
+
+
+def fetch_active_loans(user_id: int, *, as_frame: bool = False):
+    """Open loans, soonest due first; a typed DataFrame when ``as_frame`` is set."""
+    return _fetch_rows(ACTIVE_LOANS_QUERY, (user_id,), as_frame)
+
+
+OVERDUE_LOANS_QUERY = """
+    SELECT bt.transaction_id, u.full_name, b.title, bt.due_date, bt.fine_amount
+    FROM borrow_transactions bt
+    JOIN users u ON u.user_id = bt.user_id
+    JOIN book_copies bc ON bc.copy_id = bt.copy_id
+    JOIN books b ON b.book_id = bc.book_id
+    WHERE bt.status = 'overdue'
+    LIMIT %s
+"""
+
+
+def fetch_overdue_loans(limit: int = 20, *, as_frame: bool = False):
+    """Overdue loans with patron and title for the admin report."""
+    return _fetch_rows(OVERDUE_LOANS_QUERY, (limit,), as_frame)
+
+
+def user_history_query(seek: str = "") -> str:
+    """
+    A user's loans across ``borrow_transactions`` and its archive, newest
+    first. Each table is cut to ``LIMIT`` rows on its own
+    ``(user_id, borrow_date, transaction_id)`` index before the merge.
+    Parameters: (user_id, *seek, limit) for each table, then the limit.
+    """
+    side = f"""
+        SELECT * FROM (
+            SELECT {HISTORY_COLUMNS} FROM {{table}}
+            WHERE user_id = %s {seek}
+            ORDER BY borrow_date DESC, transaction_id DESC
+            LIMIT %s
+        ) AS {{alias}}
+    """
+    return f"""
+        SELECT h.*, b.title
+        FROM (
+            {side.format(table="borrow_transactions", alias="hot")}
+            UNION ALL
+            {side.format(table="borrow_transactions_archive", alias="archived")}
+        ) h
+        JOIN book_copies bc ON bc.copy_id = h.copy_id
         JOIN books b ON b.book_id = bc.book_id
-        WHERE bt.user_id = %s AND bt.status IN ('borrowed', 'overdue')
-        ORDER BY bt.due_date ASC
+        ORDER BY h.borrow_date DESC, h.transaction_id DESC
+        LIMIT %s
     """
-    return run_query(query, (user_id,)) or []
 
 
 def fetch_user_transactions(user_id: int) -> List[Dict]:
-    query = """
-        SELECT
-            bt.*,
-            b.title
-        FROM borrow_transactions bt
-        JOIN book_copies bc ON bc.copy_id = bt.copy_id
-        JOIN books b ON b.book_id = bc.book_id
-        WHERE bt.user_id = %s
-        ORDER BY bt.borrow_date DESC
-        LIMIT 100
+    limit = 100
+    return run_query(user_history_query(), (user_id, limit, user_id, limit, limit)) or []
+
+
+def fetch_user_transactions_page(
+    user_id: int,
+    pagination: Optional[CursorPagination] = None,
+    *,
+    as_frame: bool = False,
+) -> Page:
     """
-    return run_query(query, (user_id,)) or []
+    Borrowing history, newest first, seeking on ``(borrow_date, transaction_id)``.
+    ``as_frame`` returns the page's items as a typed DataFrame.
+    """
+    pagination = pagination or CursorPagination()
+    side: List = [user_id]
+    seek = ""
+    if pagination.after:
+        borrow_date, transaction_id = decode_cursor(pagination.after, _TRANSACTIONS_CURSOR)
+        # A DataFrame page encodes the date as a full ISO timestamp.
+        borrow_date = borrow_date[:10]
+        seek = """
+            AND (borrow_date < %s
+                 OR (borrow_date = %s AND transaction_id < %s))
+        """
+        side.extend([borrow_date, borrow_date, transaction_id])
+    side.append(pagination.page_size + 1)
+    rows = _fetch_rows(user_history_query(seek), (*side, *side, pagination.page_size + 1), as_frame)
+    return build_page(
+        rows, pagination.page_size, _TRANSACTIONS_CURSOR, ("borrow_date", "transaction_id")
+    )
+
+
+# ``{seek}`` is empty on the first page.
+USERS_PAGE_QUERY = """
+    SELECT user_id, full_name, email, role, total_fines, created_at
+    FROM users
+    {seek}
+    ORDER BY created_at DESC, user_id DESC
+    LIMIT %s
+"""
+
+
+def fetch_users_page(pagination: Optional[CursorPagination] = None, *, as_frame: bool = False) -> Page:
+    """Admin user listing, newest accounts first, seeking on ``(created_at, user_id)``."""
+    pagination = pagination or CursorPagination()
+    params: List = []
+    seek = ""
+    if pagination.after:
+        created_at, user_id = decode_cursor(pagination.after, _USERS_CURSOR)
+        # Compare in the stored "YYYY-MM-DD HH:MM:SS" form, which SQLite compares as text.
+        created_at = created_at.replace("T", " ")
+        seek = "WHERE created_at < %s OR (created_at = %s AND user_id < %s)"
+        params.extend([created_at, created_at, user_id])
+    params.append(pagination.page_size + 1)
+    rows = _fetch_rows(USERS_PAGE_QUERY.format(seek=seek), tuple(params), as_frame)
+    return build_page(rows, pagination.page_size, _USERS_CURSOR, ("created_at", "user_id"))
+
+
+def _as_date(value) -> date:
+    # SQLite hands DATE columns back as ISO strings.
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
 
 
 def _compute_fine(due_date: date, return_date: date) -> float:
-    overdue_days = (return_date - due_date).days
+    overdue_days = (_as_date(return_date) - _as_date(due_date)).days
     if overdue_days <= 0:
         return 0.0
     return round(overdue_days * FINE_PER_DAY, 2)
 
 
+# ``{exclude}`` skips copies another borrower won; ``{lock}`` is the MySQL
+# row lock, empty on SQLite where ``BEGIN IMMEDIATE`` serialises writers.
+FREE_COPY_QUERY = """
+    SELECT copy_id FROM book_copies
+    WHERE book_id = %s AND status = 'available' {exclude}
+    LIMIT 1
+    {lock}
+"""
+
+ACCOUNT_STANDING_QUERY = """
+    SELECT
+        u.total_fines,
+        (
+            SELECT COUNT(*) FROM borrow_transactions bt
+            WHERE bt.user_id = u.user_id AND bt.status IN ('borrowed', 'overdue')
+        ) AS active_loans
+    FROM users u
+    WHERE u.user_id = %s
+    {lock}
+"""
+
+LOAN_QUERY = """
+    SELECT bt.*, bc.book_id
+    FROM borrow_transactions bt
+    JOIN book_copies bc ON bc.copy_id = bt.copy_id
+    WHERE bt.transaction_id = %s
+    {lock}
+"""
+
+
+def _claim_available_copy(tx, book_id: int, mysql: bool) -> Optional[int]:
+    lost: List[int] = []
+    for _ in range(BORROW_CLAIM_ATTEMPTS):
+        exclude = (
+            f"AND copy_id NOT IN ({', '.join(['%s'] * len(lost))})" if lost else ""
+        )
+        candidate = tx.fetch_one(
+            FREE_COPY_QUERY.format(exclude=exclude, lock="FOR UPDATE SKIP LOCKED" if mysql else ""),
+            (book_id, *lost),
+        )
+        if not candidate:
+            return None
+        claimed = tx.execute(
+            """
+            UPDATE book_copies SET status = 'borrowed'
+            WHERE copy_id = %s AND status = 'available'
+            """,
+            (candidate["copy_id"],),
+        )
+        if claimed == 1:
+            return candidate["copy_id"]
+        lost.append(candidate["copy_id"])
+    return None
+
+
 def borrow_book(user_id: int, book_id: int) -> Tuple[bool, str]:
-    """Borrow the first available copy of the book."""
+    """
+    Borrow an available copy of the book in a single transaction.
+
+    Eligibility is read with the patron's row locked, and the copy is
+    claimed with a conditional ``UPDATE ... WHERE status = 'available'``.
+    If another borrower wins the race for a copy, the next free copy is
+    tried, so two patrons can never be lent the same copy. A copy on hold
+    for this patron is taken first and fulfils their reservation.
+    """
     if not book_id:
         return False, "Invalid book selection."
-    fines = run_query(
-        "SELECT total_fines FROM users WHERE user_id = %s",
-        (user_id,),
-        fetch="one",
-    ) or {"total_fines": 0.0}
-    if fines["total_fines"] > MAX_FINE_BEFORE_BLOCK:
-        return False, "You have outstanding fines above the allowed limit."
-
-    active_loans = run_query(
-        """
-        SELECT COUNT(*) AS count
-        FROM borrow_transactions
-        WHERE user_id = %s AND status IN ('borrowed', 'overdue')
-        """,
-        (user_id,),
-        fetch="one",
-    )
-    if active_loans and active_loans["count"] >= MAX_ACTIVE_LOANS:
-        return False, "Maximum active loans reached."
-
-    copy = run_query(
-        """
-        SELECT copy_id FROM book_copies
-        WHERE book_id = %s AND status = 'available'
-        LIMIT 1
-        """,
-        (book_id,),
-        fetch="one",
-    )
-    if not copy:
-        return False, "No available copies at the moment."
-
-    copy_id = copy["copy_id"]
+    mysql = get_db_backend() != "sqlite"
     borrow_date = datetime.utcnow().date()
     due_date = borrow_date + timedelta(days=DEFAULT_LOAN_DAYS)
 
-    queries = [
-        (
+    with transaction() as tx:
+        account = tx.fetch_one(
+            ACCOUNT_STANDING_QUERY.format(lock="FOR UPDATE" if mysql else ""), (user_id,)
+        )
+        if not account:
+            return False, "Account not found."
+        if account["total_fines"] > MAX_FINE_BEFORE_BLOCK:
+            return False, "You have outstanding fines above the allowed limit."
+        if account["active_loans"] >= MAX_ACTIVE_LOANS:
+            return False, "Maximum active loans reached."
+
+        copy_id = claim_hold(tx, user_id, book_id)
+        if copy_id is None:
+            copy_id = _claim_available_copy(tx, book_id, mysql)
+        if copy_id is None:
+            return False, "No available copies at the moment."
+
+        tx.execute(
             """
             INSERT INTO borrow_transactions
             (copy_id, user_id, borrow_date, due_date, status, fine_amount)
             VALUES (%s, %s, %s, %s, 'borrowed', 0.00)
             """,
             (copy_id, user_id, borrow_date, due_date),
-        ),
-        (
-            "UPDATE book_copies SET status = 'borrowed' WHERE copy_id = %s",
-            (copy_id,),
-        ),
-    ]
-    run_transaction(queries)
+        )
+        tx.execute(*metrics_delta(active_loans=1))
     return True, "Book borrowed successfully."
 
 
 def return_book(transaction_id: int) -> Tuple[bool, str]:
-    transaction = run_query(
-        """
-        SELECT bt.*, bc.book_id
-        FROM borrow_transactions bt
-        JOIN book_copies bc ON bc.copy_id = bt.copy_id
-        WHERE bt.transaction_id = %s
-        """,
-        (transaction_id,),
-        fetch="one",
-    )
-    if not transaction:
-        return False, "Transaction not found."
-
-    if transaction["status"] == "returned":
-        return False, "Book already returned."
+    """
+    Return a loan and settle its fine in a single transaction.
 
+    The loan is read inside the transaction (locked on MySQL; SQLite's
+    ``BEGIN IMMEDIATE`` already serialises writers), so the fine already
+    charged by the fine engine and the overdue flag are the ones this
+    return replaces, not a copy a concurrent accrual has since changed.
+    """
+    mysql = get_db_backend() != "sqlite"
     return_date = datetime.utcnow().date()
-    fine = _compute_fine(transaction["due_date"], return_date)
 
-    queries = [
-        (
+    with transaction() as tx:
+        loan = tx.fetch_one(LOAN_QUERY.format(lock="FOR UPDATE" if mysql else ""), (transaction_id,))
+        if not loan:
+            return False, "Transaction not found."
+        if loan["status"] == "returned":
+            return False, "Book already returned."
+
+        fine = _compute_fine(loan["due_date"], return_date)
+        charged = float(loan["fine_amount"] or 0)
+        returned = tx.execute(
             """
             UPDATE borrow_transactions
             SET return_date = %s, status = 'returned', fine_amount = %s
-            WHERE transaction_id = %s
+            WHERE transaction_id = %s AND status <> 'returned'
             """,
             (return_date, fine, transaction_id),
-        ),
-        (
-            "UPDATE book_copies SET status = 'available' WHERE copy_id = %s",
-            (transaction["copy_id"],),
-        ),
-        (
+        )
+        if returned != 1:
+            return False, "Book already returned."
+        # The fine engine may already have charged part of this fine.
+        tx.execute(
             "UPDATE users SET total_fines = total_fines + %s WHERE user_id = %s",
-            (fine, transaction["user_id"]),
-        ),
-    ]
-    run_transaction(queries)
+            (round(fine - charged, 2), loan["user_id"]),
+        )
+        tx.execute(
+            *metrics_delta(
+                active_loans=-1,
+                overdue=-1 if loan["status"] == "overdue" else 0,
+                fines=fine - charged,
+            )
+        )
+        hold = place_hold(tx, loan["book_id"], loan["copy_id"])
+    if hold:
+        return True, "Book returned successfully. The copy is on hold for the next patron in the queue."
     return True, "Book returned successfully."
 
 
+ACTIVE_RESERVATION_QUERY = """
+    SELECT reservation_id FROM reservations
+    WHERE user_id = %s AND book_id = %s AND status IN ('pending', 'ready')
+"""
+
+
 def create_reservation(user_id: int, book_id: int) -> Tuple[bool, str]:
-    existing = run_query(
-        """
-        SELECT reservation_id FROM reservations
-        WHERE user_id = %s AND book_id = %s AND status = 'pending'
-        """,
-        (user_id, book_id),
-        fetch="one",
-    )
-    if existing:
-        return False, "You already have an active reservation for this book."
+    """
+    Join the book's queue. Reservations are for books with no copy on the
+    shelf; while one is available the patron is told to borrow it instead.
 
-    run_query(
-        """
-        INSERT INTO reservations (book_id, user_id, status)
-        VALUES (%s, %s, 'pending')
-        """,
-        (book_id, user_id),
-        fetch="none",
-    )
-    return True, "Reservation created. We will notify you when it's available."
+    The checks and the insert share a transaction and the book row is
+    locked on MySQL, so a copy returned meanwhile either shows as available
+    here or is put on hold for this reservation by ``place_hold``.
+    """
+    mysql = get_db_backend() != "sqlite"
+    with transaction() as tx:
+        book = tx.fetch_one(
+            f"SELECT available_copies FROM books WHERE book_id = %s {'FOR UPDATE' if mysql else ''}",
+            (book_id,),
+        )
+        if not book:
+            return False, "Book not found."
+        if book["available_copies"] > 0:
+            return False, "Copies are available right now; borrow one instead."
+        if tx.fetch_one(ACTIVE_RESERVATION_QUERY, (user_id, book_id)):
+            return False, "You already have an active reservation for this book."
+        tx.execute(
+            """
+            INSERT INTO reservations (book_id, user_id, status)
+            VALUES (%s, %s, 'pending')
+            """,
+            (book_id, user_id),
+        )
+        tx.execute(*metrics_delta(reservations=1))
+    position = queue_position(user_id, book_id)
+    return True, f"Reservation created. You are number {position} in the queue."
 
 
-def update_fine_totals() -> None:
+def update_fine_totals(*, force: bool = False) -> int:
     """
-    Update overdue transactions and fines. This can be called manually
-    from the admin dashboard.
+    Update overdue transactions and fines; the ``accrue_fines`` background
+    job runs this periodically.
+
+    Returns the number of loans whose fine changed.
     """
-    overdue_transactions = run_query(
-        """
-        SELECT transaction_id, due_date
-        FROM borrow_transactions
-        WHERE status = 'borrowed' AND due_date < CURRENT_DATE()
-        """
-    )
-    if not overdue_transactions:
-        return
-
-    queries = []
-    today = datetime.utcnow().date()
-    for tx in overdue_transactions:
-        fine = _compute_fine(tx["due_date"], today)
-        queries.append(
-            (
-                """
-                UPDATE borrow_transactions
-                SET status = 'overdue', fine_amount = %s
-                WHERE transaction_id = %s
-                """,
-                (fine, tx["transaction_id"]),
-            )
-        )
-    run_transaction(queries)
+    return accrue_fines(force=force)
 
 
 def fetch_dashboard_metrics() -> Dict[str, float]:
@@ -284,24 +572,14 @@ def fetch_dashboard_metrics() -> Dict[str, float]:
         "reservations": 0,
         "fines": 0.0,
     }
-    rows = run_query(
-        """
-        SELECT
-            (SELECT COUNT(*) FROM borrow_transactions WHERE status IN ('borrowed','overdue')) AS active_loans,
-            (SELECT COUNT(*) FROM borrow_transactions WHERE status = 'overdue') AS overdue,
-            (SELECT COUNT(*) FROM reservations WHERE status = 'pending') AS reservations,
-            (SELECT SUM(fine_amount) FROM borrow_transactions) AS fines
-        """,
-        fetch="one",
-    )
-    if rows:
+    row = read_library_metrics()
+    if row:
         metrics.update(
             {
-                "active_loans": rows.get("active_loans", 0),
-                "overdue": rows.get("overdue", 0),
-                "reservations": rows.get("reservations", 0),
-                "fines": rows.get("fines", 0.0) or 0.0,
+                "active_loans": row["active_loans"],
+                "overdue": row["overdue"],
+                "reservations": row["reservations"],
+                "fines": float(row["fines"] or 0.0),
             }
         )
     return metrics
-
@@ -0,0 +1,75 @@
+"""
+Background maintenance jobs and the process-wide scheduler.
+
+``start_scheduler()`` is called by ``app.main`` and starts one scheduler
+thread per worker process. To run the jobs in a dedicated process instead,
+set SCHEDULER_ENABLED=0 for the Streamlit workers and run::
+
+    python -m utils.jobs
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from functools import partial
+from typing import List, Optional
+
+from config import get_scheduler_config
+from database.counters import reconcile_availability_counters
+from utils.archive import archive_returned_transactions
+from utils.fines import accrue_fines, mark_overdue_loans
+from utils.metrics import refresh_library_metrics
+from utils.reservations import expire_holds, expire_reservations
+from utils.rollups import refresh_circulation_rollups
+from utils.scheduler import Job, Scheduler
+
+_JOB_FUNCS = {
+    "accrue_fines": accrue_fines,
+    "accrue_fines_force": partial(accrue_fines, force=True),
+    "mark_overdue": mark_overdue_loans,
+    "expire_reservations": expire_reservations,
+    "expire_holds": expire_holds,
+    "refresh_metrics": refresh_library_metrics,
+    "refresh_rollups": refresh_circulation_rollups,
+    "archive_transactions": archive_returned_transactions,
+    "reconcile_counters": reconcile_availability_counters,
+}
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def default_jobs() -> List[Job]:
+    intervals = get_scheduler_config()["intervals"]
+    return [Job(name, func, intervals[name]) for name, func in _JOB_FUNCS.items()]
+
+
+def build_scheduler() -> Scheduler:
+    config = get_scheduler_config()
+    return Scheduler(
+        default_jobs(),
+        poll_seconds=config["poll_seconds"],
+        jitter=config["jitter"],
+        lease_seconds=config["lease_seconds"],
+        history_days=config["history_days"],
+    )
+
+
+def start_scheduler() -> Optional[Scheduler]:
+    """Start this process's scheduler thread once; None when disabled by config."""
+    global _scheduler
+    if not get_scheduler_config()["enabled"]:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = build_scheduler()
+                scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    build_scheduler().run_forever()
@@ -0,0 +1,75 @@
+"""
+Materialized dashboard metrics.
+
+``library_metrics`` holds a single row with the dashboard counters. Borrow,
+return, reservation and fine paths adjust it by delta inside their own
+transactions via ``metrics_delta``; ``refresh_library_metrics`` recomputes
+it from the base tables to correct any drift. The table is created by
+migration 7.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from database.database import run_query
+
+
+def metrics_delta(
+    *,
+    active_loans: int = 0,
+    overdue: int = 0,
+    reservations: int = 0,
+    fines: float = 0.0,
+) -> Tuple[str, Tuple[Any, ...]]:
+    """Statement adjusting the counters, for use inside the transaction that caused the change."""
+    return (
+        """
+        UPDATE library_metrics
+        SET active_loans = active_loans + %s,
+            overdue = overdue + %s,
+            reservations = reservations + %s,
+            fines = fines + %s
+        WHERE metrics_id = 1
+        """,
+        (active_loans, overdue, reservations, round(fines, 2)),
+    )
+
+
+def refresh_library_metrics() -> None:
+    """Recompute every counter from the base tables in one statement."""
+    run_query(
+        """
+        REPLACE INTO library_metrics
+            (metrics_id, active_loans, overdue, reservations, fines, refreshed_at)
+        SELECT
+            1,
+            (SELECT COUNT(*) FROM borrow_transactions WHERE status IN ('borrowed', 'overdue')),
+            (SELECT COUNT(*) FROM borrow_transactions WHERE status = 'overdue'),
+            (SELECT COUNT(*) FROM reservations WHERE status = 'pending'),
+            COALESCE((SELECT SUM(fine_amount) FROM borrow_transactions), 0)
+                + COALESCE((SELECT SUM(fine_amount) FROM borrow_transactions_archive), 0),
+            %s
+        """,
+        (datetime.utcnow().replace(microsecond=0),),
+        fetch="none",
+    )
+
+
+def read_library_metrics() -> Optional[Dict[str, Any]]:
+    """
+    Return the materialized counters with a single primary-key read.
+
+    The row is rebuilt every ``METRICS_RECOMPUTE_SECONDS`` by the
+    ``refresh_metrics`` background job, never on this request path; it is
+    None until the first refresh.
+    """
+    return run_query(
+        """
+        SELECT active_loans, overdue, reservations, fines, refreshed_at
+        FROM library_metrics WHERE metrics_id = 1
+        """,
+        fetch="one",
+        cache=True,
+    )
@@ -0,0 +1,64 @@
+"""
+Opaque continuation tokens for keyset (seek) pagination.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+
+@dataclass
+class Page:
+    """One page of keyset-paginated rows: dicts, or a DataFrame for ``as_frame`` reads."""
+
+    items: Any = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "item"):  # numpy scalar from a DataFrame row
+        return value.item()
+    return value
+
+
+def encode_cursor(kind: str, key: Sequence[Any]) -> str:
+    payload = json.dumps({"k": kind, "v": [_plain(v) for v in key]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str) -> List[Any]:
+    """Return the sort key stored in ``token``; raises ValueError if it is not a ``kind`` cursor."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("Invalid pagination cursor.") from exc
+    if not isinstance(payload, dict) or payload.get("k") != kind:
+        raise ValueError("Pagination cursor does not belong to this listing.")
+    return list(payload["v"])
+
+
+def build_page(rows: Any, page_size: int, kind: str, key_columns: Sequence[str]) -> Page:
+    """
+    Trim the look-ahead row and derive the next cursor from the last row kept.
+    ``rows`` is a list of dicts or a DataFrame.
+    """
+    if len(rows) <= page_size:
+        return Page(items=rows)
+    rows = rows[:page_size]
+    last = rows.iloc[-1] if hasattr(rows, "iloc") else rows[-1]
+    return Page(items=rows, next_cursor=encode_cursor(kind, [last[col] for col in key_columns]))
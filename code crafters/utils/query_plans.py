@@ -0,0 +1,135 @@
+"""
+EXPLAIN report for the queries issued by the helpers in ``utils``.
+
+Run ``python -m utils.query_plans`` to print, for each helper query, the
+plan the current backend picks and whether any table is read with a full
+scan. Every query here should be served by an index from
+``database.migrations``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from config import ROLLUP_BATCH_SIZE, CursorPagination, get_db_backend
+from database.database import run_query
+from utils.archive import ARCHIVE_BATCH_QUERY
+from utils.fines import fine_changes_query
+from utils.helpers import (
+    ACCOUNT_STANDING_QUERY,
+    ACTIVE_LOANS_QUERY,
+    ACTIVE_RESERVATION_QUERY,
+    BOOK_AUTHORS_QUERY,
+    BOOK_DETAILS_QUERY,
+    FREE_COPY_QUERY,
+    LOAN_QUERY,
+    OVERDUE_LOANS_QUERY,
+    USERS_PAGE_QUERY,
+    catalog_query,
+    user_history_query,
+)
+from utils.reservations import LAPSED_HOLDS_QUERY, QUEUE_HEAD_QUERY, USER_RESERVATIONS_QUERY
+from utils.rollups import DAILY_CIRCULATION_QUERY, TOP_BOOKS_QUERY, roll_up_statements
+
+_SAMPLE_ID = 1
+_SAMPLE_DAY = "2000-01-01"
+
+
+@dataclass
+class QueryPlan:
+    name: str
+    plan: List[str] = field(default_factory=list)
+    full_scans: List[str] = field(default_factory=list)
+
+    @property
+    def uses_index(self) -> bool:
+        return not self.full_scans
+
+
+def _catalog(**kwargs: Any) -> Tuple[str, Tuple[Any, ...]]:
+    query, params, _ = catalog_query(search=None, keyset=True, **kwargs)
+    return f"{query} LIMIT %s", (*params, CursorPagination().page_size + 1)
+
+
+def helper_queries() -> Dict[str, Tuple[str, Tuple[Any, ...]]]:
+    """
+    The SQL each helper runs, with representative parameters, keyed by
+    helper name. Row locks are left out; they do not change the plan.
+    """
+    backend = get_db_backend()
+    page = CursorPagination().page_size + 1
+    two_ids = (_SAMPLE_ID, _SAMPLE_ID + 1)
+    fines_query, fines_params = fine_changes_query(backend, _SAMPLE_DAY)
+    return {
+        "fetch_book_catalog_page": _catalog(category_id=None),
+        "fetch_book_catalog_page(category)": _catalog(category_id=_SAMPLE_ID),
+        "fetch_book_details_many": (BOOK_DETAILS_QUERY.format(ids="%s, %s"), two_ids),
+        "fetch_book_details_many(authors)": (BOOK_AUTHORS_QUERY.format(ids="%s, %s"), two_ids),
+        "fetch_active_loans": (ACTIVE_LOANS_QUERY, (_SAMPLE_ID,)),
+        "fetch_user_transactions_page": (user_history_query(), (_SAMPLE_ID, page) * 2 + (page,)),
+        "fetch_users_page": (USERS_PAGE_QUERY.format(seek=""), (page,)),
+        "fetch_overdue_loans": (OVERDUE_LOANS_QUERY, (20,)),
+        "borrow_book(eligibility)": (ACCOUNT_STANDING_QUERY.format(lock=""), (_SAMPLE_ID,)),
+        "borrow_book(free copy)": (FREE_COPY_QUERY.format(exclude="", lock=""), (_SAMPLE_ID,)),
+        "return_book": (LOAN_QUERY.format(lock=""), (_SAMPLE_ID,)),
+        "create_reservation": (ACTIVE_RESERVATION_QUERY, (_SAMPLE_ID, _SAMPLE_ID)),
+        "place_hold(head of queue)": (QUEUE_HEAD_QUERY.format(exclude="", lock=""), (_SAMPLE_ID,)),
+        "fetch_user_reservations": (USER_RESERVATIONS_QUERY, (_SAMPLE_ID,)),
+        "expire_holds": (LAPSED_HOLDS_QUERY, (_SAMPLE_DAY, 500)),
+        "accrue_fines": (fines_query, fines_params),
+        "refresh_circulation_rollups": (roll_up_statements(backend)[0], (0, ROLLUP_BATCH_SIZE) * 2),
+        "refresh_circulation_rollups(categories)": (
+            roll_up_statements(backend)[1],
+            (0, ROLLUP_BATCH_SIZE) * 2,
+        ),
+        "archive_returned_transactions": (
+            ARCHIVE_BATCH_QUERY.format(lock=""),
+            (_SAMPLE_DAY, _SAMPLE_ID, 1000),
+        ),
+        "top_books": (TOP_BOOKS_QUERY, (_SAMPLE_DAY, "2000-01-31", 10)),
+        "daily_circulation": (DAILY_CIRCULATION_QUERY, (_SAMPLE_DAY, "2000-01-31")),
+    }
+
+
+def _sqlite_plan(name: str, query: str, params: Tuple[Any, ...]) -> QueryPlan:
+    result = QueryPlan(name)
+    materialized = set()
+    for row in run_query(f"EXPLAIN QUERY PLAN {query}", params) or []:
+        detail = row["detail"]
+        result.plan.append(detail)
+        if detail.startswith("MATERIALIZE "):
+            materialized.add(detail.split()[1])
+        # "SCAN t" without "USING ..." reads every row of t; scanning an
+        # already bounded subquery result is fine.
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail:
+            if detail.split()[1] not in materialized:
+                result.full_scans.append(detail.split()[1])
+    return result
+
+
+def _mysql_plan(name: str, query: str, params: Tuple[Any, ...]) -> QueryPlan:
+    result = QueryPlan(name)
+    for row in run_query(f"EXPLAIN {query}", params) or []:
+        result.plan.append(
+            f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}"
+        )
+        # <derivedN>/<unionN> rows read an already bounded subquery result.
+        if row["type"] == "ALL" and not str(row["table"]).startswith("<"):
+            result.full_scans.append(row["table"])
+    return result
+
+
+def explain_helper_queries() -> List[QueryPlan]:
+    explain = _sqlite_plan if get_db_backend() == "sqlite" else _mysql_plan
+    return [explain(name, query, params) for name, (query, params) in helper_queries().items()]
+
+
+if __name__ == "__main__":
+    plans = explain_helper_queries()
+    for plan in plans:
+        status = "index" if plan.uses_index else f"FULL SCAN ({', '.join(plan.full_scans)})"
+        print(f"{plan.name}: {status}")
+        for line in plan.plan:
+            print(f"    {line}")
+    raise SystemExit(0 if all(plan.uses_index for plan in plans) else 1)
@@ -0,0 +1,196 @@
+"""
+Reservation queues: a FIFO of ``pending`` reservations per book.
+
+The queue is the ``(book_id, status, created_at)`` index on
+``reservations`` (migration 4). Ties on ``created_at`` are broken by
+``reservation_id``, which both engines keep in every secondary index.
+Finding the head of a queue, a patron's position in it and the holds due
+to expire are all index range reads, so a return stays O(log n) however
+many reservations are pending.
+
+A reservation moves from ``pending`` to ``ready`` when a returned copy is
+put on hold for it (the copy becomes ``on_hold`` until
+``hold_expires_at``). It becomes ``fulfilled`` when the patron borrows the
+copy, or ``expired``, in which case the copy passes to the next patron in
+the queue.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import BORROW_CLAIM_ATTEMPTS, HOLD_DAYS, RESERVATION_EXPIRY_DAYS, get_db_backend
+from database.database import run_query, run_transaction, transaction
+from utils.metrics import metrics_delta
+
+# Position of reservation ``r`` in its book's queue, 1 being next in line.
+QUEUE_POSITION = """
+    (
+        SELECT COUNT(*) FROM reservations q
+        WHERE q.book_id = r.book_id
+          AND q.status = 'pending'
+          AND q.created_at <= r.created_at
+          AND (q.created_at < r.created_at OR q.reservation_id < r.reservation_id)
+    ) + 1
+"""
+
+# ``{exclude}`` skips reservations another returner already served;
+# ``{lock}`` is the MySQL row lock, empty on SQLite.
+QUEUE_HEAD_QUERY = """
+    SELECT reservation_id, user_id FROM reservations
+    WHERE book_id = %s AND status = 'pending' {exclude}
+    ORDER BY created_at, reservation_id
+    LIMIT 1
+    {lock}
+"""
+
+LAPSED_HOLDS_QUERY = """
+    SELECT reservation_id, book_id, copy_id FROM reservations
+    WHERE status = 'ready' AND hold_expires_at < %s
+    ORDER BY hold_expires_at
+    LIMIT %s
+"""
+
+USER_RESERVATIONS_QUERY = f"""
+    SELECT r.reservation_id, r.book_id, b.title, r.status, r.created_at, r.hold_expires_at,
+           CASE WHEN r.status = 'pending' THEN {QUEUE_POSITION} END AS queue_position
+    FROM reservations r
+    JOIN books b ON b.book_id = r.book_id
+    WHERE r.user_id = %s AND r.status IN ('pending', 'ready')
+    ORDER BY r.created_at, r.reservation_id
+"""
+
+
+def place_hold(tx, book_id: int, copy_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Put a copy that just came free on hold for the head of its book's queue.
+
+    Runs inside the caller's transaction. Returns the reservation that got
+    the hold, or None after making the copy ``available`` when nobody is
+    waiting.
+    """
+    mysql = get_db_backend() != "sqlite"
+    hold_expires_at = datetime.utcnow().replace(microsecond=0) + timedelta(days=HOLD_DAYS)
+    passed: List[int] = []
+    for _ in range(BORROW_CLAIM_ATTEMPTS):
+        exclude = (
+            f"AND reservation_id NOT IN ({', '.join(['%s'] * len(passed))})" if passed else ""
+        )
+        head = tx.fetch_one(
+            QUEUE_HEAD_QUERY.format(exclude=exclude, lock="FOR UPDATE SKIP LOCKED" if mysql else ""),
+            (book_id, *passed),
+        )
+        if not head:
+            break
+        claimed = tx.execute(
+            """
+            UPDATE reservations
+            SET status = 'ready', copy_id = %s, hold_expires_at = %s
+            WHERE reservation_id = %s AND status = 'pending'
+            """,
+            (copy_id, hold_expires_at, head["reservation_id"]),
+        )
+        if claimed == 1:
+            tx.execute("UPDATE book_copies SET status = 'on_hold' WHERE copy_id = %s", (copy_id,))
+            tx.execute(*metrics_delta(reservations=-1))
+            return {**head, "hold_expires_at": hold_expires_at}
+        passed.append(head["reservation_id"])
+    tx.execute("UPDATE book_copies SET status = 'available' WHERE copy_id = %s", (copy_id,))
+    return None
+
+
+def claim_hold(tx, user_id: int, book_id: int) -> Optional[int]:
+    """Check out the copy held for this patron, if any, inside the caller's transaction."""
+    mysql = get_db_backend() != "sqlite"
+    hold = tx.fetch_one(
+        f"""
+        SELECT reservation_id, copy_id FROM reservations
+        WHERE user_id = %s AND book_id = %s AND status = 'ready'
+        LIMIT 1
+        {"FOR UPDATE" if mysql else ""}
+        """,
+        (user_id, book_id),
+    )
+    if not hold:
+        return None
+    claimed = tx.execute(
+        "UPDATE book_copies SET status = 'borrowed' WHERE copy_id = %s AND status = 'on_hold'",
+        (hold["copy_id"],),
+    )
+    if claimed != 1:
+        return None
+    tx.execute(
+        "UPDATE reservations SET status = 'fulfilled' WHERE reservation_id = %s",
+        (hold["reservation_id"],),
+    )
+    return hold["copy_id"]
+
+
+def expire_holds(*, now: Optional[datetime] = None, batch_size: int = 500) -> int:
+    """
+    Expire up to ``batch_size`` lapsed holds, passing each copy to the next
+    patron in the queue; returns how many expired.
+    """
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    lapsed = run_query(LAPSED_HOLDS_QUERY, (now, batch_size))
+    expired = 0
+    for hold in lapsed:
+        with transaction() as tx:
+            released = tx.execute(
+                "UPDATE reservations SET status = 'expired' WHERE reservation_id = %s AND status = 'ready'",
+                (hold["reservation_id"],),
+            )
+            if released == 1:
+                place_hold(tx, hold["book_id"], hold["copy_id"])
+                expired += 1
+    return expired
+
+
+def expire_reservations(*, now: Optional[datetime] = None) -> int:
+    """Expire reservations pending longer than ``RESERVATION_EXPIRY_DAYS``; returns how many."""
+    cutoff = (now or datetime.utcnow()).replace(microsecond=0) - timedelta(days=RESERVATION_EXPIRY_DAYS)
+    rowcounts = run_transaction(
+        [
+            (
+                """
+                UPDATE library_metrics
+                SET reservations = reservations - (
+                    SELECT COUNT(*) FROM reservations
+                    WHERE status = 'pending' AND created_at < %s
+                )
+                WHERE metrics_id = 1
+                """,
+                (cutoff,),
+            ),
+            (
+                "UPDATE reservations SET status = 'expired' WHERE status = 'pending' AND created_at < %s",
+                (cutoff,),
+            ),
+        ]
+    )
+    return rowcounts[1]
+
+
+def queue_position(user_id: int, book_id: int) -> Optional[int]:
+    """The patron's place in the book's queue (1 = next), 0 while a copy is on hold for them, else None."""
+    row = run_query(
+        f"""
+        SELECT r.status, {QUEUE_POSITION} AS queue_position
+        FROM reservations r
+        WHERE r.user_id = %s AND r.book_id = %s AND r.status IN ('pending', 'ready')
+        LIMIT 1
+        """,
+        (user_id, book_id),
+        fetch="one",
+    )
+    if not row:
+        return None
+    return 0 if row["status"] == "ready" else row["queue_position"]
+
+
+def fetch_user_reservations(user_id: int, *, as_frame: bool = False):
+    """Open reservations with their queue position, in one round trip; a DataFrame with ``as_frame``."""
+    if as_frame:
+        return run_query(USER_RESERVATIONS_QUERY, (user_id,), as_frame=True)
+    return run_query(USER_RESERVATIONS_QUERY, (user_id,)) or []
@@ -0,0 +1,217 @@
+"""
+Daily circulation rollups behind the admin reports.
+
+``circulation_daily_books`` and ``circulation_daily_categories``
+(migration 5) hold the number of loans per day per book and per category.
+They are kept current from a high-water mark on ``transaction_id`` over
+``borrow_transactions`` and its archive. Each refresh folds in only the
+loans written since the previous one, ``ROLLUP_BATCH_SIZE`` ids per
+transaction, and advances the mark in the same transaction with a
+compare-and-set, so concurrent runners never count a loan twice. A report
+over a date range reads one primary-key range of the rollups. Its cost
+depends on the length of the range and the size of the catalog, not on how
+many loans have ever been written.
+
+Run ``python -m utils.rollups`` to backfill existing history, or add
+``--rebuild`` to recompute the rollups from scratch.
+
+MySQL assigns ids before commit, so a loan can commit after a higher
+numbered one. There the mark only advances to the newest id seen at least
+``ROLLUP_COMMIT_LAG_SECONDS`` earlier, by which time every lower id has
+committed or rolled back. SQLite assigns ids under the database write lock,
+in commit order, so it needs no hold-back.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import date
+from typing import List
+
+from config import ROLLUP_BATCH_SIZE, ROLLUP_COMMIT_LAG_SECONDS, get_db_backend
+from database.database import run_query, run_transaction, transaction
+from database.state import get_state, set_state, set_state_statement
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_WATERMARK = "rollups.circulation_through"
+# "<id> <unix time>": the newest loan id and when it was seen (MySQL only).
+ROLLUP_HORIZON = "rollups.circulation_seen"
+
+_INSERT_IGNORE = {"sqlite": "INSERT OR IGNORE", "mysql": "INSERT IGNORE"}
+
+# Loans in (low, high] from the hot table and the archive (utils/archive.py),
+# so a rebuild still sees archived history.
+_BATCH = """
+    FROM (
+        SELECT copy_id, borrow_date FROM borrow_transactions
+        WHERE transaction_id > %s AND transaction_id <= %s
+        UNION ALL
+        SELECT copy_id, borrow_date FROM borrow_transactions_archive
+        WHERE transaction_id > %s AND transaction_id <= %s
+    ) bt
+    JOIN book_copies bc ON bc.copy_id = bt.copy_id
+    {join}
+    GROUP BY bt.borrow_date, {key}
+"""
+
+
+def _roll_up(backend: str, table: str, column: str, key: str, join: str = "") -> str:
+    batch = _BATCH.format(join=join, key=key)
+    if backend == "sqlite":
+        return f"""
+            INSERT INTO {table} (day, {column}, borrows)
+            SELECT bt.borrow_date, {key}, COUNT(*) {batch}
+            ON CONFLICT (day, {column}) DO UPDATE SET borrows = borrows + excluded.borrows
+        """
+    return f"""
+        INSERT INTO {table} (day, {column}, borrows)
+        SELECT * FROM (
+            SELECT bt.borrow_date AS day, {key} AS {column}, COUNT(*) AS batch_borrows {batch}
+        ) AS loans
+        ON DUPLICATE KEY UPDATE borrows = borrows + loans.batch_borrows
+    """
+
+
+def roll_up_statements(backend: str) -> List[str]:
+    return [
+        _roll_up(backend, "circulation_daily_books", "book_id", "bc.book_id"),
+        _roll_up(
+            backend,
+            "circulation_daily_categories",
+            "category_id",
+            "COALESCE(b.category_id, 0)",
+            join="JOIN books b ON b.book_id = bc.book_id",
+        ),
+    ]
+
+
+def _settled_through(backend: str, latest: int) -> int:
+    """Newest loan id at or below which every transaction has committed or rolled back."""
+    if backend == "sqlite":
+        return latest
+    seen_at = time.time()
+    horizon = get_state(ROLLUP_HORIZON)
+    if horizon is None:
+        set_state(ROLLUP_HORIZON, f"{latest} {seen_at}")
+        return 0
+    seen_id, previously_seen_at = horizon.split()
+    if seen_at - float(previously_seen_at) < ROLLUP_COMMIT_LAG_SECONDS:
+        return 0
+    set_state(ROLLUP_HORIZON, f"{latest} {seen_at}")
+    return int(seen_id)
+
+
+def refresh_circulation_rollups(*, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """Fold loans written since the high-water mark into the rollups; returns the new mark."""
+    backend = get_db_backend()
+    run_query(
+        f"{_INSERT_IGNORE[backend]} INTO maintenance_state (name, value) VALUES (%s, '0')",
+        (ROLLUP_WATERMARK,),
+        fetch="none",
+    )
+    latest = run_query(
+        """
+        SELECT MAX(transaction_id) AS latest FROM (
+            SELECT MAX(transaction_id) AS transaction_id FROM borrow_transactions
+            UNION ALL
+            SELECT MAX(transaction_id) FROM borrow_transactions_archive
+        ) ids
+        """,
+        fetch="one",
+    )["latest"] or 0
+    latest = _settled_through(backend, latest)
+    statements = roll_up_statements(backend)
+    while True:
+        with transaction() as tx:
+            low = int(
+                tx.fetch_one("SELECT value FROM maintenance_state WHERE name = %s", (ROLLUP_WATERMARK,))["value"]
+            )
+            if low >= latest:
+                return low
+            high = min(low + batch_size, latest)
+            advanced = tx.execute(
+                """
+                UPDATE maintenance_state SET value = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE name = %s AND value = %s
+                """,
+                (str(high), ROLLUP_WATERMARK, str(low)),
+            )
+            if advanced != 1:
+                # Another runner moved the mark since we read it.
+                return low
+            for statement in statements:
+                tx.execute(statement, (low, high, low, high))
+        logger.info("Circulation rollups current through transaction %s of %s", high, latest)
+
+
+def rebuild_circulation_rollups(*, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """Discard the rollups and recompute them from every loan; returns the new mark."""
+    run_transaction(
+        [
+            ("DELETE FROM circulation_daily_books", ()),
+            ("DELETE FROM circulation_daily_categories", ()),
+            set_state_statement(ROLLUP_WATERMARK, 0),
+        ]
+    )
+    return refresh_circulation_rollups(batch_size=batch_size)
+
+
+def rollup_watermark() -> int:
+    """Id of the newest loan included in the rollups."""
+    return int(get_state(ROLLUP_WATERMARK) or 0)
+
+
+TOP_BOOKS_QUERY = """
+    SELECT b.book_id, b.title, t.times_borrowed
+    FROM (
+        SELECT book_id, SUM(borrows) AS times_borrowed
+        FROM circulation_daily_books
+        WHERE day >= %s AND day <= %s
+        GROUP BY book_id
+        ORDER BY times_borrowed DESC, book_id
+        LIMIT %s
+    ) t
+    JOIN books b ON b.book_id = t.book_id
+    ORDER BY t.times_borrowed DESC, b.book_id
+"""
+
+DAILY_CIRCULATION_QUERY = """
+    SELECT d.day, COALESCE(c.name, 'Uncategorised') AS category, d.borrows
+    FROM circulation_daily_categories d
+    LEFT JOIN categories c ON c.category_id = d.category_id
+    WHERE d.day >= %s AND d.day <= %s
+    ORDER BY d.day, category
+"""
+
+
+def top_books(start: date, end: date, limit: int = 10, *, as_frame: bool = False):
+    """Most borrowed books between ``start`` and ``end`` inclusive."""
+    return run_query(
+        TOP_BOOKS_QUERY, (start.isoformat(), end.isoformat(), limit), cache=True, as_frame=as_frame
+    )
+
+
+def daily_circulation(start: date, end: date, *, as_frame: bool = False):
+    """Loans per day and category between ``start`` and ``end`` inclusive."""
+    return run_query(
+        DAILY_CIRCULATION_QUERY, (start.isoformat(), end.isoformat()), cache=True, as_frame=as_frame
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Backfill the daily circulation rollups.")
+    parser.add_argument("--rebuild", action="store_true", help="discard the rollups and recompute them")
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    refresh = rebuild_circulation_rollups if args.rebuild else refresh_circulation_rollups
+    through = refresh(batch_size=args.batch_size)
+    if get_db_backend() != "sqlite":
+        # Fold in the loans that were still settling during the first pass.
+        time.sleep(ROLLUP_COMMIT_LAG_SECONDS)
+        through = refresh_circulation_rollups(batch_size=args.batch_size)
+    print(f"Rollups current through transaction {through} in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,202 @@
+"""
+In-process scheduler for periodic maintenance jobs.
+
+Jobs are coordinated through the ``scheduled_jobs`` table (migration 3),
+so every worker process can run a scheduler thread without duplicating
+work. A scheduler runs a job only after claiming it with a conditional
+UPDATE, which succeeds for exactly one worker once the job is due and no
+unexpired lease is held. Finishing a run releases the lease, sets the next
+due time and appends the duration and outcome to ``job_runs``. Intervals
+and poll sleeps are jittered so workers started together do not poll in
+lockstep. Jobs never run on a Streamlit script thread.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config import get_db_backend
+from database.database import run_query, run_transaction
+
+logger = logging.getLogger(__name__)
+
+_INSERT_IGNORE = {"sqlite": "INSERT OR IGNORE", "mysql": "INSERT IGNORE"}
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    func: Callable[[], Any]
+    interval_seconds: float
+
+
+def _now() -> datetime:
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def _after(seconds: float) -> datetime:
+    return _now() + timedelta(seconds=round(seconds))
+
+
+class Scheduler:
+    """Claims due jobs, runs them one at a time and records each run."""
+
+    def __init__(
+        self,
+        jobs: Sequence[Job],
+        *,
+        poll_seconds: float,
+        jitter: float,
+        lease_seconds: float,
+        history_days: int,
+    ) -> None:
+        self.jobs: Dict[str, Job] = {job.name: job for job in jobs}
+        self.poll_seconds = poll_seconds
+        self.jitter = jitter
+        self.lease_seconds = lease_seconds
+        self.history_days = history_days
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._registered = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _register(self) -> None:
+        """Create missing job rows, due within one poll of now."""
+        if self._registered:
+            return
+        run_transaction(
+            [
+                (
+                    f"{_INSERT_IGNORE[get_db_backend()]} INTO scheduled_jobs (job_name, next_run_at) VALUES (%s, %s)",
+                    (job.name, _after(random.uniform(0, self.poll_seconds))),
+                )
+                for job in self.jobs.values()
+            ]
+        )
+        self._registered = True
+
+    def _claim(self, job: Job) -> bool:
+        now = _now()
+        claimed = run_query(
+            """
+            UPDATE scheduled_jobs
+            SET locked_by = %s, locked_until = %s
+            WHERE job_name = %s
+              AND next_run_at <= %s
+              AND (locked_until IS NULL OR locked_until < %s)
+            """,
+            (self.worker, _after(self.lease_seconds), job.name, now, now),
+            fetch="none",
+        )
+        return claimed == 1
+
+    def _run(self, job: Job) -> None:
+        started_at = _now()
+        started = time.perf_counter()
+        try:
+            result = job.func()
+            status = "ok"
+        except Exception as exc:
+            logger.exception("Job %s failed", job.name)
+            result = f"{type(exc).__name__}: {exc}"
+            status = "failed"
+        duration_ms = (time.perf_counter() - started) * 1000
+        next_run_at = _after(self._jittered(job.interval_seconds))
+        run_transaction(
+            [
+                (
+                    """
+                    UPDATE scheduled_jobs
+                    SET next_run_at = %s, locked_by = NULL, locked_until = NULL
+                    WHERE job_name = %s AND locked_by = %s
+                    """,
+                    (next_run_at, job.name, self.worker),
+                ),
+                (
+                    """
+                    INSERT INTO job_runs (job_name, worker, started_at, duration_ms, status, result)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """,
+                    (
+                        job.name,
+                        self.worker,
+                        started_at,
+                        round(duration_ms, 3),
+                        status,
+                        None if result is None else str(result)[:255],
+                    ),
+                ),
+                (
+                    "DELETE FROM job_runs WHERE job_name = %s AND started_at < %s",
+                    (job.name, started_at - timedelta(days=self.history_days)),
+                ),
+            ]
+        )
+        logger.info("Job %s %s in %.1f ms", job.name, status, duration_ms)
+
+    def run_pending(self) -> List[str]:
+        """One pass: run every job this worker manages to claim; returns their names."""
+        self._register()
+        ran = []
+        for job in self.jobs.values():
+            if self._stop.is_set():
+                break
+            if self._claim(job):
+                self._run(job)
+                ran.append(job.name)
+        return ran
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Scheduler pass failed")
+            self._stop.wait(self._jittered(self.poll_seconds))
+
+    def start(self) -> None:
+        """Run ``run_forever`` on a daemon thread (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def trigger_job(name: str) -> bool:
+    """Make a job due now; the next scheduler poll on any worker runs it."""
+    updated = run_query(
+        "UPDATE scheduled_jobs SET next_run_at = %s WHERE job_name = %s",
+        (_now(), name),
+        fetch="none",
+    )
+    return updated == 1
+
+
+def job_status() -> List[Dict[str, Any]]:
+    return run_query(
+        "SELECT job_name, next_run_at, locked_by, locked_until FROM scheduled_jobs ORDER BY job_name",
+    )
+
+
+def recent_job_runs(limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest runs first, across all jobs and workers."""
+    return run_query(
+        """
+        SELECT run_id, job_name, worker, started_at, duration_ms, status, result
+        FROM job_runs ORDER BY run_id DESC LIMIT %s
+        """,
+        (limit,),
+    )
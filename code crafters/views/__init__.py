@@ -1,9 +1,7 @@
 """
 Streamlit page modules.
-"""
 
-from .book_catalog import render_book_catalog
-from .user_dashboard import render_user_dashboard
-from .admin_dashboard import render_admin_dashboard
-from .profile import render_profile_page
+Pages are imported on demand by ``app.PAGES`` rather than re-exported here,
+so loading one page does not load them all.
+"""
 
@@ -4,17 +4,32 @@ Admin dashboard UI.
 
 from __future__ import annotations
 
+import json
+from datetime import date, datetime, timedelta
+
 import streamlit as st
 
-from auth.authentication import current_user, require_role
-from config import Pagination
-from database.database import run_query
+from auth.authentication import current_user, login_rate_limit_stats, require_role
+from config import JOB_INTERVALS, CursorPagination
+from database.database import (
+    clear_query_cache,
+    get_pool_stats,
+    get_query_cache_stats,
+    get_query_stats,
+    reset_query_stats,
+    run_query,
+)
+from database.request_context import page_round_trip_stats
 from utils.helpers import (
-    fetch_book_catalog,
+    fetch_book_catalog_page,
     fetch_dashboard_metrics,
+    fetch_overdue_loans,
+    fetch_users_page,
     return_book,
-    update_fine_totals,
 )
+from utils.rollups import daily_circulation, top_books
+from utils.scheduler import job_status, recent_job_runs, trigger_job
+from views.pagination import current_cursor, render_pager
 
 
 def _add_book_form():
@@ -54,48 +69,158 @@ def _add_copy_form():
 
 def _user_table():
     st.subheader("Users")
-    users = run_query(
-        "SELECT user_id, full_name, email, role, total_fines FROM users ORDER BY created_at DESC LIMIT 50"
+    page = fetch_users_page(
+        CursorPagination(page_size=50, after=current_cursor("admin_users")), as_frame=True
+    )
+    st.dataframe(page.items, use_container_width=True)
+    render_pager("admin_users", page)
+
+
+def _report_period():
+    today = date.today()
+    picked = st.date_input(
+        "Report period",
+        value=(today - timedelta(days=29), today),
+        max_value=today,
+        key="report_period",
     )
-    st.dataframe(users, use_container_width=True)
+    if not isinstance(picked, (tuple, list)):
+        picked = (picked,)
+    # While a range is being picked only its start is set.
+    return picked[0], picked[-1]
 
 
 def _reports():
-    st.subheader("Most Borrowed Books")
-    top_books = run_query(
-        """
-        SELECT b.title, COUNT(*) AS times_borrowed
-        FROM borrow_transactions bt
-        JOIN book_copies bc ON bc.copy_id = bt.copy_id
-        JOIN books b ON b.book_id = bc.book_id
-        GROUP BY b.book_id
-        ORDER BY times_borrowed DESC
-        LIMIT 10
-        """
+    start, end = _report_period()
+    st.caption(
+        f"Circulation figures are updated every {JOB_INTERVALS['refresh_rollups'] / 60:.0f} minutes."
     )
-    if top_books:
-        st.dataframe(top_books, use_container_width=True)
+
+    st.subheader("Most Borrowed Books")
+    top = top_books(start, end, as_frame=True)
+    if not top.empty:
+        st.dataframe(top, use_container_width=True)
+    else:
+        st.info("No loans in this period.")
+
+    st.subheader("Loans by Category")
+    daily = daily_circulation(start, end, as_frame=True)
+    if not daily.empty:
+        st.bar_chart(daily.pivot_table(index="day", columns="category", values="borrows", aggfunc="sum"))
+        totals = daily.groupby("category", as_index=False)["borrows"].sum()
+        st.dataframe(totals.sort_values("borrows", ascending=False), use_container_width=True)
     else:
-        st.info("No transactions yet.")
+        st.info("No loans in this period.")
 
     st.subheader("Overdue Transactions")
-    overdue = run_query(
-        """
-        SELECT bt.transaction_id, u.full_name, b.title, bt.due_date, bt.fine_amount
-        FROM borrow_transactions bt
-        JOIN users u ON u.user_id = bt.user_id
-        JOIN book_copies bc ON bc.copy_id = bt.copy_id
-        JOIN books b ON b.book_id = bc.book_id
-        WHERE bt.status = 'overdue'
-        LIMIT 20
-        """
-    )
-    if overdue:
+    overdue = fetch_overdue_loans(as_frame=True)
+    if not overdue.empty:
         st.dataframe(overdue, use_container_width=True)
     else:
         st.success("No overdue transactions 🎉")
 
 
+def _system_status():
+    st.subheader("Connection Pool")
+    stats = get_pool_stats()
+    if "writers" in stats:
+        st.dataframe(
+            [{"pool": name, **values} for name, values in stats.items()],
+            use_container_width=True,
+        )
+        return
+    cols = st.columns(4)
+    cols[0].metric("In use", stats["in_use"])
+    cols[1].metric("Idle", stats["idle"])
+    cols[2].metric("Avg wait (ms)", f"{stats['avg_wait_ms']:.1f}")
+    cols[3].metric("Exhausted", stats["exhausted"])
+    st.json(stats)
+
+
+def _queue_job(name: str, label: str):
+    if trigger_job(name):
+        st.info(f"{label} queued; the scheduler runs it on its next poll.")
+    else:
+        st.warning(f"{label} could not be queued: no scheduler has registered the job yet.")
+
+
+def _background_jobs():
+    st.subheader("Background Jobs")
+    jobs = job_status()
+    if not jobs:
+        st.caption("The scheduler has not registered any jobs yet.")
+        return
+    st.dataframe(jobs, use_container_width=True)
+    cols = st.columns(len(jobs))
+    for col, job in zip(cols, jobs):
+        if col.button(f"Run {job['job_name']} now", key=f"run_job_{job['job_name']}"):
+            _queue_job(job["job_name"], job["job_name"])
+    with st.expander("Recent runs"):
+        st.dataframe(recent_job_runs(), use_container_width=True)
+
+
+def _query_cache_status():
+    st.subheader("Query Cache")
+    stats = get_query_cache_stats()
+    cols = st.columns(4)
+    cols[0].metric("Entries", stats["entries"])
+    cols[1].metric("Hit rate", f"{stats['hit_rate']:.0%}")
+    cols[2].metric("Evictions", stats["evictions"])
+    cols[3].metric("Invalidations", stats["invalidations"])
+    if st.button("Clear query cache"):
+        clear_query_cache()
+        st.info("Query cache cleared.")
+
+
+def _login_rate_limit_status():
+    st.subheader("Login Rate Limit")
+    stats = login_rate_limit_stats()
+    cols = st.columns(4)
+    cols[0].metric("Allowed", stats["allowed"])
+    cols[1].metric("Rejected", stats["rejected"])
+    cols[2].metric("Emails tracked", stats["emails_tracked"])
+    cols[3].metric("Clients tracked", stats["clients_tracked"])
+
+
+def _query_stats_panel():
+    st.subheader("Query Statistics")
+    report = get_query_stats()
+    if not report["enabled"]:
+        st.info("Query instrumentation is disabled (QUERY_STATS_ENABLED=0).")
+        return
+    cols = st.columns(3)
+    cols[0].metric("Statements", len(report["statements"]))
+    cols[1].metric("Slow queries", len(report["slow_queries"]))
+    cols[2].metric("Slow threshold (ms)", f"{report['slow_query_ms']:.0f}")
+    st.caption(f"Collected by this worker since {report['since']} UTC.")
+    if report["statements"]:
+        st.dataframe(report["statements"], use_container_width=True)
+
+    pages = page_round_trip_stats()
+    if pages:
+        st.caption("Database round trips per page render")
+        st.dataframe(
+            [{"page": page, **stats} for page, stats in sorted(pages.items())],
+            use_container_width=True,
+        )
+
+    for entry in report["slow_queries"][:20]:
+        with st.expander(f"{entry['elapsed_ms']:.1f} ms at {entry['at']}: {entry['statement'][:80]}"):
+            st.code(entry["statement"], language="sql")
+            if entry["plan"]:
+                st.code("\n".join(entry["plan"]))
+
+    st.download_button(
+        "Download report (JSON)",
+        json.dumps(report, indent=2, default=str),
+        file_name=f"query-stats-{datetime.utcnow():%Y%m%d-%H%M%S}.json",
+        mime="application/json",
+    )
+    if st.button("Reset query statistics"):
+        reset_query_stats()
+        st.info("Query statistics reset.")
+
+
 def render_admin_dashboard() -> None:
     user = current_user()
     if not user or not require_role("admin"):
@@ -109,14 +234,18 @@ def render_admin_dashboard() -> None:
     cols[2].metric("Reservations", metrics["reservations"])
     cols[3].metric("Total fines", f"${metrics['fines']:.2f}")
 
-    tabs = st.tabs(["Books", "Users", "Transactions", "Reports"])
+    tabs = st.tabs(["Books", "Users", "Transactions", "Reports", "System"])
 
     with tabs[0]:
         _add_book_form()
         _add_copy_form()
         st.subheader("Inventory Snapshot")
-        books = fetch_book_catalog(pagination=Pagination(page_size=10))
-        st.dataframe(books, use_container_width=True)
+        page = fetch_book_catalog_page(
+            pagination=CursorPagination(page_size=10, after=current_cursor("admin_inventory")),
+            as_frame=True,
+        )
+        st.dataframe(page.items, use_container_width=True)
+        render_pager("admin_inventory", page)
 
     with tabs[1]:
         _user_table()
@@ -134,9 +263,15 @@ def render_admin_dashboard() -> None:
                 st.error(message)
 
         if st.button("Recalculate fines"):
-            update_fine_totals()
-            st.info("Fine calculation triggered.")
+            _queue_job("accrue_fines_force", "Fine recalculation")
 
     with tabs[3]:
         _reports()
 
+    with tabs[4]:
+        _system_status()
+        _query_cache_status()
+        _login_rate_limit_status()
+        _query_stats_panel()
+        _background_jobs()
+
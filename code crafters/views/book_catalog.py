@@ -4,18 +4,25 @@ Book catalog UI.
 
 from __future__ import annotations
 
+from typing import Optional
+
 import streamlit as st
 
 from auth.authentication import current_user
-from config import Pagination
-from utils.helpers import borrow_book, create_reservation, fetch_book_catalog, fetch_book_details
+from config import CursorPagination
+from utils.helpers import (
+    borrow_book,
+    create_reservation,
+    fetch_book_catalog_page,
+    fetch_book_details_many,
+)
+from views.pagination import current_cursor, render_pager, reset_cursor
 
 
-def _render_book_card(book: dict, user_id: int) -> None:
+def _render_book_card(book: dict, details: Optional[dict], user_id: int) -> None:
     with st.expander(f"{book['title']} — {book.get('category_name', 'Uncategorized')}", expanded=False):
         st.markdown(f"**ISBN:** {book['isbn']}")
-        st.markdown(f"**Available copies:** {book['available_copies'] or 0}")
-        details = fetch_book_details(book["book_id"])
+        st.markdown(f"**Available copies:** {book['available_copies'] or 0} of {book['total_copies'] or 0}")
         if details:
             st.write(details.get("description") or "No description available.")
             if details.get("authors"):
@@ -29,7 +36,9 @@ def _render_book_card(book: dict, user_id: int) -> None:
                 if success:
                     st.rerun()
         with cols[1]:
-            if st.button("Reserve", key=f"reserve_{book['book_id']}"):
+            if st.button(
+                "Reserve", key=f"reserve_{book['book_id']}", disabled=bool(book["available_copies"])
+            ):
                 success, message = create_reservation(user_id, book["book_id"])
                 (st.success if success else st.warning)(message)
 
@@ -41,38 +50,38 @@ def render_book_catalog() -> None:
         st.info("Please sign in to view the catalog.")
         return
 
-    if "catalog_page" not in st.session_state:
-        st.session_state.catalog_page = 1
     if "catalog_search" not in st.session_state:
         st.session_state.catalog_search = ""
+    if "catalog_available_only" not in st.session_state:
+        st.session_state.catalog_available_only = False
 
     with st.form("catalog_filters"):
-        search = st.text_input("Search by title or ISBN", value=st.session_state.catalog_search)
+        search = st.text_input(
+            "Search by title, author, ISBN or description",
+            value=st.session_state.catalog_search,
+        )
+        available_only = st.checkbox(
+            "Only show available books", value=st.session_state.catalog_available_only
+        )
         page_size = st.selectbox("Results per page", options=[5, 10, 15, 20], index=1)
         submitted = st.form_submit_button("Apply")
     if submitted:
         st.session_state.catalog_search = search
-        st.session_state.catalog_page = 1
+        st.session_state.catalog_available_only = available_only
+        reset_cursor("catalog")
 
-    pagination = Pagination(page=st.session_state.catalog_page, page_size=page_size)
-    books = fetch_book_catalog(
+    pagination = CursorPagination(page_size=page_size, after=current_cursor("catalog"))
+    page = fetch_book_catalog_page(
         search=st.session_state.catalog_search.strip() or None,
+        available_only=st.session_state.catalog_available_only,
         pagination=pagination,
     )
-    if not books:
+    if not page.items:
         st.warning("No books found. Try adjusting your filters.")
         return
 
-    for book in books:
-        _render_book_card(book, user["user_id"])
-
-    cols = st.columns(2)
-    with cols[0]:
-        if st.button("Previous") and st.session_state.catalog_page > 1:
-            st.session_state.catalog_page -= 1
-            st.rerun()
-    with cols[1]:
-        if st.button("Next") and len(books) == page_size:
-            st.session_state.catalog_page += 1
-            st.rerun()
+    details = fetch_book_details_many(book["book_id"] for book in page.items)
+    for book in page.items:
+        _render_book_card(book, details.get(book["book_id"]), user["user_id"])
 
+    render_pager("catalog", page)
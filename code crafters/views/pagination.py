@@ -0,0 +1,37 @@
+"""
+Previous/Next controls for keyset-paginated listings.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import streamlit as st
+
+from utils.pagination import Page
+
+
+def _cursor_stack(key: str) -> list:
+    return st.session_state.setdefault(f"{key}_cursors", [None])
+
+
+def current_cursor(key: str) -> Optional[str]:
+    """Cursor for the page currently shown in listing ``key``."""
+    return _cursor_stack(key)[-1]
+
+
+def reset_cursor(key: str) -> None:
+    st.session_state[f"{key}_cursors"] = [None]
+
+
+def render_pager(key: str, page: Page) -> None:
+    stack = _cursor_stack(key)
+    cols = st.columns(2)
+    with cols[0]:
+        if st.button("Previous", key=f"{key}_prev", disabled=len(stack) <= 1):
+            stack.pop()
+            st.rerun()
+    with cols[1]:
+        if st.button("Next", key=f"{key}_next", disabled=not page.has_next):
+            stack.append(page.next_cursor)
+            st.rerun()
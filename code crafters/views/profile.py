@@ -7,7 +7,9 @@ from __future__ import annotations
 import streamlit as st
 
 from auth.authentication import current_user, logout
-from utils.helpers import fetch_user_transactions
+from config import CursorPagination
+from utils.helpers import fetch_user_transactions_page
+from views.pagination import current_cursor, render_pager
 
 
 def render_profile_page() -> None:
@@ -27,9 +29,14 @@ def render_profile_page() -> None:
         st.rerun()
 
     st.subheader("Borrowing History")
-    transactions = fetch_user_transactions(user["user_id"])
-    if transactions:
-        st.dataframe(transactions, use_container_width=True)
+    page = fetch_user_transactions_page(
+        user["user_id"],
+        CursorPagination(page_size=25, after=current_cursor("history")),
+        as_frame=True,
+    )
+    if not page.items.empty:
+        st.dataframe(page.items, use_container_width=True)
+        render_pager("history", page)
     else:
         st.info("No transactions yet.")
 
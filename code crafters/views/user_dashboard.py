@@ -8,6 +8,7 @@ import streamlit as st
 
 from auth.authentication import current_user
 from utils.helpers import fetch_active_loans, fetch_dashboard_metrics
+from utils.reservations import fetch_user_reservations
 
 
 def render_user_dashboard() -> None:
@@ -26,9 +27,20 @@ def render_user_dashboard() -> None:
     cols[3].metric("Fines (USD)", f"${metrics['fines']:.2f}")
 
     st.subheader("Your Active Loans")
-    loans = fetch_active_loans(user["user_id"])
-    if loans:
+    loans = fetch_active_loans(user["user_id"], as_frame=True)
+    if not loans.empty:
         st.dataframe(loans, use_container_width=True)
     else:
         st.info("You have no active loans.")
 
+    st.subheader("Your Reservations")
+    reservations = fetch_user_reservations(user["user_id"], as_frame=True)
+    for hold in reservations[reservations["status"] == "ready"].itertuples():
+        st.success(f"A copy of {hold.title} is on hold for you until {hold.hold_expires_at}.")
+    if not reservations.empty:
+        st.dataframe(
+            reservations[["title", "status", "queue_position", "created_at", "hold_expires_at"]],
+            use_container_width=True,
+        )
+    else:
+        st.info("You have no open reservations.")